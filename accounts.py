@@ -0,0 +1,254 @@
+"""
+CLIENT POOL
+Several Telegram accounts sharing the send load. Target chats are
+assigned to accounts with a consistent-hash ring, so adding or removing
+an account only moves the targets it owned. When the owning account is
+disconnected or under FloodWait for a target, the send fails over to the
+next account on the ring that can reach it.
+
+The primary account listens to the source groups and sends
+confirmations; extra accounts only send. Access hashes are per account,
+so every account keeps its own resolved peers.
+"""
+
+import bisect
+import hashlib
+import logging
+
+from telethon.errors import FloodWaitError
+
+logger = logging.getLogger(__name__)
+
+# Virtual nodes per account; more spreads targets more evenly
+RING_REPLICAS = 64
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes."""
+
+    def __init__(self, replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self.nodes = []
+        self._hashes = []
+        self._owners = []
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        kept = [(h, n) for h, n in zip(self._hashes, self._owners) if n != node]
+        self._hashes = [h for h, _ in kept]
+        self._owners = [n for _, n in kept]
+
+    def preference(self, key):
+        """Every node, in the order key should try them (owner first)."""
+        if not self._hashes:
+            return []
+        start = bisect.bisect(self._hashes, _hash(key))
+        order = []
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in order:
+                order.append(node)
+                if len(order) == len(self.nodes):
+                    break
+        return order
+
+
+class Account:
+    """One logged-in client with its own resolved peers and counters."""
+
+    def __init__(self, name, client, entities=None, titles=None, primary=False):
+        self.name = name
+        self.client = client
+        self.entities = entities if entities is not None else {}  # identifier -> entity / input peer
+        self.titles = titles if titles is not None else {}
+        self.primary = primary
+        self.user_id = None
+        self.sends = 0
+        self.failures = 0
+        self.flood_waits = 0
+        self.failovers = 0  # sends taken over for targets owned by another account
+        self.in_flight = 0
+
+    def is_connected(self):
+        try:
+            return bool(self.client and self.client.is_connected())
+        except Exception:
+            return False
+
+
+class ClientPool:
+    """
+    Accounts plus the ring that shards target chats over them.
+
+    send(target, call) runs call(account) through the scheduler on the
+    first healthy account for target, where healthy means connected and
+    not paused by a FloodWait for that target.
+    """
+
+    def __init__(self, scheduler, replicas=RING_REPLICAS):
+        self.scheduler = scheduler
+        self.accounts = {}  # name -> Account
+        self.primary = None
+        self.ring = HashRing(replicas)
+        self.targets = set()
+        self._preferences = {}  # target -> [account name, ...]
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def add(self, account):
+        self.accounts[account.name] = account
+        self.ring.add(account.name)
+        self._preferences.clear()
+        if account.primary:
+            self.primary = account
+
+    def remove(self, name):
+        account = self.accounts.pop(name, None)
+        self.ring.remove(name)
+        self._preferences.clear()
+        return account
+
+    def set_targets(self, targets):
+        """Replace the targets reported by health(), e.g. after a routes reload."""
+        self.targets = set()
+        for target in targets:
+            self.candidates(target)
+
+    def candidates(self, target, requires=()):
+        """Accounts that can reach target (and every identifier in requires), in ring order."""
+        names = self._preferences.get(target)
+        if names is None:
+            self.targets.add(target)
+            names = self._preferences[target] = self.ring.preference(target)
+        needed = (target,) + tuple(requires)
+        return [
+            self.accounts[name] for name in names
+            if all(identifier in self.accounts[name].entities for identifier in needed)
+        ]
+
+    def owner(self, target, requires=()):
+        """The account target is assigned to while everything is healthy."""
+        candidates = self.candidates(target, requires)
+        return candidates[0] if candidates else None
+
+    def is_healthy(self, account, target):
+        return account.is_connected() and self.scheduler.paused_for(target, account.name) == 0
+
+    def account_for(self, target, requires=(), exclude=()):
+        """Pick the account to send on, preferring the ring owner."""
+        candidates = [a for a in self.candidates(target, requires) if a.name not in exclude]
+        if not candidates:
+            raise LookupError(f"No account can reach {target}")
+        for account in candidates:
+            if self.is_healthy(account, target):
+                return account
+        # Everyone is paused (or down): wait on whoever is free again first
+        connected = [a for a in candidates if a.is_connected()] or candidates
+        return min(connected, key=lambda a: self.scheduler.paused_for(target, a.name))
+
+    async def send(self, target, call, requires=(), account=None):
+        """
+        Run call(account) for target, failing over on FloodWait or a
+        dropped connection. Returns whatever call returned.
+
+        Pass account (a name) to pin the send to one account, e.g. to
+        edit or delete a message only its sender can change; pinned sends
+        wait out FloodWaits instead of failing over.
+        """
+        pinned = None
+        if account is not None:
+            pinned = self.accounts.get(account)
+            if pinned is None:
+                raise LookupError(f"Account {account} is not in the pool")
+        owner = pinned or self.owner(target, requires)
+        lost = set()  # accounts that failed with a connection error
+        while True:
+            account = pinned or self.account_for(target, requires, exclude=lost)
+            others = pinned is None and any(
+                self.is_healthy(a, target) for a in self.candidates(target, requires)
+                if a is not account and a.name not in lost
+            )
+            account.in_flight += 1
+            try:
+                result = await self.scheduler.send(
+                    target, lambda: call(account), account=account.name, failover=others
+                )
+            except FloodWaitError as e:
+                account.flood_waits += 1
+                # Without another healthy account the scheduler has already waited
+                # or given up (FLOOD_WAIT_MAX); retrying would only wait again
+                if not others or e.seconds > self.scheduler.max_flood_wait:
+                    raise
+                logger.warning(f"🔀 {account.name} got a {e.seconds}s FloodWait on {target}, failing over")
+                continue
+            except ConnectionError as e:
+                account.failures += 1
+                lost.add(account.name)
+                if not others:
+                    raise
+                logger.warning(f"🔀 {account.name} lost its connection ({e}), failing over for {target}")
+                continue
+            except Exception:
+                account.failures += 1
+                raise
+            finally:
+                account.in_flight -= 1
+
+            account.sends += 1
+            if owner is not None and account is not owner:
+                account.failovers += 1
+            return result
+
+    def health(self):
+        """Per-account health and load, for the /accounts endpoint."""
+        targets = {name: [] for name in self.accounts}
+        for target in sorted(self.targets):
+            owner = self.owner(target)
+            if owner is not None:
+                targets[owner.name].append(target)
+        report = {}
+        for name, account in self.accounts.items():
+            paused = {
+                target: round(self.scheduler.paused_for(target, name), 1)
+                for (paused_account, target) in list(self.scheduler.pauses)
+                if paused_account == name and self.scheduler.paused_for(target, name) > 0
+            }
+            report[name] = {
+                'primary': account.primary,
+                'connected': account.is_connected(),
+                'targets': targets[name],
+                'sends': account.sends,
+                'failovers': account.failovers,
+                'failures': account.failures,
+                'flood_waits': account.flood_waits,
+                'in_flight': account.in_flight,
+                'paused': paused,
+            }
+        return report
+
+    async def disconnect(self, include_primary=False):
+        """Disconnect the extra accounts (and the primary if asked)."""
+        for account in list(self.accounts.values()):
+            if account.primary and not include_primary:
+                continue
+            try:
+                await account.client.disconnect()
+            except Exception as e:
+                logger.warning(f"⚠️ Error disconnecting {account.name}: {e}")
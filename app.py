@@ -7,14 +7,48 @@ Author: Signal Forwarder
 
 import os
 import asyncio
+import json
 import logging
+import signal
 import sys
-from datetime import datetime
-from dotenv import load_dotenv
-from telethon import TelegramClient, events
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+from telethon import TelegramClient, events, utils
+from telethon.errors import MessageNotModifiedError
+from telethon.sessions import StringSession
+
+from accounts import Account, ClientPool
+from archive import SignalArchive, compile_extractors, parse_time
+from outbox import Outbox, retry_delay
+from pipeline import ForwardJob, ForwardPipeline
+from cache import TTLCache
+from catchup import Checkpoints, GapRecovery
+from dedup import DuplicateIndex, Fingerprint, normalize
+from digest import Digest, DigestCollector, pack_parts
+import metrics
+import profiling
+from logsetup import setup_logging
+from media import AlbumCollector
+from msgindex import CAPTION, FORWARD, TEXT, ForwardRecord, MessageIndex, sent_message_ids
+from peers import PeerCache
+from propagation import DeleteBatcher, EditCoalescer
+from ratelimit import SendScheduler
+from reloader import ConfigWatcher, describe_diff, diff_routes, env_file_values
+from routing import Route, RouteTable, load_routes
+from templates import DEFAULT_HEADER, DEFAULT_TIMESTAMP_FORMAT, Clock, MessageTemplate
+
+# Used to report time-to-first-listen
+PROCESS_STARTED = time.monotonic()
+
+# Variables set by the process environment (e.g. Render dashboard) win
+# over .env, at startup and on reload
+PROCESS_ENV_NAMES = frozenset(os.environ)
 
 # Load environment variables from .env file
-load_dotenv()
+ENV_FILE = find_dotenv()
+load_dotenv(ENV_FILE)
 
 # ============================================================================
 # CONFIGURATION - EDIT THESE IN RENDER DASHBOARD ENVIRONMENT VARIABLES
@@ -25,6 +59,28 @@ API_ID = int(os.getenv('API_ID', ''))
 API_HASH = os.getenv('API_HASH', '')
 PHONE_NUMBER = os.getenv('PHONE_NUMBER', '')
 
+# Fast start (optional): authenticate from a session string instead of the
+# signal_forwarder_session file, which Render's ephemeral disk loses.
+# Set SHOW_SESSION_STRING=true once to print it after logging in.
+SESSION_STRING = os.getenv('SESSION_STRING', '')
+SHOW_SESSION_STRING = os.getenv('SHOW_SESSION_STRING', 'false').lower() == 'true'
+
+# Client pool (optional): comma-separated session strings of extra,
+# already logged-in accounts. Target groups are spread over all accounts
+# (each needs to be a member); if one is under FloodWait or disconnected
+# its targets fail over to the next. Forward-mode routes also need the
+# account to be able to read the source group.
+EXTRA_SESSION_STRINGS = [s.strip() for s in os.getenv('EXTRA_SESSION_STRINGS', '').split(',') if s.strip()]
+
+# First login only: the code can also be written to this file while the
+# forwarder is waiting (environment variables cannot change in a running process)
+TELEGRAM_CODE_FILE = os.getenv('TELEGRAM_CODE_FILE', 'telegram_code.txt')
+
+# Resolved groups/users (ids + access hashes) are cached here so restarts
+# skip get_entity(). PEER_CACHE may hold the same JSON to seed the cache.
+PEER_CACHE_FILE = os.getenv('PEER_CACHE_FILE', 'peer_cache.json')
+PEER_CACHE = os.getenv('PEER_CACHE', '')
+
 # Group URLs (get from Telegram group invite links)
 SOURCE_GROUP_URL = os.getenv('SOURCE_GROUP_URL', 'https://t.me/iosassembly')
 TARGET_GROUP_URL = os.getenv('TARGET_GROUP_URL', 'https://t.me/acctdeveloperselling')
@@ -38,17 +94,183 @@ ADD_TIMESTAMP = os.getenv('ADD_TIMESTAMP', 'true').lower() == 'true'
 SEND_CONFIRMATION = os.getenv('SEND_CONFIRMATION', 'false').lower() == 'true'
 FORWARD_DELAY = int(os.getenv('FORWARD_DELAY', '0'))
 
+# Message templates: HEADER_TEMPLATE goes above every copied signal (when
+# ADD_TIMESTAMP is on), FOOTER_TEMPLATE below it; a digest gets each once.
+# Both may use {timestamp}, {sender}, {source}, {target} and {route};
+# write line breaks as \n.
+# Timestamps are shown in TIMEZONE (IANA name) with TIMESTAMP_FORMAT.
+# STRIP_LINKS / STRIP_MENTIONS remove links and @mentions from the text.
+# Routes in ROUTES_FILE can set header_template, footer_template,
+# timezone and transforms of their own.
+HEADER_TEMPLATE = os.getenv('HEADER_TEMPLATE', '').replace('\\n', '\n') or DEFAULT_HEADER
+FOOTER_TEMPLATE = os.getenv('FOOTER_TEMPLATE', '').replace('\\n', '\n')
+TIMEZONE = os.getenv('TIMEZONE', 'UTC')
+TIMESTAMP_FORMAT = os.getenv('TIMESTAMP_FORMAT', DEFAULT_TIMESTAMP_FORMAT)
+STRIP_LINKS = os.getenv('STRIP_LINKS', 'false').lower() == 'true'
+STRIP_MENTIONS = os.getenv('STRIP_MENTIONS', 'false').lower() == 'true'
+
+# Multi-route mode (optional): path to a JSON routing table.
+# When set, SOURCE_GROUP_URL / TARGET_GROUP_URL / SOURCE_USERNAME /
+# SIGNAL_HEADER are ignored and every route in the file is served.
+ROUTES_FILE = os.getenv('ROUTES_FILE', '')
+
+# Runtime reload: the routes file (or, without one, the route settings
+# above in the .env file) is checked every ROUTES_RELOAD_INTERVAL seconds
+# (0 = off) and applied without reconnecting. SIGHUP reloads at once, and
+# so does sending /reload in Saved Messages or, from one of ADMIN_USERS
+# (comma-separated @usernames or user ids), in a private chat.
+ROUTES_RELOAD_INTERVAL = float(os.getenv('ROUTES_RELOAD_INTERVAL', '5'))
+ADMIN_COMMANDS = os.getenv('ADMIN_COMMANDS', 'true').lower() == 'true'
+ADMIN_USERS = [u.strip() for u in os.getenv('ADMIN_USERS', '').split(',') if u.strip()]
+
+# Forward mode: "copy" re-sends the text as a new message (media-only
+# messages are skipped); "forward" forwards the original messages
+# server-side, media and albums included. In forward mode HEADER_MODE
+# puts the ADD_TIMESTAMP header in a separate "message" or in the media
+# "caption". Routes in ROUTES_FILE can override both per route.
+FORWARD_MODE = os.getenv('FORWARD_MODE', 'copy').lower()
+HEADER_MODE = os.getenv('HEADER_MODE', 'message').lower()
+# How long to collect the parts of an album (seconds)
+ALBUM_WINDOW = float(os.getenv('ALBUM_WINDOW', '0.6'))
+# Telegram's limits for message text and media captions
+MESSAGE_TEXT_LIMIT = 4096
+MEDIA_CAPTION_LIMIT = 1024
+
+# Digest mode (copy routes): with DIGEST_WINDOW > 0, signals are collected
+# for up to that many seconds, or until DIGEST_MAX are waiting, and sent
+# as one combined message (split at MESSAGE_TEXT_LIMIT). Routes in
+# ROUTES_FILE can override both per route (digest_window / digest_max).
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', '0'))
+DIGEST_MAX = int(os.getenv('DIGEST_MAX', '20'))
+
+# Forward pipeline: matched signals wait in a bounded queue per target
+# and are sent by WORKERS_PER_TARGET workers. QUEUE_OVERFLOW decides what
+# happens when a queue is full: block, drop_newest or drop_oldest.
+QUEUE_SIZE = int(os.getenv('QUEUE_SIZE', '1000'))
+WORKERS_PER_TARGET = int(os.getenv('WORKERS_PER_TARGET', '1'))
+QUEUE_OVERFLOW = os.getenv('QUEUE_OVERFLOW', 'block').lower()
+
+# Send scheduler: token buckets per target chat and per account
+# (messages per minute + burst size). FloodWaits up to FLOOD_WAIT_MAX
+# seconds pause only the affected target and are then retried.
+TARGET_SEND_RATE = float(os.getenv('TARGET_SEND_RATE', '20'))
+TARGET_SEND_BURST = int(os.getenv('TARGET_SEND_BURST', '5'))
+ACCOUNT_SEND_RATE = float(os.getenv('ACCOUNT_SEND_RATE', '1500'))
+ACCOUNT_SEND_BURST = int(os.getenv('ACCOUNT_SEND_BURST', '30'))
+FLOOD_WAIT_MAX = int(os.getenv('FLOOD_WAIT_MAX', '300'))
+
+# Durable outbox (SQLite, WAL): accepted signals survive a crash and are
+# replayed on the next start; already delivered ones are never re-sent.
+# Set OUTBOX_PATH empty to disable. Pending signals older than
+# OUTBOX_REPLAY_MAX_AGE seconds are not replayed. A failed send is retried
+# while running after OUTBOX_RETRY_BASE seconds, doubling up to
+# OUTBOX_RETRY_MAX, for at most OUTBOX_MAX_ATTEMPTS attempts in total.
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'outbox.db')
+OUTBOX_REPLAY_MAX_AGE = int(os.getenv('OUTBOX_REPLAY_MAX_AGE', '900'))
+OUTBOX_FLUSH_MS = float(os.getenv('OUTBOX_FLUSH_MS', '5'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE', '5'))
+OUTBOX_RETRY_MAX = float(os.getenv('OUTBOX_RETRY_MAX', '300'))
+
+# Edit & delete propagation: edits of a forwarded signal are applied to
+# its copies (coalesced over EDIT_WINDOW seconds; server-side forwards
+# cannot be edited) and deletions remove them (batched over DELETE_WINDOW
+# seconds). Copies are found through a message index that keeps
+# MESSAGE_INDEX_SIZE recent signals in memory and all of them in
+# MESSAGE_INDEX_PATH (SQLite; empty = memory only) for
+# MESSAGE_INDEX_RETENTION seconds.
+PROPAGATE_EDITS = os.getenv('PROPAGATE_EDITS', 'true').lower() == 'true'
+PROPAGATE_DELETES = os.getenv('PROPAGATE_DELETES', 'true').lower() == 'true'
+EDIT_WINDOW = float(os.getenv('EDIT_WINDOW', '2'))
+DELETE_WINDOW = float(os.getenv('DELETE_WINDOW', '1'))
+MESSAGE_INDEX_PATH = os.getenv('MESSAGE_INDEX_PATH', 'message_index.db')
+MESSAGE_INDEX_SIZE = int(os.getenv('MESSAGE_INDEX_SIZE', '10000'))
+MESSAGE_INDEX_RETENTION = int(os.getenv('MESSAGE_INDEX_RETENTION', '172800'))
+
+# Signal archive: every forwarded signal is written to ARCHIVE_PATH
+# (SQLite with a full-text index; empty = off) in batches every
+# ARCHIVE_FLUSH_MS, and can be searched on /signals or with
+# `python archive.py`. ARCHIVE_EXTRACTORS (a JSON file or inline JSON)
+# adds or replaces the regexes that pull symbol, side, entry, stop and
+# targets out of the text. ARCHIVE_RETENTION_DAYS = 0 keeps everything.
+# ARCHIVE_API serves /signals on the metrics port, which is public on
+# Render: only turn it on where that port is private.
+ARCHIVE_PATH = os.getenv('ARCHIVE_PATH', 'signals.db')
+ARCHIVE_FLUSH_MS = float(os.getenv('ARCHIVE_FLUSH_MS', '250'))
+ARCHIVE_RETENTION_DAYS = float(os.getenv('ARCHIVE_RETENTION_DAYS', '0'))
+ARCHIVE_EXTRACTORS = os.getenv('ARCHIVE_EXTRACTORS', '')
+ARCHIVE_API = os.getenv('ARCHIVE_API', 'false').lower() == 'true'
+
+# Gap recovery: the last processed message id of every source is saved to
+# CHECKPOINT_PATH; after a restart or reconnect the messages missed since
+# then are fetched (CATCHUP_BATCH_WAIT seconds between history requests)
+# and processed in order, at most CATCHUP_RATE per second. Messages older
+# than CATCHUP_MAX_AGE seconds are skipped.
+CATCHUP_ENABLED = os.getenv('CATCHUP_ENABLED', 'true').lower() == 'true'
+CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', 'checkpoints.json')
+CATCHUP_MAX_AGE = int(os.getenv('CATCHUP_MAX_AGE', '600'))
+CATCHUP_RATE = float(os.getenv('CATCHUP_RATE', '20'))
+CATCHUP_BATCH_WAIT = float(os.getenv('CATCHUP_BATCH_WAIT', '1'))
+
+# Metrics & health HTTP server (/metrics, /healthz, /readyz, /)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', os.getenv('PORT', '8080')))
+# DEBUG_ENDPOINTS adds /accounts and /profile to that server. It is unauthenticated and
+# the port is public on Render: only turn it on where the port is private.
+DEBUG_ENDPOINTS = os.getenv('DEBUG_ENDPOINTS', 'false').lower() == 'true'
+
+# Logging: LOG_LEVEL (DEBUG, INFO, WARNING, ERROR), LOG_FORMAT (text or
+# json, one record per line), LOG_ASYNC writes from a background thread.
+# DEBUG records are rate limited per message to LOG_DEBUG_RATE per second
+# (bursts of LOG_DEBUG_BURST).
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+LOG_DEBUG_RATE = float(os.getenv('LOG_DEBUG_RATE', '5'))
+LOG_DEBUG_BURST = int(os.getenv('LOG_DEBUG_BURST', '20'))
+
+# Profiling: the watchdog logs the stack and task holding the event loop
+# whenever it stalls longer than LOOP_WATCHDOG_MS (0 = off; SIGUSR1
+# toggles it). The sampling profiler runs from start with
+# PROFILE_ON_START, or between two SIGUSR2s, and writes collapsed stacks
+# (flamegraph.pl / speedscope) to PROFILE_DIR; GET /profile?seconds=N
+# (with DEBUG_ENDPOINTS) returns the next N seconds instead. USE_UVLOOP
+# runs on uvloop if installed.
+LOOP_WATCHDOG_MS = float(os.getenv('LOOP_WATCHDOG_MS', '500'))
+PROFILE_ON_START = os.getenv('PROFILE_ON_START', 'false').lower() == 'true'
+PROFILE_DIR = os.getenv('PROFILE_DIR', '.')
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+USE_UVLOOP = os.getenv('USE_UVLOOP', 'false').lower() == 'true'
+
+# Duplicate suppression: a signal whose normalized text (no whitespace,
+# emoji, markup or route headers) was already sent to the same target
+# within DEDUP_WINDOW seconds is skipped. DEDUP_MAX_ENTRIES bounds the
+# memory used. DEDUP_NEAR_DISTANCE > 0 (max 7) also skips near-duplicates
+# whose 64-bit simhash differs in at most that many bits. Texts shorter
+# than DEDUP_MIN_LENGTH characters after normalization are never suppressed.
+# DEDUP_WINDOW=0 turns suppression off like DEDUP_ENABLED=false.
+DEDUP_WINDOW = float(os.getenv('DEDUP_WINDOW', '900'))
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true' and DEDUP_WINDOW > 0
+DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '50000'))
+DEDUP_NEAR_DISTANCE = int(os.getenv('DEDUP_NEAR_DISTANCE', '0'))
+DEDUP_MIN_LENGTH = int(os.getenv('DEDUP_MIN_LENGTH', '8'))
+
+# Sender entity cache (entries, seconds) used to build sender names
+SENDER_CACHE_SIZE = int(os.getenv('SENDER_CACHE_SIZE', '1024'))
+SENDER_CACHE_TTL = int(os.getenv('SENDER_CACHE_TTL', '600'))
+
 # ============================================================================
 # DO NOT EDIT BELOW THIS LINE UNLESS YOU KNOW WHAT YOU'RE DOING
 # ============================================================================
 
-# Setup logging for Render.com
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)  # Render captures stdout
-    ]
+# Setup logging for Render.com (stdout, see logsetup.py)
+LOG_LISTENER = setup_logging(
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    use_queue=LOG_ASYNC,
+    debug_rate=LOG_DEBUG_RATE,
+    debug_burst=LOG_DEBUG_BURST
 )
 logger = logging.getLogger(__name__)
 
@@ -57,10 +279,114 @@ class TelegramSignalForwarder:
     
     def __init__(self):
         self.client = None
-        self.source_group = None
-        self.target_group = None
-        self.source_user = None
+        self.routes = None
+        self.entities = {}  # identifier (URL / @username) -> resolved entity or input peer
+        self.titles = {}    # identifier -> display title
+        self.peer_cache = PeerCache(PEER_CACHE_FILE, seed=PEER_CACHE)
+        self.time_to_first_listen = None
+        self.metrics_server = None
+        self.loop_lag = metrics.LoopLagMonitor()
+        self.watchdog = profiling.LoopWatchdog(threshold=max(LOOP_WATCHDOG_MS, 1) / 1000)
+        self.profiler = None          # SIGUSR2 / PROFILE_ON_START
+        self.request_profiler = None  # GET /profile, one at a time
+        self.pipeline = None
+        self.albums = AlbumCollector(self.process_signal, window=ALBUM_WINDOW)
+        self.digests = DigestCollector(self.queue_digest)
+        self.outbox = None
+        self.retries = set()  # tasks re-queueing failed sends after their backoff
+        self.message_index = None
+        self.archive = None
+        self.edits = EditCoalescer(self.apply_edit, window=EDIT_WINDOW)
+        self.deletes = DeleteBatcher(self.delete_copies, window=DELETE_WINDOW)
+        self.checkpoints = Checkpoints(CHECKPOINT_PATH) if CATCHUP_ENABLED else None
+        self.recovery = None
+        self.live_messages = TTLCache(maxsize=4096, ttl=max(CATCHUP_MAX_AGE, 60))  # (chat, id) seen live
+        self.scheduler = SendScheduler(
+            target_rate=TARGET_SEND_RATE,
+            target_burst=TARGET_SEND_BURST,
+            account_rate=ACCOUNT_SEND_RATE,
+            account_burst=ACCOUNT_SEND_BURST,
+            max_flood_wait=FLOOD_WAIT_MAX
+        )
+        self.pool = ClientPool(self.scheduler)
+        self.dedup = DuplicateIndex(
+            window=DEDUP_WINDOW,
+            maxsize=DEDUP_MAX_ENTRIES,
+            near_distance=DEDUP_NEAR_DISTANCE
+        ) if DEDUP_ENABLED else None
+        self.sender_cache = TTLCache(maxsize=SENDER_CACHE_SIZE, ttl=SENDER_CACHE_TTL)
+        self.handlers = []  # (callback, event builder) registered for the current routes
+        self.reload_lock = asyncio.Lock()
+        self.config_watcher = None
+        self.reload_task = None
         self.is_running = False
+        self.started = False  # anything to release in stop_forwarder()
+    
+    def build_route_table(self, reread=False):
+        """
+        Build the routing table.
+        
+        Uses ROUTES_FILE when set, otherwise a single route built from the
+        SOURCE_GROUP_URL / TARGET_GROUP_URL / SOURCE_USERNAME / SIGNAL_HEADER
+        environment variables. With reread (a runtime reload), the .env
+        file is read again for the ones not set by the process environment.
+        """
+        transforms = []
+        if STRIP_LINKS:
+            transforms.append({'strip': 'links'})
+        if STRIP_MENTIONS:
+            transforms.append({'strip': 'mentions'})
+        defaults = {
+            'mode': FORWARD_MODE,
+            'header_mode': HEADER_MODE,
+            'digest_window': DIGEST_WINDOW,
+            'digest_max': DIGEST_MAX,
+            'header_template': HEADER_TEMPLATE,
+            'footer_template': FOOTER_TEMPLATE,
+            'timezone': TIMEZONE,
+            'transforms': transforms
+        }
+        if ROUTES_FILE:
+            return load_routes(ROUTES_FILE, defaults)
+        
+        settings = {
+            'SOURCE_GROUP_URL': SOURCE_GROUP_URL,
+            'TARGET_GROUP_URL': TARGET_GROUP_URL,
+            'SOURCE_USERNAME': SOURCE_USERNAME,
+            'SIGNAL_HEADER': SIGNAL_HEADER
+        }
+        if reread:
+            settings.update(env_file_values(ENV_FILE, settings, fixed=PROCESS_ENV_NAMES))
+        
+        source_users = []
+        username = settings['SOURCE_USERNAME']
+        if username and username != '@Systembadgetickverify02':
+            source_users.append(username)
+        
+        return RouteTable([
+            Route(
+                name='default',
+                source=settings['SOURCE_GROUP_URL'],
+                target=settings['TARGET_GROUP_URL'],
+                source_users=source_users,
+                header=settings['SIGNAL_HEADER'],
+                **defaults
+            )
+        ])
+    
+    def entity_title(self, identifier):
+        """Display name of a resolved chat or user, falling back to its identifier."""
+        if self.titles.get(identifier):
+            return self.titles[identifier]
+        entity = self.entities.get(identifier)
+        if entity is None:
+            return identifier
+        return (
+            getattr(entity, 'title', None)
+            or getattr(entity, 'username', None)
+            or getattr(entity, 'first_name', None)
+            or identifier
+        )
         
     def extract_username_from_url(self, url):
         """
@@ -91,15 +417,76 @@ class TelegramSignalForwarder:
         
         return url
     
+    def read_verification_code(self):
+        """
+        Look for a login code in the environment, the .env file or
+        TELEGRAM_CODE_FILE. The files are re-read on every call, so a code
+        added while we wait is picked up without a restart.
+        """
+        code = os.getenv('TELEGRAM_CODE') or dotenv_values().get('TELEGRAM_CODE')
+        if not code and TELEGRAM_CODE_FILE and os.path.exists(TELEGRAM_CODE_FILE):
+            with open(TELEGRAM_CODE_FILE, 'r', encoding='utf-8') as handle:
+                code = handle.read().strip()
+        return code or None
+    
+    async def resolve_entities(self, identifiers, account=None):
+        """
+        Resolve chats/users, cheapest first.
+        
+        Identifiers found in the peer cache become input peers with no
+        network call; the rest are fetched concurrently with get_entity()
+        and added to the cache. Returns {identifier: error} for failures.
+        
+        Access hashes differ per account, so extra accounts of the client
+        pool resolve into their own entities, cached under their user id.
+        """
+        account = account or self.pool.primary
+        prefix = "" if account.primary else f"{account.user_id}:"
+        label = "" if account.primary else f" ({account.name})"
+        
+        missing = []
+        for identifier in identifiers:
+            input_peer, title = self.peer_cache.get(prefix + identifier)
+            if input_peer is None:
+                missing.append(identifier)
+                continue
+            account.entities[identifier] = input_peer
+            account.titles[identifier] = title or identifier
+            logger.info(f"⚡ From peer cache{label}: {account.titles[identifier]}")
+        
+        failed = {}
+        if not missing:
+            return failed
+        
+        logger.info(f"🔍 Resolving {len(missing)} chat(s)/user(s) concurrently{label}...")
+        results = await asyncio.gather(
+            *(account.client.get_entity(self.extract_username_from_url(identifier)) for identifier in missing),
+            return_exceptions=True
+        )
+        for identifier, result in zip(missing, results):
+            if isinstance(result, Exception):
+                failed[identifier] = result
+                continue
+            account.entities[identifier] = result
+            account.titles[identifier] = self.titles.get(identifier) or self.entity_title(identifier)
+            self.peer_cache.store(prefix + identifier, result, account.titles[identifier])
+            logger.info(f"✅ Found{label}: {account.titles[identifier]}")
+        
+        self.peer_cache.save()
+        return failed
+    
     async def initialize_telegram_client(self):
         """
         Initialize Telegram client and connect to Telegram.
         
         This function will:
-        1. Connect to Telegram using your credentials
+        1. Connect to Telegram using SESSION_STRING or the session file
         2. Handle first-time phone verification
-        3. Get the source and target groups
-        4. Find the specific user (if configured)
+        3. Get the source and target groups of every route
+        4. Find the specific users (if configured)
+        
+        Steps 3 and 4 use the peer cache first and resolve anything else
+        concurrently, so a warm restart needs no get_entity() calls.
         """
         logger.info("🚀 INITIALIZING TELEGRAM SIGNAL FORWARDER")
         logger.info("=" * 60)
@@ -107,18 +494,13 @@ class TelegramSignalForwarder:
         try:
             # Step 1: Create Telegram client
             logger.info("📱 Creating Telegram client...")
-            self.client = TelegramClient(
-                'signal_forwarder_session',
-                API_ID,
-                API_HASH,
-                device_model="Signal Forwarder v2.0",
-                system_version="Render Cloud",
-                app_version="2.0.0",
-                connection_retries=10,
-                timeout=60,
-                request_retries=5,
-                auto_reconnect=True
-            )
+            if SESSION_STRING:
+                logger.info("🔑 Using SESSION_STRING")
+                session = StringSession(SESSION_STRING)
+            else:
+                session = 'signal_forwarder_session'
+            self.client = self.create_client(session)
+            self.pool.add(Account('primary', self.client, self.entities, self.titles, primary=True))
             
             # Step 2: Connect to Telegram
             logger.info("🔗 Connecting to Telegram servers...")
@@ -131,7 +513,7 @@ class TelegramSignalForwarder:
                 await self.client.send_code_request(PHONE_NUMBER)
                 
                 # Check for verification code in environment
-                verification_code = os.getenv('TELEGRAM_CODE')
+                verification_code = self.read_verification_code()
                 
                 if verification_code:
                     logger.info("✅ Found verification code in environment variables")
@@ -145,22 +527,20 @@ class TelegramSignalForwarder:
                     logger.info("1️⃣ Check your Telegram app for a verification code")
                     logger.info("2️⃣ Go to Render.com dashboard")
                     logger.info("3️⃣ Find your 'signal-forwarder' service")
-                    logger.info("4️⃣ Click 'Environment' tab")
-                    logger.info("5️⃣ Add a new environment variable:")
-                    logger.info("   - Name: TELEGRAM_CODE")
-                    logger.info("   - Value: [the code from Telegram]")
-                    logger.info("6️⃣ Click 'Save Changes'")
-                    logger.info("7️⃣ Wait for auto-restart (about 30 seconds)")
+                    logger.info("4️⃣ Open the 'Shell' tab")
+                    logger.info(f"5️⃣ Run: echo [the code from Telegram] > {TELEGRAM_CODE_FILE}")
+                    logger.info("   (or add TELEGRAM_CODE to your .env file)")
+                    logger.info("6️⃣ The forwarder picks it up within a second")
                     logger.info("=" * 60)
                     logger.info("⏳ Waiting for verification code...")
                     
-                    # Wait for code (Render will restart when env var is added)
+                    # Wait for code; the file and .env are re-read on every poll
                     for i in range(180):  # Wait up to 3 minutes
                         await asyncio.sleep(1)
                         if i % 30 == 0:  # Log every 30 seconds
                             logger.info(f"⏱️ Still waiting... ({i+1}/180 seconds)")
                         
-                        verification_code = os.getenv('TELEGRAM_CODE')
+                        verification_code = self.read_verification_code()
                         if verification_code:
                             logger.info("✅ Verification code received!")
                             await self.client.sign_in(PHONE_NUMBER, verification_code)
@@ -168,41 +548,59 @@ class TelegramSignalForwarder:
                     
                     if not verification_code:
                         logger.error("❌ No verification code provided after 3 minutes")
-                        logger.info("Please add TELEGRAM_CODE environment variable and redeploy")
+                        logger.info(f"Please write the code to {TELEGRAM_CODE_FILE} or set TELEGRAM_CODE and redeploy")
                         return False
+                
+                if not SESSION_STRING:
+                    if SHOW_SESSION_STRING:
+                        logger.warning("🔑 SESSION_STRING (treat it like a password):")
+                        logger.warning(StringSession.save(self.client.session))
+                    else:
+                        logger.info("💡 Set SHOW_SESSION_STRING=true once to get a SESSION_STRING for fast restarts")
             else:
                 logger.info("✅ Using existing session (already logged in)")
             
-            # Step 4: Get user information
-            me = await self.client.get_me()
-            logger.info(f"👤 Logged in as: {me.first_name} (@{me.username if me.username else 'no_username'})")
+            # Step 4: Get user information, while the groups resolve
+            me_task = asyncio.ensure_future(self.client.get_me())
             
-            # Step 5: Get source group
-            logger.info("🔍 Finding source group...")
-            source_identifier = self.extract_username_from_url(SOURCE_GROUP_URL)
-            logger.info(f"   Looking for: {source_identifier}")
-            self.source_group = await self.client.get_entity(source_identifier)
-            logger.info(f"✅ Source group found: {self.source_group.title}")
+            # Step 5: Get source and target groups
+            logger.info("🔍 Finding source and target groups...")
+            groups = list(dict.fromkeys(self.routes.sources + self.routes.targets))
+            failed = await self.resolve_entities(groups)
+            if failed:
+                for identifier, error in failed.items():
+                    logger.error(f"❌ Could not find {identifier}: {error}")
+                me_task.cancel()
+                raise ValueError(f"{len(failed)} group(s) could not be resolved")
             
-            # Step 6: Get target group
-            logger.info("🔍 Finding target group...")
-            target_identifier = self.extract_username_from_url(TARGET_GROUP_URL)
-            logger.info(f"   Looking for: {target_identifier}")
-            self.target_group = await self.client.get_entity(target_identifier)
-            logger.info(f"✅ Target group found: {self.target_group.title}")
+            # Step 6: Get specific users (if configured)
+            user_ids = {}
+            if self.routes.source_users:
+                logger.info(f"🔍 Finding specific users: {', '.join(self.routes.source_users)}")
+                failed = await self.resolve_entities(self.routes.source_users)
+                for username in self.routes.source_users:
+                    if username in failed:
+                        logger.warning(f"⚠️ Could not find user {username}: {failed[username]}")
+                        logger.info("Will forward signals from any user on the affected routes")
+                    else:
+                        user_ids[username] = utils.get_peer_id(self.entities[username])
+            if not user_ids:
+                logger.info("📢 Will forward signals from ANY user in source groups")
             
-            # Step 7: Get specific user (if configured)
-            if SOURCE_USERNAME and SOURCE_USERNAME != '@Systembadgetickverify02':
-                logger.info(f"🔍 Finding specific user: {SOURCE_USERNAME}")
-                try:
-                    self.source_user = await self.client.get_entity(SOURCE_USERNAME)
-                    user_display = self.source_user.username or self.source_user.first_name or f"User {self.source_user.id}"
-                    logger.info(f"✅ Specific user found: {user_display}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Could not find user {SOURCE_USERNAME}: {e}")
-                    logger.info("Will forward signals from any user")
-            else:
-                logger.info("📢 Will forward signals from ANY user in source group")
+            me = await me_task
+            self.pool.primary.user_id = me.id
+            logger.info(f"👤 Logged in as: {me.first_name} (@{me.username if me.username else 'no_username'})")
+            
+            # Extra accounts for the client pool (optional)
+            if EXTRA_SESSION_STRINGS:
+                await self.connect_extra_accounts()
+            
+            # Step 7: Index routes by resolved source chat
+            source_ids = {
+                source: utils.get_peer_id(self.entities[source])
+                for source in self.routes.sources
+            }
+            self.routes.bind(source_ids, user_ids)
             
             logger.info("=" * 60)
             logger.info("✅ INITIALIZATION COMPLETE!")
@@ -220,114 +618,1066 @@ class TelegramSignalForwarder:
             logger.error(f"TARGET_GROUP_URL: {'✓ Set' if TARGET_GROUP_URL else '✗ Missing'}")
             return False
     
-    def is_signal_message(self, message_text):
+    def create_client(self, session):
+        """A TelegramClient with the forwarder's connection settings."""
+        return TelegramClient(
+            session,
+            API_ID,
+            API_HASH,
+            device_model="Signal Forwarder v2.0",
+            system_version="Render Cloud",
+            app_version="2.0.0",
+            connection_retries=10,
+            timeout=60,
+            request_retries=5,
+            auto_reconnect=True,
+            flood_sleep_threshold=0  # FloodWaits are handled per target by self.scheduler / self.pool
+        )
+    
+    async def connect_account(self, session_string):
         """
-        Check if a message contains the signal header.
+        Connect one extra account and resolve the groups it sends to.
         
-        Returns True if message contains "🔔 NEW SIGNAL!" anywhere in the text.
+        Extra accounts are never logged in interactively: the session
+        string must belong to an authorized account (log in with it as
+        the primary once and use SHOW_SESSION_STRING to get it).
         """
-        if not message_text:
-            return False
+        client = self.create_client(StringSession(session_string))
+        await client.connect()
+        try:
+            if not await client.is_user_authorized():
+                raise ValueError("session is not logged in")
+            me = await client.get_me()
+            account = Account(f"@{me.username}" if me.username else str(me.id), client)
+            account.user_id = me.id
+            
+            # Forward-mode routes forward from the source, so it must be reachable too
+            groups = list(dict.fromkeys(
+                self.routes.targets + [route.source for route in self.routes.routes if route.forwards_media]
+            ))
+            failed = await self.resolve_entities(groups, account)
+            for identifier, error in failed.items():
+                logger.warning(f"⚠️ {account.name} cannot reach {identifier}: {error}")
+            if not any(target in account.entities for target in self.routes.targets):
+                raise ValueError("cannot reach any target group")
+        except Exception:
+            await client.disconnect()
+            raise
+        
+        self.pool.add(account)
+        logger.info(f"👥 Added {account.name} to the client pool")
+        return account
+    
+    async def connect_extra_accounts(self):
+        """Connect every EXTRA_SESSION_STRINGS account concurrently; failures are skipped."""
+        logger.info(f"👥 Connecting {len(EXTRA_SESSION_STRINGS)} extra account(s)...")
+        results = await asyncio.gather(
+            *(self.connect_account(session) for session in EXTRA_SESSION_STRINGS),
+            return_exceptions=True
+        )
+        for index, result in enumerate(results, start=1):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Extra account #{index} not used: {result}")
         
-        # Check if signal header is in the message
-        return SIGNAL_HEADER in message_text
+        for target in self.routes.targets:
+            self.pool.candidates(target)
+        logger.info(f"👥 Client pool: {len(self.pool)} account(s)")
+        for name, report in self.pool.health().items():
+            logger.info(f"   {name}: {len(report['targets'])} target(s)")
+    
+    async def get_sender_cached(self, message):
+        """
+        Resolve a message's sender through the TTL/LRU entity cache.
+        
+        Only misses (or expired entries) cost a get_sender() call.
+        """
+        sender = self.sender_cache.get(message.sender_id)
+        if sender is None:
+            sender = await message.get_sender()
+            if sender is not None:
+                self.sender_cache.set(message.sender_id, sender)
+        return sender
+    
+    def sender_display_name(self, sender):
+        """Human readable name for a user, channel or group."""
+        if getattr(sender, 'username', None):
+            return f"@{sender.username}"
+        if getattr(sender, 'first_name', None):
+            if getattr(sender, 'last_name', None):
+                return f"{sender.first_name} {sender.last_name}"
+            return sender.first_name
+        return getattr(sender, 'title', None) or "Unknown"
+    
+    def match_routes(self, chat_id, message_text, sender_id=None):
+        """
+        Find the routes a message should be forwarded on.
+        
+        The text is scanned once against the headers and keywords of
+        every route for this chat (see routing.AhoCorasickMatcher).
+        Messages without text only match forward-mode routes.
+        """
+        return self.routes.match(chat_id, message_text or "", sender_id)
     
     async def forward_signal_message(self, event):
         """
         Process and forward a signal message.
         
         This function:
-        1. Checks if message is from the correct user (if specified)
-        2. Checks if message contains the signal header
-        3. Adds timestamp and formatting
-        4. Forwards to target group
+        1. Matches sender id and raw text against every route for its
+           source group (no network round trips)
+        2. Resolves the sender through the entity cache, only for matches
+        3. Queues it for the target group of each matching route
+        
+        Album parts are collected first (see media.AlbumCollector) and
+        handled as one signal. The actual send happens in deliver_signal()
+        on a pipeline worker, so a slow send or a configured delay never
+        blocks this handler.
         """
         try:
             message = event.message
+            metrics.MESSAGES_SEEN.inc()
             
             # Skip edited messages
             if message.edit_date:
                 return
             
-            # Get sender information
-            sender = await message.get_sender()
-            if not sender:
-                logger.warning("⚠️ Could not get sender information")
+            # Already handled: an update in flight while handlers were swapped
+            if self.seen_live(event.chat_id, message.id):
                 return
             
-            # Check if we're filtering by specific user
-            if self.source_user:
-                if sender.id != self.source_user.id:
-                    return  # Not from the specified user
+            await self.handle_message(event.chat_id, message)
             
-            # Get message text
-            message_text = message.text or message.message or ""
-            if not message_text:
-                return  # Skip media-only messages
-            
-            # Check if this is a signal message
-            if not self.is_signal_message(message_text):
+        except Exception as e:
+            logger.error(f"❌ ERROR FORWARDING MESSAGE: {e}")
+    
+    async def handle_message(self, chat_id, message, recovered=False):
+        """
+        Run one source message through the match pipeline.
+        
+        Live messages come from forward_signal_message(); messages missed
+        while disconnected come from gap recovery (see catchup.py), in
+        order. Either way the source checkpoint is advanced afterwards.
+        """
+        if not recovered:
+            self.live_messages.set((chat_id, message.id), True)
+        try:
+            # Album parts are matched together once the whole album is in
+            if message.grouped_id and self.routes.forwards_media(chat_id):
+                self.albums.add(chat_id, message)
+            else:
+                await self.process_signal(chat_id, [message])
+        finally:
+            if self.checkpoints is not None:
+                date = message.date.timestamp() if message.date else None
+                self.checkpoints.advance(chat_id, message.id, date)
+    
+    async def recover_message(self, chat_id, message):
+        """GapRecovery callback: process a missed message like a live one."""
+        metrics.MESSAGES_SEEN.inc()
+        await self.handle_message(chat_id, message, recovered=True)
+    
+    def seen_live(self, chat_id, message_id):
+        return self.live_messages.get((chat_id, message_id)) is not None
+    
+    async def process_signal(self, chat_id, messages):
+        """Match one message (or one whole album) and queue it on its routes."""
+        first = messages[0]
+        
+        # Cheap prefilter on data already in the update: chat id,
+        # sender id and the raw text. No network calls happen here.
+        raw_text = "\n".join(m.message for m in messages if m.message)
+        with profiling.span('match'):
+            routes = self.match_routes(chat_id, raw_text, first.sender_id)
+        if not routes:
+            return
+        for route in routes:
+            metrics.MESSAGES_MATCHED.inc(route=route.name)
+        
+        # Drop reposts of a signal already sent to the same target
+        fingerprint = None
+        if self.dedup is not None:
+            with profiling.span('dedup'):
+                routes, fingerprint = self.drop_duplicates(chat_id, first.id, raw_text, routes)
+            if not routes:
                 return
+        
+        # Only matching signals pay for sender resolution
+        with profiling.span('sender'):
+            sender = await self.get_sender_cached(first)
+        if not sender:
+            logger.warning("⚠️ Could not get sender information")
+            return
+        sender_name = self.sender_display_name(sender)
+        
+        # Get message text (with formatting)
+        message_text = "\n".join(m.text for m in messages if m.text) or raw_text
+        message_ids = [m.id for m in messages]
+        date = first.date.timestamp() if first.date else time.time()
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "📨 Signal %s/%s from %s on %s (%d message(s)): %.150s",
+                chat_id, first.id, sender_name, ",".join(route.name for route in routes),
+                len(messages), message_text
+            )
+        
+        # Record the signal durably before queueing it (one group commit)
+        if self.outbox:
+            payload = {'text': message_text, 'sender_name': sender_name, 'message_ids': message_ids, 'date': date,
+                       'sender_id': first.sender_id}
+            with profiling.span('outbox'):
+                accepted = await asyncio.gather(*(
+                    self.outbox.accept(chat_id, first.id, route.name, payload) for route in routes
+                ))
+            routes = [route for route, ok in zip(routes, accepted) if ok]
+            if not routes:
+                logger.debug("⏭️ Already handled %s/%s, skipping", chat_id, first.id)
+                return
+        
+        # Hand the signal to the pipeline; the delay becomes a deadline
+        loop = asyncio.get_running_loop()
+        accepted_at = loop.time()
+        for route in routes:
+            job = ForwardJob(
+                route=route,
+                chat_id=chat_id,
+                message_id=first.id,
+                text=message_text,
+                sender_name=sender_name,
+                accepted_at=accepted_at,
+                deadline=accepted_at + FORWARD_DELAY,
+                messages=messages,
+                message_ids=message_ids,
+                date=date,
+                sender_id=first.sender_id,
+                fingerprint=fingerprint
+            )
+            if await self.submit(job):
+                logger.debug("📥 Queued %s/%s for %s", chat_id, first.id, route.target)
+    
+    async def submit(self, job):
+        """Queue a job on the pipeline, or in its route's digest."""
+        if job.route.digests:
+            self.digests.add(job)
+            return True
+        return await self.pipeline.submit(job)
+    
+    async def queue_digest(self, digest):
+        """DigestCollector callback: a batch is complete, queue it as one job."""
+        await self.pipeline.submit(digest)
+    
+    def drop_duplicates(self, chat_id, message_id, raw_text, routes):
+        """
+        Remove routes whose target already got this signal within DEDUP_WINDOW.
+        
+        The text is normalized once (headers of every route stripped) and
+        its fingerprint checked per target, so the same signal from two
+        sources is sent once, while different targets each get a copy.
+        Returns the routes to send on and the fingerprint recorded for
+        them (None if the text is too short to check).
+        """
+        normalized = normalize(raw_text, [route.header for route in self.routes.routes])
+        if len(normalized) < DEDUP_MIN_LENGTH:
+            return routes, None
+        
+        fingerprint = Fingerprint(normalized, near=self.dedup.near)
+        kept = []
+        for route in routes:
+            if self.dedup.check(route.target, fingerprint):
+                metrics.DUPLICATES.inc(route=route.name)
+                logger.debug("♻️ Duplicate of a recent signal, not sending %s/%s to %s", chat_id, message_id, route.target)
+            else:
+                kept.append(route)
+        return kept, fingerprint
+    
+    def load_extractors(self):
+        """ARCHIVE_EXTRACTORS overrides: inline JSON or the path of a JSON file."""
+        if not ARCHIVE_EXTRACTORS:
+            return None
+        if ARCHIVE_EXTRACTORS.lstrip().startswith('{'):
+            return json.loads(ARCHIVE_EXTRACTORS)
+        with open(ARCHIVE_EXTRACTORS, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    
+    def compile_templates(self, routes=None):
+        """
+        Compile every route's header, footer and transforms once, now
+        that source and target titles are known (routes defaults to the
+        table in use).
+        """
+        clocks = {}  # one per (timezone, format), shared by routes
+        for route in (routes or self.routes).routes:
+            key = (route.timezone or TIMEZONE, TIMESTAMP_FORMAT)
+            if key not in clocks:
+                clocks[key] = Clock(*key)
+            route.template = MessageTemplate(
+                header=(route.header_template or DEFAULT_HEADER) if ADD_TIMESTAMP else "",
+                footer=route.footer_template,
+                transforms=route.transforms,
+                static={
+                    'source': self.entity_title(route.source),
+                    'target': self.entity_title(route.target),
+                    'route': route.name,
+                },
+                clock=clocks[key]
+            )
+    
+    def signal_prefix(self, job):
+        """Text placed above the signal in the target group (the header, if enabled)."""
+        return job.route.template.header(job.sender_name)
+    
+    def signal_suffix(self, job):
+        """Text placed below the signal in the target group (the footer, if any)."""
+        return job.route.template.footer(job.sender_name)
+    
+    def format_signal(self, job):
+        """Build the text that is sent to the target group."""
+        return job.route.template.render(job.text, job.sender_name)
+    
+    async def source_media(self, job, account):
+        """
+        Media of a signal as seen by account.
+        
+        File references are tied to the account that fetched the message,
+        so anyone but the primary (which received it) fetches its own copy.
+        """
+        messages = job.messages if account.primary else None
+        if not messages:
+            messages = await account.client.get_messages(account.entities[job.route.source], ids=job.message_ids)
+        return [m.media for m in messages if m and (m.photo or m.document)]
+    
+    async def send_copy(self, job):
+        """Send a signal's text as a new message. Returns its ForwardRecord."""
+        target = job.route.target
+        prefix = self.signal_prefix(job)
+        suffix = self.signal_suffix(job)
+        text = prefix + job.route.template.body(job.text) + suffix
+        
+        async def send(account):
+            sent = await account.client.send_message(entity=account.entities[target], message=text)
+            ids = sent_message_ids(sent)
+            return ForwardRecord(job.route.name, target, account.name, ids, ids[0] if ids else None, TEXT, prefix,
+                                 suffix=suffix)
+        
+        return await self.pool.send(target, send)
+    
+    async def forward_original(self, job):
+        """
+        Forward the original message(s) of a signal server-side.
+        
+        Nothing is downloaded or re-uploaded: albums go out in one
+        forward_messages call, and in caption mode the media is re-sent by
+        reference with the header and text as its caption. Follow-up sends
+        stay on the account that made the first one, so every message of
+        the copy can later be edited or deleted by the same account.
+        Returns the copy's ForwardRecord.
+        """
+        source = job.route.source
+        target = job.route.target
+        header = self.signal_prefix(job)
+        
+        if job.route.header_mode == 'caption':
+            footer = self.signal_suffix(job)
+            caption = header + job.route.template.body(job.text) + footer
+            fits = len(caption) <= MEDIA_CAPTION_LIMIT
             
-            # Get sender display name
-            sender_name = "Unknown"
-            if hasattr(sender, 'username') and sender.username:
-                sender_name = f"@{sender.username}"
-            elif hasattr(sender, 'first_name') and sender.first_name:
-                sender_name = sender.first_name
-                if hasattr(sender, 'last_name') and sender.last_name:
-                    sender_name += f" {sender.last_name}"
-            elif hasattr(sender, 'title'):
-                sender_name = sender.title
+            async def send_media(account):
+                media = await self.source_media(job, account)
+                if not media:
+                    return account, []
+                captions = [caption] + [""] * (len(media) - 1) if fits else None
+                sent = await account.client.send_file(account.entities[target], media, caption=captions)
+                return account, sent_message_ids(sent)
             
-            logger.info("🎯" * 30)
-            logger.info(f"📨 NEW SIGNAL DETECTED!")
-            logger.info(f"👤 From: {sender_name}")
-            logger.info(f"📝 Message preview: {message_text[:150]}...")
+            account, ids = await self.pool.send(target, send_media, requires=(source,))
+            if ids and fits:
+                return ForwardRecord(job.route.name, target, account.name, ids, ids[0], CAPTION, header,
+                                     suffix=footer)
             
-            # Apply delay if configured
-            if FORWARD_DELAY > 0:
-                logger.info(f"⏳ Waiting {FORWARD_DELAY} seconds before forwarding...")
-                await asyncio.sleep(FORWARD_DELAY)
+            # Too long for a caption (or no media): the text follows separately
+            sent = await self.pool.send(target, lambda account: account.client.send_message(
+                entity=account.entities[target], message=caption
+            ), account=account.name)
+            text_ids = sent_message_ids(sent)
+            return ForwardRecord(job.route.name, target, account.name, ids + text_ids,
+                                 text_ids[0] if text_ids else None, TEXT, header, suffix=footer)
+        
+        async def forward(account):
+            sent = await account.client.forward_messages(
+                account.entities[target], job.message_ids, from_peer=account.entities[source]
+            )
+            return account, sent_message_ids(sent)
+        
+        async def send_header(account):
+            sent = await account.client.send_message(entity=account.entities[target], message=header.rstrip())
+            return account, sent_message_ids(sent)
+        
+        if header:
+            account, header_ids = await self.pool.send(target, send_header, requires=(source,))
+            _, ids = await self.pool.send(target, forward, account=account.name)
+        else:
+            header_ids = []
+            account, ids = await self.pool.send(target, forward, requires=(source,))
+        return ForwardRecord(job.route.name, target, account.name, header_ids + ids, None, FORWARD, header)
+    
+    async def deliver_signal(self, job):
+        """
+        Send one queued signal to its target group.
+        
+        Called by the pipeline workers. Returns True on success.
+        """
+        if isinstance(job, Digest):
+            return await self.deliver_digest(job)
+        
+        target_title = self.entity_title(job.route.target)
+        # Time in the queue, FORWARD_DELAY included
+        waited = asyncio.get_running_loop().time() - job.accepted_at
+        metrics.STAGE_SECONDS.observe(max(0.0, waited), stage='delay')
+        try:
+            with profiling.span('send'):
+                if job.route.forwards_media:
+                    record = await self.forward_original(job)
+                else:
+                    record = await self.send_copy(job)
+        except Exception as e:
+            logger.error(f"❌ ERROR FORWARDING MESSAGE to {target_title} (route {job.route.name}): {e}")
+            metrics.FORWARDS.inc(route=job.route.name, result='failure')
+            await self.retry_failed(job)
+            return False
+        
+        metrics.FORWARDS.inc(route=job.route.name, result='success')
+        latency = max(0.0, time.time() - job.date) if job.date else None
+        if latency is not None:
+            metrics.FORWARD_LATENCY.observe(latency, route=job.route.name)
+        if self.outbox:
+            await self.outbox.delivered(job.chat_id, job.message_id, job.route.name)
+        if self.message_index:
+            try:
+                await self.message_index.add(job.chat_id, job.message_id, record)
+            except Exception as e:
+                # The copy is out; it just cannot follow edits and deletions
+                logger.warning(f"⚠️ Could not index copy of {job.chat_id}/{job.message_id}: {e}")
+        self.archive_signal(job, latency)
+        
+        # One structured record per forwarded signal
+        logger.info(
+            "✅ SIGNAL FORWARDED: %s → %s (route %s, from %s, %s)",
+            self.entity_title(job.route.source), target_title, job.route.name, job.sender_name,
+            f"{latency:.2f}s" if latency is not None else "replayed",
+            extra={
+                'event': 'signal_forwarded',
+                'route': job.route.name,
+                'source_chat': job.chat_id,
+                'message_id': job.message_id,
+                'messages': len(job.message_ids),
+                'target': job.route.target,
+                'sender': job.sender_name,
+                'latency': round(latency, 3) if latency is not None else None,
+            }
+        )
+        return True
+    
+    def archive_signal(self, job, latency=None):
+        """Queue a delivered signal for the archive (written in the next batch)."""
+        if self.archive is None:
+            return
+        try:
+            self.archive.add(
+                chat_id=job.chat_id,
+                message_id=job.message_id,
+                route=job.route.name,
+                source=job.route.source,
+                target=job.route.target,
+                text=job.text,
+                posted_at=job.date or time.time(),
+                sender=job.sender_name,
+                sender_id=job.sender_id,
+                latency=latency
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not archive signal {job.chat_id}/{job.message_id}: {e}")
+    
+    async def retry_failed(self, job):
+        """
+        Count a failed send and queue the signal again after a backoff.
+        
+        Gives up (and expires the outbox entry) after OUTBOX_MAX_ATTEMPTS
+        attempts or once the signal is older than OUTBOX_REPLAY_MAX_AGE.
+        Retries still waiting at shutdown are replayed on the next start.
+        """
+        job.attempts += 1
+        if self.outbox:
+            await self.outbox.failed(job.chat_id, job.message_id, job.route.name)
+        
+        too_old = job.date is not None and time.time() - job.date > OUTBOX_REPLAY_MAX_AGE
+        if job.attempts >= OUTBOX_MAX_ATTEMPTS or too_old or not self.is_running:
+            if self.is_running:
+                reason = "too old" if too_old else f"{job.attempts} failed attempts"
+                logger.error(f"❌ Giving up on message {job.message_id} on route {job.route.name}: {reason}")
+                self.forget_duplicate(job)
+                if self.outbox:
+                    await self.outbox.expire(job.chat_id, job.message_id, job.route.name)
+            return
+        
+        delay = retry_delay(job.attempts, OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX)
+        logger.info(f"🔁 Retrying message {job.message_id} on route {job.route.name} in {delay:g}s "
+                    f"(attempt {job.attempts + 1}/{OUTBOX_MAX_ATTEMPTS})")
+        task = asyncio.create_task(self.resubmit(job, delay))
+        self.retries.add(task)
+        task.add_done_callback(self.retries.discard)
+    
+    async def abandon(self, job):
+        """Pipeline callback: the overflow policy dropped a signal (or digest), don't replay it."""
+        for dropped in job.jobs if isinstance(job, Digest) else (job,):
+            self.forget_duplicate(dropped)
+            if self.outbox:
+                await self.outbox.expire(dropped.chat_id, dropped.message_id, dropped.route.name)
+    
+    def forget_duplicate(self, job):
+        """A signal will never be delivered: let a repost of it through DEDUP_WINDOW."""
+        if self.dedup is not None and job.fingerprint is not None:
+            self.dedup.forget(job.route.target, job.fingerprint)
+    
+    async def resubmit(self, job, delay):
+        await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+        job.accepted_at = job.deadline = loop.time()
+        try:
+            await self.submit(job)
+        except Exception as e:
+            logger.error(f"❌ Could not re-queue message {job.message_id} on route {job.route.name}: {e}")
+    
+    def format_digest(self, digest):
+        """
+        Messages for a digest: its signals joined, split at MESSAGE_TEXT_LIMIT.
+        
+        The route's header goes above the first message and its footer
+        below the last, rendered once with every sender of the batch.
+        Returns [(text, [index into digest.jobs, ...]), ...] so a partly
+        sent digest knows which signals went out.
+        """
+        separator = "\n\n━━━━━━━━━━━━━━━━━━\n\n"
+        template = digest.route.template
+        senders = ", ".join(dict.fromkeys(job.sender_name for job in digest.jobs if job.sender_name))
+        header = template.header(senders)
+        footer = template.footer(senders)
+        if ADD_TIMESTAMP:
+            entries = [f"👤 {job.sender_name}\n{template.body(job.text)}" for job in digest.jobs]
+        else:
+            entries = [template.body(job.text) for job in digest.jobs]
+        parts = pack_parts(entries, MESSAGE_TEXT_LIMIT - len(header) - len(footer), separator)
+        if parts:
+            parts[0] = (header + parts[0][0], parts[0][1])
+            parts[-1] = (parts[-1][0] + footer, parts[-1][1])
+        return parts
+    
+    async def deliver_digest(self, digest):
+        """
+        Send a batch of signals of one route as one combined message
+        (several if it is over Telegram's text limit).
+        
+        If a message fails after earlier ones went out, only the signals
+        that were not (completely) sent are retried.
+        
+        Digests are not added to the message index: a copy shared by many
+        signals cannot follow the edits or deletion of just one of them.
+        """
+        route = digest.route
+        target = route.target
+        parts = self.format_digest(digest)
+        
+        async def send(account, text):
+            return await account.client.send_message(entity=account.entities[target], message=text)
+        
+        sent = 0
+        error = None
+        try:
+            with profiling.span('send'):
+                for text, _ in parts:
+                    await self.pool.send(target, lambda account, text=text: send(account, text))
+                    sent += 1
+        except Exception as e:
+            error = e
+        unsent = {index for _, indexes in parts[sent:] for index in indexes}
+        delivered = [job for index, job in enumerate(digest.jobs) if index not in unsent]
+        
+        now = time.time()
+        loop_now = asyncio.get_running_loop().time()
+        for job in delivered:
+            metrics.FORWARDS.inc(route=route.name, result='success')
+            metrics.STAGE_SECONDS.observe(max(0.0, loop_now - job.accepted_at), stage='delay')
+            latency = max(0.0, now - job.date) if job.date else None
+            if latency is not None:
+                metrics.FORWARD_LATENCY.observe(latency, route=route.name)
+            self.archive_signal(job, latency)
+        if delivered:
+            metrics.DIGEST_SIGNALS.observe(len(delivered), route=route.name)
+        if self.outbox and delivered:
+            await asyncio.gather(*(
+                self.outbox.delivered(job.chat_id, job.message_id, route.name) for job in delivered
+            ))
+        
+        if error is not None:
+            logger.error(
+                f"❌ ERROR FORWARDING DIGEST to {self.entity_title(target)} (route {route.name}) "
+                f"after {sent} of {len(parts)} message(s): {error}"
+            )
+            for index in sorted(unsent):
+                metrics.FORWARDS.inc(route=route.name, result='failure')
+                await self.retry_failed(digest.jobs[index])
+            if not delivered:
+                return False
+        
+        logger.info(
+            "✅ DIGEST FORWARDED: %d signal(s) %s → %s in %d message(s) (route %s)",
+            len(delivered), self.entity_title(route.source), self.entity_title(target),
+            sent, route.name,
+            extra={
+                'event': 'digest_forwarded',
+                'route': route.name,
+                'source_chat': digest.jobs[0].chat_id,
+                'message_ids': [job.message_id for job in delivered],
+                'signals': len(delivered),
+                'messages': sent,
+                'target': target,
+            }
+        )
+        return error is None
+    
+    async def replay_outbox(self):
+        """
+        Queue signals that were accepted but never delivered, e.g. because
+        the process died or the send failed before the last restart.
+        """
+        pending = await self.outbox.pending()
+        if not pending:
+            return
+        
+        logger.info(f"♻️ Replaying {len(pending)} undelivered signal(s) from the outbox")
+        loop = asyncio.get_running_loop()
+        now = time.time()
+        for entry in pending:
+            route = self.routes.route_named(entry.route)
+            if (route is None or now - entry.accepted_at > OUTBOX_REPLAY_MAX_AGE
+                    or entry.attempts >= OUTBOX_MAX_ATTEMPTS):
+                if route is None:
+                    reason = "route no longer exists"
+                elif entry.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    reason = f"{entry.attempts} failed attempts"
+                else:
+                    reason = "too old"
+                logger.info(f"⏭️ Not replaying message {entry.message_id} on route {entry.route}: {reason}")
+                await self.outbox.expire(entry.chat_id, entry.message_id, entry.route)
+                continue
             
-            # Create formatted message
-            formatted_message = message_text
+            await self.submit(ForwardJob(
+                route=route,
+                chat_id=entry.chat_id,
+                message_id=entry.message_id,
+                text=entry.payload['text'],
+                sender_name=entry.payload['sender_name'],
+                accepted_at=loop.time(),
+                deadline=loop.time(),
+                message_ids=entry.payload.get('message_ids'),
+                date=entry.payload.get('date'),
+                sender_id=entry.payload.get('sender_id'),
+                attempts=entry.attempts
+            ))
+    
+    async def apply_edit(self, chat_id, message):
+        """
+        Apply the newest version of an edited source message to its copies.
+        
+        Called by self.edits once per coalescing window. Copies sent as
+        text or media with a caption are edited in place, as the account
+        that sent them; server-side forwards cannot be edited.
+        """
+        found = await self.message_index.lookup(chat_id, [message.id])
+        text = message.text or message.message or ""
+        for record in found.get(message.id, ()):
+            route = self.routes.route_named(record.route)
+            body = route.template.body(text) if route is not None and route.template else text
+            new_text = record.prefix + body + record.suffix
+            limit = MEDIA_CAPTION_LIMIT if record.kind == CAPTION else MESSAGE_TEXT_LIMIT
+            if record.kind == FORWARD or record.edit_id is None:
+                metrics.EDITS.inc(result='skipped')
+                continue
+            if not text or len(new_text) > limit:
+                logger.warning(f"⚠️ Edit of {chat_id}/{message.id} does not fit its copy on route {record.route}")
+                metrics.EDITS.inc(result='skipped')
+                continue
             
-            # Add timestamp if enabled
-            if ADD_TIMESTAMP:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")
-                header = f"📡 **SIGNAL FORWARDED**\n"
-                header += f"🕒 {timestamp}\n"
-                header += f"👤 Source: {sender_name}\n"
-                header += f"📊 From: {self.source_group.title}\n"
-                header += "━━━━━━━━━━━━━━━━━━\n\n"
-                formatted_message = header + message_text
+            try:
+                await self.pool.send(record.target, lambda account: account.client.edit_message(
+                    account.entities[record.target], record.edit_id, new_text
+                ), account=record.account)
+            except MessageNotModifiedError:
+                metrics.EDITS.inc(result='unchanged')
+                continue
+            except Exception as e:
+                logger.error(f"❌ Could not edit the copy of {chat_id}/{message.id} on route {record.route}: {e}")
+                metrics.EDITS.inc(result='failure')
+                continue
             
-            # Forward the message
-            logger.info(f"📤 Forwarding to: {self.target_group.title}")
-            await self.client.send_message(
-                entity=self.target_group,
-                message=formatted_message
+            metrics.EDITS.inc(result='success')
+            logger.info(
+                "✏️ SIGNAL EDITED: %s/%s → %s (route %s)",
+                chat_id, message.id, self.entity_title(record.target), record.route,
+                extra={
+                    'event': 'signal_edited',
+                    'route': record.route,
+                    'source_chat': chat_id,
+                    'message_id': message.id,
+                    'target': record.target,
+                }
             )
+    
+    async def propagate_deletion(self, chat_id, message_ids):
+        """
+        Queue the copies of deleted source messages for deletion.
+        
+        chat_id is None for deletions in basic groups, where Telegram only
+        sends the message ids; those are matched against every basic-group
+        source in the index.
+        """
+        if chat_id is None:
+            if all(source < -1000000000000 for source in self.routes.source_chat_ids):
+                return  # every source is a channel/supergroup
+            found = await self.message_index.lookup_unknown_chat(message_ids)
+        else:
+            if not self.routes.routes_for(chat_id):
+                return
+            found = {
+                (chat_id, message_id): records
+                for message_id, records in (await self.message_index.lookup(chat_id, message_ids)).items()
+            }
+        if not found:
+            return
+        
+        for records in found.values():
+            for record in records:
+                self.deletes.add(record.account, record.target, record.message_ids)
+        for source_chat in {key[0] for key in found}:
+            await self.message_index.remove(source_chat, [m for c, m in found if c == source_chat])
+        logger.info(f"🗑️ {len(found)} forwarded signal(s) deleted at the source, removing their copies")
+    
+    async def delete_copies(self, account, target, message_ids):
+        """Delete copies in one target group, in one call (called by self.deletes)."""
+        await self.pool.send(target, lambda a: a.client.delete_messages(
+            a.entities[target], message_ids
+        ), account=account)
+        metrics.DELETES.inc(len(message_ids))
+        logger.debug("🗑️ Deleted %d message(s) in %s", len(message_ids), target)
+    
+    async def send_confirmation(self, job):
+        """Reply to the original signal in the source group (from the primary account)."""
+        if isinstance(job, Digest):
+            for part in job.jobs:
+                await self.send_confirmation(part)
+            return
+        confirmation_msg = f"✅ Signal forwarded to {self.entity_title(job.route.target)}"
+        with profiling.span('confirm'):
+            await self.scheduler.send(job.route.source, lambda: self.client.send_message(
+                entity=self.entities[job.route.source],
+                message=confirmation_msg,
+                reply_to=job.message_id
+            ), account=self.pool.primary.name)
+        logger.debug("✅ Sent confirmation for %s/%s", job.chat_id, job.message_id)
+    
+    def is_ready(self):
+        """Readiness: listening for signals and connected to Telegram."""
+        return bool(self.is_running and self.client and self.client.is_connected())
+    
+    def bind_metrics(self):
+        """Point the scrape-time metrics at this forwarder's components."""
+        metrics.QUEUE_DEPTH.fn = lambda: {
+            (target,): queue.qsize() for target, queue in (self.pipeline.queues.items() if self.pipeline else ())
+        }
+        metrics.QUEUE_DROPPED.fn = lambda: self.pipeline.dropped if self.pipeline else 0
+        metrics.SEND_WAIT.fn = lambda: {(t,): s.waited for t, s in self.scheduler.stats.items()}
+        metrics.FLOOD_WAITS.fn = lambda: {(t,): s.flood_waits for t, s in self.scheduler.stats.items()}
+        metrics.FLOOD_WAIT_SECONDS.fn = lambda: {(t,): s.flood_wait_seconds for t, s in self.scheduler.stats.items()}
+        metrics.SENDER_CACHE.fn = lambda: {('hit',): self.sender_cache.hits, ('miss',): self.sender_cache.misses}
+        metrics.CONNECTED.fn = lambda: 1 if self.client and self.client.is_connected() else 0
+        metrics.TIME_TO_FIRST_LISTEN.fn = lambda: self.time_to_first_listen or 0
+        
+        def per_account(attr):
+            return lambda: {(name,): getattr(account, attr) for name, account in self.pool.accounts.items()}
+        metrics.ACCOUNT_CONNECTED.fn = lambda: {
+            (name,): 1 if account.is_connected() else 0 for name, account in self.pool.accounts.items()
+        }
+        metrics.ACCOUNT_TARGETS.fn = lambda: {(name,): len(r['targets']) for name, r in self.pool.health().items()}
+        metrics.ACCOUNT_IN_FLIGHT.fn = per_account('in_flight')
+        metrics.ACCOUNT_SENDS.fn = per_account('sends')
+        metrics.ACCOUNT_FAILOVERS.fn = per_account('failovers')
+        metrics.ACCOUNT_FLOOD_WAITS.fn = per_account('flood_waits')
+        metrics.EDITS_COALESCED.fn = lambda: self.edits.coalesced
+        metrics.DEDUP_LOOKUPS.fn = lambda: {
+            ('hit',): self.dedup.hits, ('miss',): self.dedup.misses
+        } if self.dedup is not None else {}
+        metrics.DEDUP_ENTRIES.fn = lambda: len(self.dedup) if self.dedup is not None else 0
+        metrics.CATCHUP_RUNS.fn = lambda: self.recovery.runs if self.recovery else 0
+        metrics.CATCHUP_MESSAGES.fn = lambda: self.recovery.recovered if self.recovery else 0
+        metrics.CATCHUP_TOO_OLD.fn = lambda: self.recovery.too_old if self.recovery else 0
+        metrics.LOOP_STALLS.fn = lambda: self.watchdog.stalls
+        metrics.ROUTES.fn = lambda: len(self.routes.routes) if self.routes else 0
+        metrics.ARCHIVED.fn = lambda: self.archive.archived if self.archive else 0
+    
+    def toggle_watchdog(self):
+        """SIGUSR1: switch the event-loop watchdog on or off."""
+        if self.watchdog.running:
+            self.watchdog.stop()
+        else:
+            self.watchdog.start()
+    
+    def toggle_profiler(self):
+        """SIGUSR2: start the sampling profiler, or stop it and write the profile."""
+        if self.profiler is not None and self.profiler.running:
+            try:
+                self.profiler.dump(PROFILE_DIR)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not write profile to {PROFILE_DIR}: {e}")
+            return
+        if self.request_profiler is not None:
+            logger.warning("⚠️ A /profile request is already profiling, try again when it is done")
+            return
+        self.profiler = profiling.SamplingProfiler(interval=PROFILE_INTERVAL_MS / 1000)
+        self.profiler.start()
+        logger.info("🔥 Sampling profiler on (SIGUSR2 again writes the profile)")
+    
+    def install_signal_handlers(self):
+        """
+        Let SIGUSR1 / SIGUSR2 toggle the watchdog and profiler at runtime,
+        and SIGHUP reload the routes.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.toggle_watchdog)
+            loop.add_signal_handler(signal.SIGUSR2, self.toggle_profiler)
+            loop.add_signal_handler(signal.SIGHUP, self.request_reload, "SIGHUP")
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # Not on Windows; /profile and /reload still work there
+            logger.debug("Profiling and reload signals are not available on this platform")
+    
+    async def profile_endpoint(self, query):
+        """GET /profile?seconds=N: collapsed stacks of the event loop over the next N seconds."""
+        try:
+            seconds = min(max(float(query.get('seconds', '10')), 0.1), 300)
+        except ValueError:
+            return 400, 'text/plain; charset=utf-8', "seconds must be a number\n"
+        if self.request_profiler is not None or (self.profiler is not None and self.profiler.running):
+            return 409, 'text/plain; charset=utf-8', "a profile is already running\n"
+        profiler = self.request_profiler = profiling.SamplingProfiler(
+            interval=PROFILE_INTERVAL_MS / 1000, thread_id=threading.get_ident()
+        )
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stacks = profiler.stop()
+            self.request_profiler = None
+        return 200, 'text/plain; charset=utf-8', stacks
+    
+    async def accounts_endpoint(self, query):
+        """GET /accounts: health and load of every account in the client pool."""
+        return 200, 'application/json', self.pool.health()
+    
+    async def signals_endpoint(self, query):
+        """GET /signals?q=&symbol=&route=&source=&since=&until=&limit=: archived signals, newest first."""
+        if self.archive is None:
+            return 503, 'text/plain; charset=utf-8', "archive disabled\n"
+        try:
+            records = await self.archive.search(
+                text=query.get('q'),
+                symbol=query.get('symbol'),
+                since=parse_time(query.get('since')),
+                until=parse_time(query.get('until')),
+                route=query.get('route'),
+                source=query.get('source'),
+                limit=min(max(int(query.get('limit', '100')), 1), 1000)
+            )
+        except ValueError as e:
+            return 400, 'text/plain; charset=utf-8', f"{e}\n"
+        return 200, 'application/json', records
+    
+    async def symbols_endpoint(self, query):
+        """GET /signals/symbols?since=&until=&limit=: archived signal counts per symbol."""
+        if self.archive is None:
+            return 503, 'text/plain; charset=utf-8', "archive disabled\n"
+        try:
+            records = await self.archive.symbols(
+                since=parse_time(query.get('since')),
+                until=parse_time(query.get('until')),
+                limit=min(max(int(query.get('limit', '100')), 1), 1000)
+            )
+        except ValueError as e:
+            return 400, 'text/plain; charset=utf-8', f"{e}\n"
+        return 200, 'application/json', records
+    
+    def register_handlers(self):
+        """
+        Register the message handlers for the current routing table.
+        
+        Telethon drops messages from other chats and senders before our
+        handlers are scheduled, so the filters come from self.routes and
+        are rebuilt after a reload. The new handlers are added and the old
+        ones removed in one step (no await in between); the client stays
+        connected throughout.
+        """
+        source_chats = [self.entities[source] for source in self.routes.sources]
+        
+        # When every route is limited to specific users, let Telethon drop
+        # other senders before our handler is even scheduled.
+        # (Text matching stays in the handler: Telethon evaluates `pattern`
+        # before the `chats` filter, i.e. for every chat the account is in.)
+        from_users = self.routes.sender_filter()
+        if from_users:
+            logger.info(f"👤 Handler limited to {len(from_users)} sender(s)")
+        
+        async def message_handler(event):
+            await self.forward_signal_message(event)
+        
+        handlers = [(message_handler, events.NewMessage(chats=source_chats, from_users=from_users))]
+        
+        if PROPAGATE_EDITS:
+            async def edit_handler(event):
+                self.edits.add(event.chat_id, event.message)
             
-            logger.info(f"✅ SIGNAL FORWARDED SUCCESSFULLY!")
-            logger.info("🎯" * 30)
-            
-            # Send confirmation if enabled
-            if SEND_CONFIRMATION:
-                try:
-                    confirmation_msg = f"✅ Signal forwarded to {self.target_group.title}"
-                    await self.client.send_message(
-                        entity=self.source_group,
-                        message=confirmation_msg,
-                        reply_to=message.id
-                    )
-                    logger.info("✅ Sent confirmation message to source group")
-                except Exception as e:
-                    logger.warning(f"⚠️ Could not send confirmation: {e}")
+            handlers.append((edit_handler, events.MessageEdited(chats=source_chats, from_users=from_users)))
+        
+        # Fresh closures each time, so removing the old ones leaves these alone
+        for callback, event in handlers:
+            self.client.add_event_handler(callback, event)
+        for callback, event in self.handlers:
+            self.client.remove_event_handler(callback, event)
+        self.handlers = handlers
+    
+    async def prepare_routes(self, routes):
+        """
+        Get a freshly loaded routing table ready to serve.
+        
+        Only sources, targets and users that are not resolved yet are
+        looked up (peer cache first, as at startup); extra accounts of
+        the client pool resolve what they are missing as well. Unreachable
+        groups raise ValueError, so the table in use stays in place.
+        """
+        groups = [g for g in dict.fromkeys(routes.sources + routes.targets) if g not in self.entities]
+        if groups:
+            logger.info(f"🔍 Resolving {len(groups)} new group(s)...")
+            failed = await self.resolve_entities(groups)
+            if failed:
+                for identifier, error in failed.items():
+                    logger.error(f"❌ Could not find {identifier}: {error}")
+                raise ValueError(f"{len(failed)} group(s) could not be resolved")
+        
+        users = [u for u in routes.source_users if u not in self.entities]
+        if users:
+            failed = await self.resolve_entities(users)
+            for username, error in failed.items():
+                logger.warning(f"⚠️ Could not find user {username}: {error}")
+                logger.info("Will forward signals from any user on the affected routes")
+        
+        for account in list(self.pool.accounts.values()):
+            if account.primary:
+                continue
+            needed = [
+                g for g in dict.fromkeys(
+                    routes.targets + [route.source for route in routes.routes if route.forwards_media]
+                )
+                if g not in account.entities
+            ]
+            if needed:
+                failed = await self.resolve_entities(needed, account)
+                for identifier, error in failed.items():
+                    logger.warning(f"⚠️ {account.name} cannot reach {identifier}: {error}")
+        
+        user_ids = {
+            username: utils.get_peer_id(self.entities[username])
+            for username in routes.source_users if username in self.entities
+        }
+        source_ids = {source: utils.get_peer_id(self.entities[source]) for source in routes.sources}
+        routes.bind(source_ids, user_ids)
+        self.compile_templates(routes)
+    
+    def activate_routes(self, routes):
+        """
+        Swap in a prepared routing table.
+        
+        Synchronous on purpose: every message is matched either against
+        the old table with the old handlers or against the new one with
+        the new handlers, never a mix.
+        """
+        previous = self.routes
+        self.routes = routes
+        if (previous.source_chat_ids, previous.sender_filter()) != (routes.source_chat_ids, routes.sender_filter()):
+            self.register_handlers()
+        if self.recovery is not None:
+            self.recovery.chats = {
+                utils.get_peer_id(self.entities[source]): self.entities[source] for source in routes.sources
+            }
+        self.pool.set_targets(routes.targets)
+    
+    async def reload_routes(self, reason="a request"):
+        """
+        Re-read the routing configuration and apply it without reconnecting.
+        
+        The new table is loaded, resolved and compiled while the current
+        one keeps serving, then swapped in by activate_routes(). Returns a
+        one-line summary; on any error the current routes stay in place.
+        """
+        if not self.is_running:
+            return "⏳ Not listening yet, nothing to reload"
+        async with self.reload_lock:
+            started = time.monotonic()
+            try:
+                # Parsing and building the matcher happen off the event loop
+                routes = await asyncio.get_running_loop().run_in_executor(None, self.build_route_table, True)
+                changes = diff_routes(self.routes, routes)
+                if not any(changes.values()):
+                    metrics.ROUTE_RELOADS.inc(result='unchanged')
+                    logger.info(f"🔄 Reload after {reason}: routes unchanged")
+                    return "🔄 Routes unchanged"
+                await self.prepare_routes(routes)
+            except Exception as e:
+                metrics.ROUTE_RELOADS.inc(result='failed')
+                logger.error(f"❌ Reload after {reason} failed, keeping the current routes: {e}")
+                return f"❌ Reload failed, current routes kept: {e}"
             
+            self.activate_routes(routes)
+            metrics.ROUTE_RELOADS.inc(result='applied')
+            summary = describe_diff(changes)
+            logger.info(f"🔄 Routes reloaded after {reason} in {time.monotonic() - started:.2f}s: "
+                        f"{len(routes.routes)} route(s), {summary}")
+            for route in routes.routes:
+                if route.name in changes['added'] or route.name in changes['changed']:
+                    logger.info(f"   👉 [{route.name}] {self.entity_title(route.source)} → {self.entity_title(route.target)}")
+            return f"🔄 Routes reloaded: {len(routes.routes)} route(s), {summary}"
+    
+    def request_reload(self, reason):
+        """Start a reload in the background (for signal handlers)."""
+        self.reload_task = asyncio.ensure_future(self.reload_routes(reason))
+    
+    async def is_admin(self, event):
+        """True for our own Saved Messages and private chats with ADMIN_USERS."""
+        if event.chat_id == self.pool.primary.user_id:
+            return True
+        if event.out or not event.is_private:
+            return False
+        if str(event.sender_id) in ADMIN_USERS:
+            return True
+        sender = await self.get_sender_cached(event.message)
+        username = getattr(sender, 'username', None)
+        return bool(username) and f"@{username.lower()}" in {u.lower() for u in ADMIN_USERS}
+    
+    async def reload_command(self, event):
+        """/reload from an admin: reload the routes and reply with the result."""
+        if not await self.is_admin(event):
+            return
+        reply = await self.reload_routes(reason="/reload")
+        try:
+            await event.reply(reply)
         except Exception as e:
-            logger.error(f"❌ ERROR FORWARDING MESSAGE: {e}")
+            logger.warning(f"⚠️ Could not answer /reload: {e}")
     
     async def start_forwarding(self):
         """
@@ -346,10 +1696,13 @@ class TelegramSignalForwarder:
         required_vars = [
             ('API_ID', API_ID),
             ('API_HASH', API_HASH),
-            ('PHONE_NUMBER', PHONE_NUMBER),
-            ('SOURCE_GROUP_URL', SOURCE_GROUP_URL),
-            ('TARGET_GROUP_URL', TARGET_GROUP_URL)
+            ('PHONE_NUMBER', PHONE_NUMBER)
         ]
+        if not ROUTES_FILE:
+            required_vars += [
+                ('SOURCE_GROUP_URL', SOURCE_GROUP_URL),
+                ('TARGET_GROUP_URL', TARGET_GROUP_URL)
+            ]
         
         missing_vars = [name for name, value in required_vars if not value]
         
@@ -361,86 +1714,288 @@ class TelegramSignalForwarder:
             logger.info("💡 Refer to README.md for setup instructions")
             return
         
+        # Load routing table
+        try:
+            self.routes = self.build_route_table()
+        except Exception as e:
+            logger.error(f"❌ Invalid route configuration ({ROUTES_FILE or 'environment'}): {e}")
+            return
+        
         # Display current configuration
         logger.info("⚙️ CURRENT CONFIGURATION:")
-        logger.info(f"   Source Group: {SOURCE_GROUP_URL}")
-        logger.info(f"   Target Group: {TARGET_GROUP_URL}")
-        logger.info(f"   Source User: {SOURCE_USERNAME if SOURCE_USERNAME else 'Any user'}")
-        logger.info(f"   Signal Header: '{SIGNAL_HEADER}'")
-        logger.info(f"   Add Timestamp: {ADD_TIMESTAMP}")
+        logger.info(f"   Routes: {len(self.routes.routes)} ({ROUTES_FILE or 'from environment'})")
+        for route in self.routes.routes:
+            logger.info(f"   [{route.name}] {route.source} → {route.target}")
+            logger.info(f"      Source Users: {', '.join(route.source_users) if route.source_users else 'Any user'}")
+            logger.info(f"      Signal Header: '{route.header or ''}'")
+            logger.info(f"      Mode: {route.mode}" + (f" (header as {route.header_mode})" if route.forwards_media else ""))
+            if route.digests:
+                logger.info(f"      Digest: every {route.digest_window:g}s or {route.digest_max} signals")
+            if route.transforms or route.footer_template:
+                logger.info(f"      Transforms: {len(route.transforms)}, footer: {'yes' if route.footer_template else 'no'}")
+            if route.keywords:
+                logger.info(f"      Keywords: {', '.join(route.keywords)}")
+            if route.exclude:
+                logger.info(f"      Exclude: {', '.join(route.exclude)}")
+        logger.info(f"   Match Patterns: {len(self.routes.matcher.patterns)}")
+        logger.info(f"   Add Timestamp: {ADD_TIMESTAMP} ({TIMEZONE})")
         logger.info(f"   Send Confirmation: {SEND_CONFIRMATION}")
         logger.info(f"   Forward Delay: {FORWARD_DELAY} seconds")
+        logger.info(f"   Logging: {LOG_LEVEL}, {LOG_FORMAT}{', async' if LOG_ASYNC else ''}")
+        logger.info(f"   Queue: {QUEUE_SIZE} per target, {WORKERS_PER_TARGET} worker(s), overflow={QUEUE_OVERFLOW}")
+        logger.info(f"   Send Rate: {TARGET_SEND_RATE:g}/min per target (burst {TARGET_SEND_BURST}), "
+                    f"{ACCOUNT_SEND_RATE:g}/min per account (burst {ACCOUNT_SEND_BURST})")
+        logger.info(f"   Accounts: 1 + {len(EXTRA_SESSION_STRINGS)} extra")
+        if DEDUP_ENABLED:
+            logger.info(f"   Dedup: {DEDUP_WINDOW:g}s window, {DEDUP_MAX_ENTRIES} entries"
+                        + (f", near-duplicates within {DEDUP_NEAR_DISTANCE} bits" if DEDUP_NEAR_DISTANCE else ""))
+        logger.info(f"   Propagate: edits={PROPAGATE_EDITS} (window {EDIT_WINDOW:g}s), "
+                    f"deletes={PROPAGATE_DELETES} (window {DELETE_WINDOW:g}s)")
+        if CATCHUP_ENABLED:
+            logger.info(f"   Catch-up: up to {CATCHUP_MAX_AGE}s back, {CATCHUP_RATE:g} messages/s")
+        if ARCHIVE_PATH:
+            logger.info(f"   Archive: {ARCHIVE_PATH} (batched every {ARCHIVE_FLUSH_MS:g}ms"
+                        + (f", kept {ARCHIVE_RETENTION_DAYS:g} days)" if ARCHIVE_RETENTION_DAYS else ")"))
+        if ROUTES_RELOAD_INTERVAL > 0 and (ROUTES_FILE or ENV_FILE):
+            logger.info(f"   Reload: {ROUTES_FILE or ENV_FILE} checked every {ROUTES_RELOAD_INTERVAL:g}s")
         logger.info("=" * 60)
         
-        # Initialize Telegram client
-        if not await self.initialize_telegram_client():
-            logger.error("❌ Failed to initialize. Check logs above.")
-            return
+        # From here on every return (or error) releases whatever was started
+        self.started = True
+        try:
+            # Start metrics & health endpoint (not ready until listening)
+            self.bind_metrics()
+            self.loop_lag.start()
+            self.install_signal_handlers()
+            if LOOP_WATCHDOG_MS > 0:
+                self.watchdog.start()
+            if PROFILE_ON_START:
+                self.toggle_profiler()
+            if METRICS_ENABLED:
+                try:
+                    self.metrics_server = metrics.MetricsServer(METRICS_HOST, METRICS_PORT, ready_check=self.is_ready)
+                    if DEBUG_ENDPOINTS:
+                        self.metrics_server.add_route('/accounts', self.accounts_endpoint)
+                        self.metrics_server.add_route('/profile', self.profile_endpoint)
+                    if ARCHIVE_API:
+                        self.metrics_server.add_route('/signals', self.signals_endpoint)
+                        self.metrics_server.add_route('/signals/symbols', self.symbols_endpoint)
+                    await self.metrics_server.start()
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not start metrics server on port {METRICS_PORT}: {e}")
+                    self.metrics_server = None
         
-        # Set up message handler
-        @self.client.on(events.NewMessage(chats=self.source_group))
-        async def message_handler(event):
-            await self.forward_signal_message(event)
+            # Initialize Telegram client
+            if not await self.initialize_telegram_client():
+                logger.error("❌ Failed to initialize. Check logs above.")
+                return
         
-        self.is_running = True
+            # Compile message templates and transforms (titles are known now)
+            try:
+                self.compile_templates()
+            except ValueError as e:
+                logger.error(f"❌ Invalid message template: {e}")
+                return
         
-        # Send startup notification
-        try:
-            startup_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")
-            startup_msg = (
-                f"✅ **SIGNAL FORWARDER STARTED**\n\n"
-                f"🕒 Started at: {startup_time}\n"
-                f"📡 Status: ACTIVE & MONITORING\n"
-                f"🎯 Looking for: '{SIGNAL_HEADER}'\n"
-                f"👤 From user: {SOURCE_USERNAME if SOURCE_USERNAME else 'Any user'}\n"
-                f"📨 Forwarding to: {self.target_group.title}\n\n"
-                f"🔔 Ready to forward signals!"
-            )
+            # Start the forward pipeline
+            try:
+                self.pipeline = ForwardPipeline(
+                    send=self.deliver_signal,
+                    confirm=self.send_confirmation if SEND_CONFIRMATION else None,
+                    maxsize=QUEUE_SIZE,
+                    workers_per_target=WORKERS_PER_TARGET,
+                    overflow=QUEUE_OVERFLOW,
+                    on_drop=self.abandon
+                )
+            except ValueError as e:
+                logger.error(f"❌ Invalid pipeline configuration: {e}")
+                return
+            self.pipeline.start()
+        
+            # Open the outbox
+            if OUTBOX_PATH:
+                try:
+                    self.outbox = Outbox(OUTBOX_PATH, flush_interval=OUTBOX_FLUSH_MS / 1000)
+                    await self.outbox.open()
+                except Exception as e:
+                    logger.error(f"❌ Could not open outbox {OUTBOX_PATH}: {e}")
+                    return
+        
+            # Open the message index used to apply edits and deletions to copies
+            if PROPAGATE_EDITS or PROPAGATE_DELETES:
+                try:
+                    self.message_index = MessageIndex(
+                        MESSAGE_INDEX_PATH,
+                        maxsize=MESSAGE_INDEX_SIZE,
+                        retention=MESSAGE_INDEX_RETENTION,
+                        flush_interval=OUTBOX_FLUSH_MS / 1000
+                    )
+                    await self.message_index.open()
+                except Exception as e:
+                    logger.error(f"❌ Could not open message index {MESSAGE_INDEX_PATH}: {e}")
+                    return
+        
+            # Open the searchable archive of forwarded signals
+            if ARCHIVE_PATH:
+                try:
+                    self.archive = SignalArchive(
+                        ARCHIVE_PATH,
+                        extractors=compile_extractors(self.load_extractors()),
+                        flush_interval=ARCHIVE_FLUSH_MS / 1000,
+                        retention=ARCHIVE_RETENTION_DAYS * 86400
+                    )
+                    await self.archive.open()
+                except Exception as e:
+                    logger.error(f"❌ Could not open signal archive {ARCHIVE_PATH}: {e}")
+                    return
+        
+            # Replay anything left over from the last run, now that replayed
+            # copies can be indexed and archived
+            if self.outbox:
+                try:
+                    await self.replay_outbox()
+                except Exception as e:
+                    logger.error(f"❌ Could not replay outbox {OUTBOX_PATH}: {e}")
+                    return
+        
+            # Snapshot the checkpoints before live messages can advance them
+            if self.checkpoints is not None:
+                self.recovery = GapRecovery(
+                    self.client,
+                    {utils.get_peer_id(self.entities[source]): self.entities[source] for source in self.routes.sources},
+                    self.checkpoints,
+                    self.recover_message,
+                    seen=self.seen_live,
+                    max_age=CATCHUP_MAX_AGE,
+                    rate=CATCHUP_RATE,
+                    batch_wait=CATCHUP_BATCH_WAIT
+                )
             
-            await self.client.send_message(
-                entity=self.target_group,
-                message=startup_msg
-            )
-            logger.info("✅ Startup notification sent to target group")
-        except Exception as e:
-            logger.warning(f"⚠️ Could not send startup notification: {e}")
+            # Set up message handler for every source group
+            self.register_handlers()
         
-        logger.info("=" * 60)
-        logger.info("📡 NOW LISTENING FOR SIGNALS...")
-        logger.info("=" * 60)
-        logger.info("The forwarder is actively monitoring:")
-        logger.info(f"   👉 {self.source_group.title}")
-        logger.info(f"For messages containing:")
-        logger.info(f"   👉 '{SIGNAL_HEADER}'")
-        if SOURCE_USERNAME:
-            logger.info(f"From user:")
-            logger.info(f"   👉 {SOURCE_USERNAME}")
-        logger.info("=" * 60)
-        logger.info("📊 Forwarding to:")
-        logger.info(f"   👉 {self.target_group.title}")
-        logger.info("=" * 60)
-        logger.info("💡 To stop: Go to Render.com → Signal forwarder → Stop")
-        logger.info("📋 Logs: Render.com dashboard → Logs")
-        logger.info("=" * 60)
+            if PROPAGATE_DELETES:
+                # No chats filter: deletions in basic groups carry no chat id
+                @self.client.on(events.MessageDeleted())
+                async def delete_handler(event):
+                    try:
+                        await self.propagate_deletion(event.chat_id, event.deleted_ids)
+                    except Exception as e:
+                        logger.error(f"❌ Could not propagate deletion: {e}")
         
-        # Keep the client running
-        try:
-            await self.client.run_until_disconnected()
-        except asyncio.CancelledError:
-            logger.info("🛑 Received shutdown signal")
-        except Exception as e:
-            logger.error(f"❌ Unexpected error: {e}")
+            if ADMIN_COMMANDS:
+                self.client.add_event_handler(
+                    self.reload_command,
+                    events.NewMessage(pattern=r'^/reload(?:@\w+)?\s*$', func=lambda e: e.is_private)
+                )
+        
+            self.is_running = True
+            self.time_to_first_listen = time.monotonic() - PROCESS_STARTED
+            logger.info(f"⏱️ Time to first listen: {self.time_to_first_listen:.2f}s")
+        
+            # Fetch whatever was posted while we were down, and after every reconnect
+            if self.recovery is not None:
+                self.checkpoints.start()
+                self.recovery.start()
+        
+            # Pick up routing changes while running
+            reload_path = ROUTES_FILE or ENV_FILE
+            if ROUTES_RELOAD_INTERVAL > 0 and reload_path:
+                self.config_watcher = ConfigWatcher(
+                    reload_path,
+                    lambda: self.reload_routes(reason=f"a change to {reload_path}"),
+                    interval=ROUTES_RELOAD_INTERVAL
+                )
+                self.config_watcher.start()
+        
+            # Send startup notification to every target group
+            startup_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+            for target in self.routes.targets:
+                try:
+                    target_routes = [route for route in self.routes.routes if route.target == target]
+                    watching = "\n".join(
+                        f"   • {self.entity_title(route.source)}: '{route.header or 'any message'}'"
+                        for route in target_routes
+                    )
+                    startup_msg = (
+                        f"✅ **SIGNAL FORWARDER STARTED**\n\n"
+                        f"🕒 Started at: {startup_time}\n"
+                        f"📡 Status: ACTIVE & MONITORING\n"
+                        f"🎯 Looking for:\n{watching}\n"
+                        f"📨 Forwarding to: {self.entity_title(target)}\n\n"
+                        f"🔔 Ready to forward signals!"
+                    )
+                
+                    await self.pool.send(target, lambda account: account.client.send_message(
+                        entity=account.entities[target],
+                        message=startup_msg
+                    ))
+                    logger.info(f"✅ Startup notification sent to {self.entity_title(target)}")
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not send startup notification: {e}")
+        
+            logger.info("=" * 60)
+            logger.info("📡 NOW LISTENING FOR SIGNALS...")
+            logger.info("=" * 60)
+            logger.info("The forwarder is actively monitoring:")
+            for route in self.routes.routes:
+                logger.info(f"   👉 [{route.name}] {self.entity_title(route.source)} → {self.entity_title(route.target)}")
+            logger.info("=" * 60)
+            logger.info("💡 To stop: Go to Render.com → Signal forwarder → Stop")
+            logger.info("📋 Logs: Render.com dashboard → Logs")
+            logger.info("=" * 60)
+        
+            # Keep the client running
+            try:
+                await self.client.run_until_disconnected()
+            except asyncio.CancelledError:
+                logger.info("🛑 Received shutdown signal")
+            except Exception as e:
+                logger.error(f"❌ Unexpected error: {e}")
         finally:
             await self.stop_forwarder()
     
     async def stop_forwarder(self):
-        """Stop the forwarder gracefully."""
-        if not self.is_running:
+        """Stop the forwarder gracefully (also after a failed start)."""
+        if not self.started:
             return
         
         logger.info("🛑 Stopping signal forwarder...")
+        self.started = False
         self.is_running = False
         
+        if self.config_watcher:
+            await self.config_watcher.stop()
+        if self.recovery:
+            await self.recovery.stop()
+        # Waiting retries stay accepted in the outbox and are replayed next start
+        for task in list(self.retries):
+            task.cancel()
+        await asyncio.gather(*self.retries, return_exceptions=True)
+        await self.albums.flush()
+        await self.digests.flush()
+        if self.pipeline:
+            await self.pipeline.stop()
+        await self.edits.flush()
+        await self.deletes.flush()
+        if self.checkpoints is not None:
+            await self.checkpoints.stop()
+        
+        if self.outbox:
+            await self.outbox.close()
+        if self.message_index:
+            await self.message_index.close()
+        if self.archive:
+            await self.archive.close()
+        
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await self.loop_lag.stop()
+        self.watchdog.stop()
+        if self.profiler is not None and self.profiler.running:
+            self.toggle_profiler()
+        
+        await self.pool.disconnect()
         if self.client:
             try:
                 await self.client.disconnect()
@@ -486,6 +2041,15 @@ if __name__ == "__main__":
     if is_render:
         logger.info("🌐 Running on Render.com cloud platform")
     
+    # Optional faster event loop
+    if USE_UVLOOP:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            logger.info("⚡ Using uvloop")
+        except ImportError:
+            logger.warning("⚠️ USE_UVLOOP is set but uvloop is not installed (pip install uvloop)")
+    
     # Run the application
     try:
         asyncio.run(main())
@@ -493,4 +2057,10 @@ if __name__ == "__main__":
         logger.info("\n👋 Application stopped by user")
     except Exception as e:
         logger.error(f"💥 Application crashed: {e}")
+        if LOG_LISTENER:
+            LOG_LISTENER.stop()
         sys.exit(1)
+    
+    # Flush records still queued for the logging thread
+    if LOG_LISTENER:
+        LOG_LISTENER.stop()
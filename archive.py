@@ -0,0 +1,434 @@
+"""
+SIGNAL ARCHIVE
+Every forwarded signal is written to a local SQLite database with a
+full-text index (FTS5), so past signals can be looked up without
+scrolling Telegram history or polling its API.
+
+- SignalArchive.add() queues one record and returns at once; records
+  are group-committed in batches by storage.SQLiteStore, so archiving
+  never holds up a send.
+- Extractors pull structured fields (symbol, side, entry, stop,
+  targets) out of the signal text with configurable regexes.
+- search() and symbols() answer full-text, time-range and per-symbol
+  queries for the /signals endpoints. The same queries work from the
+  command line on a read-only connection, next to the running forwarder:
+
+    python archive.py signals.db search "breakout" --since 24h
+    python archive.py signals.db search --symbol EUR/USD --json
+    python archive.py signals.db symbols --since 7d
+
+Without FTS5 in the local SQLite build, text search falls back to LIKE.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+from storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id           INTEGER PRIMARY KEY,
+    chat_id      INTEGER NOT NULL,
+    message_id   INTEGER NOT NULL,
+    route        TEXT    NOT NULL,
+    source       TEXT    NOT NULL,
+    target       TEXT    NOT NULL,
+    sender       TEXT,
+    sender_id    INTEGER,
+    text         TEXT    NOT NULL,
+    posted_at    REAL    NOT NULL,
+    forwarded_at REAL    NOT NULL,
+    latency      REAL,
+    symbol       TEXT,
+    side         TEXT,
+    entry        REAL,
+    stop         REAL,
+    targets      TEXT,                        -- JSON list of numbers
+    fields       TEXT    NOT NULL DEFAULT '{}', -- every extracted field, JSON
+    UNIQUE (chat_id, message_id, route)
+);
+CREATE INDEX IF NOT EXISTS signals_posted ON signals (posted_at);
+CREATE INDEX IF NOT EXISTS signals_symbol ON signals (symbol, posted_at);
+"""
+
+# An external-content FTS5 index over signals.text, kept in sync by triggers
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS signals_fts USING fts5(text, content='signals', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS signals_fts_insert AFTER INSERT ON signals BEGIN "
+    "INSERT INTO signals_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS signals_fts_delete AFTER DELETE ON signals BEGIN "
+    "INSERT INTO signals_fts(signals_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+)
+
+_COLUMNS = ("id", "chat_id", "message_id", "route", "source", "target", "sender", "sender_id", "text",
+            "posted_at", "forwarded_at", "latency", "symbol", "side", "entry", "stop", "targets", "fields")
+
+_INSERT = (
+    f"INSERT OR IGNORE INTO signals ({', '.join(_COLUMNS[1:])}) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNS[1:])})"
+)
+
+_NUMBER = r'(\d+(?:[.,]\d+)*)'
+
+# name -> pattern, or {"pattern": ..., "all": bool, "type": text|upper|lower|number}.
+# The first group that took part in the match is the value.
+DEFAULT_EXTRACTORS = {
+    'symbol': {'pattern': r'\b([A-Z]{2,10}/[A-Z]{2,10})\b|#([A-Z][A-Z0-9]{2,15})\b', 'type': 'upper'},
+    'side': {'pattern': r'(?i)\b(buy|sell|long|short)\b', 'type': 'lower'},
+    'entry': {'pattern': r'(?i)\b(?:entry|enter|open)\b[^\d\n]{0,15}' + _NUMBER, 'type': 'number'},
+    'stop': {'pattern': r'(?i)\b(?:sl|stop[\s-]*loss|stop)\b[^\d\n]{0,10}' + _NUMBER, 'type': 'number'},
+    # "TP1: 1.09" / "Target 2 1.10" / "TP 1.0850": the index is not the price
+    'targets': {'pattern': r'(?i)\b(?:tp|targets?|take[\s-]*profit)(?:\s*\d\b(?![.,]\d))?[^\d\n]{0,10}' + _NUMBER,
+                'type': 'number', 'all': True},
+}
+
+EXTRACTOR_TYPES = ('text', 'upper', 'lower', 'number')
+
+_RELATIVE = re.compile(r'^(\d+(?:\.\d+)?)\s*([smhdw])$')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def _number(text):
+    """'1.0850' / '1,0850' / '62,500' / '1,085.50' -> float (None if it is not a number)."""
+    if ',' in text and '.' in text:
+        text = text.replace(',', '')
+    elif text.count(',') == 1 and len(text) - text.index(',') != 4:
+        text = text.replace(',', '.')  # a decimal comma, not a thousands separator
+    else:
+        text = text.replace(',', '')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class Extractor:
+    """One named field parsed out of the signal text by a regex."""
+
+    __slots__ = ('name', 'regex', 'all', 'type')
+
+    def __init__(self, name, pattern, all=False, type='text'):
+        if type not in EXTRACTOR_TYPES:
+            raise ValueError(f"extractor {name}: unknown type '{type}', expected one of {', '.join(EXTRACTOR_TYPES)}")
+        try:
+            self.regex = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"extractor {name}: invalid pattern {pattern!r}: {e}") from e
+        if not self.regex.groups:
+            raise ValueError(f"extractor {name}: pattern needs a capture group")
+        self.name = name
+        self.all = all
+        self.type = type
+
+    def _convert(self, match):
+        value = next((group for group in match.groups() if group is not None), None)
+        if value is None:
+            return None
+        if self.type == 'number':
+            return _number(value)
+        if self.type == 'upper':
+            return value.upper()
+        if self.type == 'lower':
+            return value.lower()
+        return value
+
+    def extract(self, text):
+        """The field's value (a list for all=True), or None if it is not in text."""
+        if self.all:
+            values = [v for v in map(self._convert, self.regex.finditer(text)) if v is not None]
+            return values or None
+        match = self.regex.search(text)
+        return self._convert(match) if match else None
+
+
+def compile_extractors(overrides=None):
+    """
+    Extractors from DEFAULT_EXTRACTORS updated with overrides.
+
+    An override maps a field name to a pattern string, a spec dict, or
+    None to drop a default field.
+    """
+    spec = dict(DEFAULT_EXTRACTORS)
+    spec.update(overrides or {})
+    extractors = []
+    for name, entry in spec.items():
+        if entry is None:
+            continue
+        if isinstance(entry, str):
+            entry = {'pattern': entry}
+        if not isinstance(entry, dict) or 'pattern' not in entry:
+            raise ValueError(f"extractor {name} needs a 'pattern'")
+        extractors.append(Extractor(name, entry['pattern'], all=bool(entry.get('all', False)),
+                                    type=entry.get('type', 'text')))
+    return extractors
+
+
+def extract_fields(extractors, text):
+    """{name: value} of every extractor that found something."""
+    fields = {}
+    for extractor in extractors:
+        value = extractor.extract(text)
+        if value is not None:
+            fields[extractor.name] = value
+    return fields
+
+
+def parse_time(value, now=None):
+    """
+    Epoch seconds from '1760000000', '2026-10-01', '2026-10-01T12:00'
+    (UTC unless it carries an offset) or a span back from now such as
+    '30m', '24h' or '7d'. None and '' give None.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip()
+    match = _RELATIVE.match(value)
+    if match:
+        return (now if now is not None else time.time()) - float(match.group(1)) * _UNITS[match.group(2)]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"cannot read time {value!r}; use epoch seconds, an ISO date or e.g. 24h") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def search_query(text=None, symbol=None, since=None, until=None, route=None, source=None, limit=100, fts=True):
+    """SQL and parameters for a search; newest signals first."""
+    where = []
+    params = []
+    join = ""
+    if text:
+        if fts:
+            join = " JOIN signals_fts ON signals_fts.rowid = signals.id"
+            where.append("signals_fts MATCH ?")
+            params.append(text)
+        else:
+            where.append("signals.text LIKE ?")
+            params.append(f"%{text}%")
+    for column, value in (('symbol', symbol.upper() if symbol else None), ('route', route), ('source', source)):
+        if value:
+            where.append(f"signals.{column} = ?")
+            params.append(value)
+    if since is not None:
+        where.append("signals.posted_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("signals.posted_at < ?")
+        params.append(until)
+    sql = f"SELECT {', '.join('signals.' + c for c in _COLUMNS)} FROM signals{join}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY signals.posted_at DESC LIMIT ?"
+    params.append(int(limit))
+    return sql, params
+
+
+def symbols_query(since=None, until=None, limit=100):
+    """SQL and parameters for signal counts per symbol, busiest first."""
+    where = ["symbol IS NOT NULL"]
+    params = []
+    if since is not None:
+        where.append("posted_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("posted_at < ?")
+        params.append(until)
+    sql = (
+        "SELECT symbol, COUNT(*), MIN(posted_at), MAX(posted_at) FROM signals "
+        f"WHERE {' AND '.join(where)} GROUP BY symbol ORDER BY COUNT(*) DESC, symbol LIMIT ?"
+    )
+    params.append(int(limit))
+    return sql, params
+
+
+def row_to_dict(row):
+    record = dict(zip(_COLUMNS, row))
+    record['targets'] = json.loads(record['targets']) if record['targets'] else []
+    record['fields'] = json.loads(record['fields'] or '{}')
+    return record
+
+
+def symbol_row_to_dict(row):
+    symbol, count, first, last = row
+    return {'symbol': symbol, 'signals': count, 'first': first, 'last': last}
+
+
+class SignalArchive:
+    """
+    Forwarded signals in SQLite, searchable by text, time and symbol.
+
+    add() never waits for the disk: writes are committed every
+    flush_interval seconds in one transaction. Re-archiving the same
+    (chat, message, route), e.g. after an outbox replay, is a no-op.
+    """
+
+    def __init__(self, path, extractors=None, flush_interval=0.25, retention=0, prune_interval=3600.0):
+        self.path = path
+        self.extractors = extractors if extractors is not None else compile_extractors()
+        self.retention = retention  # seconds, 0 = keep everything
+        self.prune_interval = prune_interval
+        self.store = SQLiteStore(path, SCHEMA, flush_interval=flush_interval, synchronous='NORMAL')
+        self.fts = False
+        self.archived = 0
+        self.failed = 0
+        self._pruner = None
+
+    async def open(self):
+        await self.store.open()
+        try:
+            for statement in FTS_SCHEMA:
+                await self.store.execute(statement)
+            self.fts = True
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ SQLite without FTS5 ({e}), archive text search falls back to LIKE")
+        if self.retention:
+            await self.prune()
+            self._pruner = asyncio.create_task(self._prune_loop())
+
+    async def prune(self):
+        """Forget signals posted more than retention seconds ago."""
+        removed = await self.store.execute(
+            "DELETE FROM signals WHERE posted_at < ?", (time.time() - self.retention,)
+        )
+        if removed:
+            logger.info(f"🧹 Pruned {removed} archived signals")
+        return removed
+
+    async def _prune_loop(self):
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not prune archive {self.path}: {e}")
+
+    def add(self, chat_id, message_id, route, source, target, text, posted_at, sender=None, sender_id=None,
+            latency=None, forwarded_at=None):
+        """Queue one forwarded signal for the next batch."""
+        fields = extract_fields(self.extractors, text or "")
+        targets = fields.get('targets')
+        if targets is not None and not isinstance(targets, list):
+            targets = [targets]
+        params = (
+            chat_id, message_id, route, source, target, sender, sender_id, text or "",
+            posted_at, forwarded_at if forwarded_at is not None else time.time(), latency,
+            fields.get('symbol'), fields.get('side'), fields.get('entry'), fields.get('stop'),
+            json.dumps(targets) if targets else None, json.dumps(fields, ensure_ascii=False),
+        )
+        self.store.execute(_INSERT, params).add_done_callback(self._written)
+        return fields
+
+    def _written(self, future):
+        # Errors are logged by the store; only count here
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.archived += max(future.result(), 0)
+
+    async def search(self, text=None, symbol=None, since=None, until=None, route=None, source=None, limit=100):
+        """Matching signals, newest first, as dicts. Bad FTS syntax raises ValueError."""
+        sql, params = search_query(text, symbol, since, until, route, source, limit, fts=self.fts)
+        try:
+            rows = await self.store.query(sql, params)
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"invalid search: {e}") from e
+        return [row_to_dict(row) for row in rows]
+
+    async def symbols(self, since=None, until=None, limit=100):
+        """[{symbol, signals, first, last}, ...], busiest first."""
+        sql, params = symbols_query(since, until, limit)
+        return [symbol_row_to_dict(row) for row in await self.store.query(sql, params)]
+
+    async def close(self):
+        if self._pruner is not None:
+            self._pruner.cancel()
+            await asyncio.gather(self._pruner, return_exceptions=True)
+            self._pruner = None
+        await self.store.close()
+
+
+def _format_time(value):
+    return datetime.fromtimestamp(value, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _print_signal(record):
+    levels = []
+    if record['entry'] is not None:
+        levels.append(f"entry {record['entry']:g}")
+    if record['stop'] is not None:
+        levels.append(f"stop {record['stop']:g}")
+    if record['targets']:
+        levels.append("tp " + "/".join(f"{t:g}" for t in record['targets']))
+    latency = f"{record['latency']:.2f}s" if record['latency'] is not None else "-"
+    print(f"{_format_time(record['posted_at'])}  [{record['route']}] {record['symbol'] or '-'} "
+          f"{record['side'] or ''} {', '.join(levels)}  ({record['sender'] or '?'}, {latency})")
+    print("    " + " ".join(record['text'].split())[:200])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the forwarder's signal archive (read-only).")
+    parser.add_argument('path', help="archive database (ARCHIVE_PATH)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search = commands.add_parser('search', help="signals by text, symbol and time, newest first")
+    search.add_argument('text', nargs='?', help="full-text query (FTS5 syntax: words, \"phrases\", OR, prefix*)")
+    search.add_argument('--symbol')
+    search.add_argument('--route')
+    search.add_argument('--source')
+    symbols = commands.add_parser('symbols', help="signal counts per symbol")
+    for command in (search, symbols):
+        command.add_argument('--since', help="epoch seconds, ISO date/time (UTC) or a span such as 24h or 7d")
+        command.add_argument('--until')
+        command.add_argument('--limit', type=int, default=50)
+        command.add_argument('--json', action='store_true', help="one JSON object per line")
+    args = parser.parse_args(argv)
+
+    try:
+        since, until = parse_time(args.since), parse_time(args.until)
+        conn = sqlite3.connect(f"file:{args.path}?mode=ro", uri=True)
+    except (ValueError, sqlite3.Error) as e:
+        parser.error(str(e))
+
+    try:
+        if args.command == 'symbols':
+            records = [symbol_row_to_dict(row) for row in conn.execute(*symbols_query(since, until, args.limit))]
+        else:
+            fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'signals_fts'").fetchone() is not None
+            sql, params = search_query(args.text, args.symbol, since, until, args.route, args.source, args.limit, fts)
+            try:
+                records = [row_to_dict(row) for row in conn.execute(sql, params)]
+            except sqlite3.OperationalError as e:
+                parser.error(f"invalid search: {e}")
+    finally:
+        conn.close()
+
+    for record in records:
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False))
+        elif args.command == 'symbols':
+            print(f"{record['symbol']:<16} {record['signals']:>6}  {_format_time(record['first'])} .. "
+                  f"{_format_time(record['last'])}")
+        else:
+            _print_signal(record)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,514 @@
+"""
+OFFLINE REPLAY BENCHMARK
+Drives the real TelegramSignalForwarder handler and pipeline with an
+in-memory stand-in for TelegramClient, so throughput and latency can be
+measured (and gated in CI) without a Telegram account or network.
+
+Examples:
+    python benchmark.py --messages 20000 --match-ratio 0.1
+    python benchmark.py --rate 500 --send-latency 0.05 --flood-rate 0.01
+    python benchmark.py --input recorded.jsonl --json
+    python benchmark.py --min-throughput 2000 --max-p99-ms 50   # CI gate
+    python benchmark.py --format-only --rules 100 --max-format-us 50
+
+A recorded stream is a JSON-lines file with one message per line:
+    {"chat_id": -1001, "sender_id": 42, "text": "🔔 NEW SIGNAL! ..."}
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from telethon.errors import FloodWaitError
+
+from accounts import Account, ClientPool
+from digest import Digest
+from outbox import Outbox
+from pipeline import ForwardPipeline
+from ratelimit import SendScheduler
+from routing import Route, RouteTable
+from templates import DEFAULT_HEADER, MessageTemplate
+
+SOURCE_CHAT_ID = -1001000000001
+SIGNAL_HEADER = '🔔 NEW SIGNAL!'
+SIGNAL_BODY = (
+    "\n\n🎫 Trade: 🇪🇺 EUR/CAD 🇨🇦 (OTC)\n⏳ Timer: 5 minutes\n➡️ Entry: 7:12 PM\n"
+    "📈 Direction: SELL 🟥\n\n↪️ Martingale Levels:\n Level 1 → 7:17 PM\n Level 2 → 7:22 PM"
+)
+NOISE_BODY = "gm everyone, what do you think about the market today? " * 3
+
+
+def load_app():
+    """
+    Import the forwarder module for the full replay.
+
+    Importing app loads .env and starts the logging listener, so the
+    --format-only gate (and the tests) never do; main() stops the
+    listener again when the replay is done.
+    """
+    # Keep the forwarder's import-time configuration self-contained
+    os.environ.setdefault('API_ID', '1')
+    os.environ.setdefault('METRICS_ENABLED', 'false')
+    import app
+    return app
+
+
+class FakeEntity:
+    """Stand-in for a Telethon chat or user."""
+
+    def __init__(self, entity_id, title=None, username=None, first_name=None):
+        self.id = entity_id
+        self.title = title
+        self.username = username
+        self.first_name = first_name
+        self.last_name = None
+
+
+class FakeMessage:
+    """Just enough of a Telethon Message for the forwarder."""
+
+    def __init__(self, client, message_id, chat_id, sender_id, text):
+        self._client = client
+        self.id = message_id
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.message = text
+        self.text = text
+        self.date = datetime.now(timezone.utc)
+        self.edit_date = None
+        self.grouped_id = None
+        self.media = None
+        self.photo = None
+        self.document = None
+
+    async def get_sender(self):
+        return await self._client.get_sender(self.sender_id)
+
+
+class FakeEvent:
+    def __init__(self, message):
+        self.message = message
+        self.chat_id = message.chat_id
+
+
+class FakeTelegramClient:
+    """
+    In-memory TelegramClient with configurable latency and FloodWaits.
+
+    Every send sleeps send_latency (+/- jitter) and, with probability
+    flood_rate, raises FloodWaitError(flood_seconds) instead.
+    """
+
+    def __init__(self, send_latency=0.0, jitter=0.0, flood_rate=0.0, flood_seconds=1,
+                 sender_latency=0.0, seed=None):
+        self.send_latency = send_latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.sender_latency = sender_latency
+        self.random = random.Random(seed)
+
+        self.sent = 0
+        self.flood_waits = 0
+        self.sender_lookups = 0
+        self._next_id = 1
+
+    def is_connected(self):
+        return True
+
+    async def _round_trip(self):
+        latency = self.send_latency
+        if self.jitter:
+            latency = max(0.0, latency + self.random.uniform(-self.jitter, self.jitter))
+        if latency:
+            await asyncio.sleep(latency)
+        else:
+            await asyncio.sleep(0)
+        if self.flood_rate and self.random.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+    async def get_sender(self, sender_id):
+        self.sender_lookups += 1
+        if self.sender_latency:
+            await asyncio.sleep(self.sender_latency)
+        return FakeEntity(sender_id, username=f"user{sender_id}")
+
+    async def send_message(self, entity, message, **kwargs):
+        await self._round_trip()
+        self.sent += 1
+        self._next_id += 1
+        return self._next_id
+
+    async def forward_messages(self, entity, messages, from_peer=None, **kwargs):
+        await self._round_trip()
+        self.sent += 1
+        return list(messages)
+
+    async def send_file(self, entity, file, **kwargs):
+        await self._round_trip()
+        self.sent += 1
+
+    async def edit_message(self, entity, message, text=None, **kwargs):
+        await self._round_trip()
+        self.sent += 1
+
+    async def delete_messages(self, entity, message_ids, **kwargs):
+        await self._round_trip()
+        self.sent += 1
+
+    async def get_messages(self, entity, ids=None, **kwargs):
+        return []
+
+
+def synthetic_stream(count, match_ratio, senders, seed=None, duplicate_ratio=0.0):
+    """
+    Yield (chat_id, sender_id, text) tuples with the given signal ratio.
+
+    A duplicate_ratio share of the signals repeat an earlier signal's text.
+    """
+    rng = random.Random(seed)
+    signals = []
+    for i in range(count):
+        sender_id = 1000 + rng.randrange(senders)
+        if rng.random() < match_ratio:
+            if signals and rng.random() < duplicate_ratio:
+                text = rng.choice(signals)
+            else:
+                text = f"{SIGNAL_HEADER}{SIGNAL_BODY}\n#{i}"
+                signals.append(text)
+        else:
+            text = f"{NOISE_BODY}#{i}"
+        yield SOURCE_CHAT_ID, sender_id, text
+
+
+def recorded_stream(path):
+    """Yield (chat_id, sender_id, text) tuples from a JSON-lines file."""
+    with open(path, 'r', encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                yield record.get('chat_id', SOURCE_CHAT_ID), record.get('sender_id', 1000), record.get('text', '')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_forwarder(clients, args):
+    """A real forwarder wired to the fake clients (the first is the primary) and synthetic routes."""
+    forwarder = load_app().TelegramSignalForwarder()
+    forwarder.client = clients[0]
+    forwarder.is_running = True
+
+    routes = []
+    forwarder.entities['source'] = FakeEntity(SOURCE_CHAT_ID, title='Bench Source')
+    for i in range(args.routes):
+        target = f"target-{i % args.targets}"
+        forwarder.entities.setdefault(target, FakeEntity(-1002000000000 - i, title=f"Bench Target {i}"))
+        keywords = [f"KW{i}", "EUR/"] if args.routes > 1 else []
+        routes.append(Route(f"route-{i}", 'source', target, header=SIGNAL_HEADER, keywords=keywords,
+                            mode=args.mode, digest_window=args.digest_window, digest_max=args.digest_max))
+    forwarder.routes = RouteTable(routes)
+    forwarder.routes.bind({'source': SOURCE_CHAT_ID}, {})
+    forwarder.compile_templates()
+
+    if args.realistic_limits:
+        forwarder.scheduler = SendScheduler()
+    else:
+        forwarder.scheduler = SendScheduler(target_rate=1e9, target_burst=1e9,
+                                            account_rate=1e9, account_burst=1e9)
+
+    # Every fake account can reach every chat
+    forwarder.pool = ClientPool(forwarder.scheduler)
+    forwarder.pool.add(Account('primary', clients[0], forwarder.entities, forwarder.titles, primary=True))
+    for i, client in enumerate(clients[1:], start=2):
+        forwarder.pool.add(Account(f"account{i}", client, dict(forwarder.entities)))
+    return forwarder
+
+
+async def run(args):
+    clients = [
+        FakeTelegramClient(
+            send_latency=args.send_latency,
+            jitter=args.jitter,
+            flood_rate=args.flood_rate,
+            flood_seconds=args.flood_seconds,
+            sender_latency=args.sender_latency,
+            seed=args.seed + i,
+        )
+        for i in range(max(1, args.accounts))
+    ]
+    client = clients[0]
+    forwarder = build_forwarder(clients, args)
+
+    # Time every job from injection to send acknowledgement
+    injected = {}
+    latencies = []
+    deliver = forwarder.deliver_signal
+
+    async def timed_deliver(job):
+        delivered = await deliver(job)
+        if delivered:
+            acknowledged = time.perf_counter()
+            for part in (job.jobs if isinstance(job, Digest) else [job]):
+                latencies.append(acknowledged - injected[part.message_id])
+        return delivered
+
+    forwarder.pipeline = ForwardPipeline(
+        send=timed_deliver,
+        maxsize=args.queue_size,
+        workers_per_target=args.workers,
+        overflow=args.overflow,
+        on_drop=forwarder.abandon,
+    )
+    forwarder.pipeline.start()
+
+    if args.outbox:
+        forwarder.outbox = Outbox(args.outbox, flush_interval=load_app().OUTBOX_FLUSH_MS / 1000)
+        await forwarder.outbox.open()
+
+    if args.input:
+        stream = recorded_stream(args.input)
+    else:
+        stream = synthetic_stream(args.messages, args.match_ratio, args.senders, seed=args.seed,
+                                  duplicate_ratio=args.duplicate_ratio)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    interval = 1.0 / args.rate if args.rate else 0.0
+    handlers = set()
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    next_at = loop.time()
+    count = 0
+
+    for message_id, (chat_id, sender_id, text) in enumerate(stream, start=1):
+        message = FakeMessage(client, message_id, chat_id, sender_id, text)
+        injected[message_id] = time.perf_counter()
+
+        # Telethon runs every handler call in its own task
+        task = asyncio.create_task(forwarder.forward_signal_message(FakeEvent(message)))
+        handlers.add(task)
+        task.add_done_callback(handlers.discard)
+        count += 1
+
+        if interval:
+            next_at += interval
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif count % 256 == 0:
+            await asyncio.sleep(0)
+
+    if handlers:
+        await asyncio.gather(*list(handlers))
+    await forwarder.albums.flush()
+    await forwarder.digests.flush()
+    await forwarder.pipeline.stop(drain_timeout=args.drain_timeout)
+    elapsed = time.perf_counter() - started
+
+    traced_peak = None
+    if args.tracemalloc:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    if forwarder.outbox:
+        await forwarder.outbox.close()
+
+    latencies.sort()
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        max_rss *= 1024
+
+    return {
+        'messages': count,
+        'forwarded': len(latencies),
+        'elapsed_seconds': round(elapsed, 4),
+        'messages_per_second': round(count / elapsed, 1) if elapsed else 0.0,
+        'forwards_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'p999': round(percentile(latencies, 0.999) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        'sends': sum(c.sent for c in clients),
+        'sends_per_account': {name: a.sends for name, a in forwarder.pool.accounts.items()},
+        'failovers': sum(a.failovers for a in forwarder.pool.accounts.values()),
+        'flood_waits': sum(c.flood_waits for c in clients),
+        'sender_lookups': client.sender_lookups,
+        'duplicates_suppressed': forwarder.dedup.hits if forwarder.dedup is not None else 0,
+        'digests': forwarder.digests.digests,
+        'dropped': forwarder.pipeline.dropped,
+        'peak_rss_bytes': max_rss,
+        'peak_traced_bytes': traced_peak,
+    }
+
+
+def bench_transforms(rules):
+    """Link/mention stripping plus rules extra regex rules, one in five a rewrite."""
+    transforms = [{'strip': 'links'}, {'strip': 'mentions'}]
+    for i in range(rules):
+        if i % 5 == 4:
+            transforms.append({'pattern': rf"\bLEVEL{i}\b", 'replace': f"L{i}"})
+        else:
+            transforms.append({'pattern': rf"\bspam{i}\b|ref{i}=\w+"})
+    return transforms
+
+
+def run_format(args):
+    """Time header + transforms + footer rendering for every synthetic signal."""
+    template = MessageTemplate(
+        header=DEFAULT_HEADER,
+        footer="\n\n— via {route} ({target})",
+        transforms=bench_transforms(args.rules),
+        static={'source': 'Bench Source', 'target': 'Bench Target', 'route': 'route-0'},
+    )
+    texts = [
+        f"{text} https://t.me/bench?start=ref{i} @bench_channel"
+        for i, (_, _, text) in enumerate(synthetic_stream(args.messages, 1.0, args.senders, seed=args.seed))
+    ]
+    render = template.render
+    started = time.perf_counter()
+    for text in texts:
+        render(text, "Bench Sender")
+    elapsed = time.perf_counter() - started
+    return {
+        'messages': len(texts),
+        'rules': args.rules + 2,
+        'regex_passes': template.rules,
+        'elapsed_seconds': round(elapsed, 4),
+        'us_per_message': round(elapsed / max(1, len(texts)) * 1e6, 2),
+    }
+
+
+def print_report(result):
+    latency = result['latency_ms']
+    print("=" * 60)
+    print("📊 REPLAY BENCHMARK")
+    print("=" * 60)
+    print(f"   Messages:        {result['messages']} in {result['elapsed_seconds']:.2f}s")
+    print(f"   Throughput:      {result['messages_per_second']:.1f} msg/s, "
+          f"{result['forwards_per_second']:.1f} forwards/s")
+    print(f"   Forwarded:       {result['forwarded']} ({result['sends']} sends, {result['dropped']} dropped)")
+    print(f"   Latency (ms):    p50={latency['p50']:.2f} p99={latency['p99']:.2f} "
+          f"p999={latency['p999']:.2f} max={latency['max']:.2f}")
+    print(f"   FloodWaits:      {result['flood_waits']}")
+    if len(result['sends_per_account']) > 1:
+        print(f"   Accounts:        {result['sends_per_account']} ({result['failovers']} failovers)")
+    print(f"   Sender lookups:  {result['sender_lookups']}")
+    print(f"   Duplicates:      {result['duplicates_suppressed']} suppressed")
+    if result['digests']:
+        print(f"   Digests:         {result['digests']} "
+              f"({result['sends'] / max(1, result['forwarded']):.2f} sends per signal)")
+    print(f"   Peak RSS:        {result['peak_rss_bytes'] / 1048576:.1f} MiB")
+    if result['peak_traced_bytes'] is not None:
+        print(f"   Peak traced:     {result['peak_traced_bytes'] / 1048576:.1f} MiB")
+    print("=" * 60)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a message stream through the forwarder offline.")
+    stream = parser.add_argument_group('stream')
+    stream.add_argument('--input', help="JSON-lines file of recorded messages (default: synthetic)")
+    stream.add_argument('--messages', type=int, default=10000, help="synthetic messages to generate")
+    stream.add_argument('--match-ratio', type=float, default=0.2, help="fraction of synthetic messages that are signals")
+    stream.add_argument('--duplicate-ratio', type=float, default=0.0,
+                        help="fraction of synthetic signals that repeat an earlier one")
+    stream.add_argument('--senders', type=int, default=50, help="distinct synthetic senders")
+    stream.add_argument('--rate', type=float, default=0.0, help="messages per second (0 = as fast as possible)")
+    stream.add_argument('--seed', type=int, default=1)
+
+    setup = parser.add_argument_group('forwarder')
+    setup.add_argument('--routes', type=int, default=1)
+    setup.add_argument('--targets', type=int, default=1)
+    setup.add_argument('--mode', choices=('copy', 'forward'), default='copy')
+    setup.add_argument('--workers', type=int, default=1, help="workers per target")
+    setup.add_argument('--queue-size', type=int, default=100000)
+    setup.add_argument('--overflow', default='block')
+    setup.add_argument('--outbox', help="SQLite outbox path to include in the measurement")
+    setup.add_argument('--accounts', type=int, default=1, help="fake accounts in the client pool")
+    setup.add_argument('--digest-window', type=float, default=0.0,
+                       help="seconds to batch signals into digests (copy mode, 0 = off)")
+    setup.add_argument('--digest-max', type=int, default=20, help="signals per digest at most")
+    setup.add_argument('--realistic-limits', action='store_true', help="use the default send rate limits")
+    setup.add_argument('--drain-timeout', type=float, default=300.0)
+    setup.add_argument('--format-only', action='store_true',
+                       help="only time message formatting (templates and transforms)")
+    setup.add_argument('--rules', type=int, default=50, help="extra transform rules for --format-only")
+
+    fake = parser.add_argument_group('fake client')
+    fake.add_argument('--send-latency', type=float, default=0.0, help="seconds per send")
+    fake.add_argument('--jitter', type=float, default=0.0, help="+/- seconds added to each send")
+    fake.add_argument('--sender-latency', type=float, default=0.0, help="seconds per get_sender() miss")
+    fake.add_argument('--flood-rate', type=float, default=0.0, help="probability a send raises FloodWaitError")
+    fake.add_argument('--flood-seconds', type=int, default=1)
+
+    report = parser.add_argument_group('report')
+    report.add_argument('--json', action='store_true', help="print the result as JSON")
+    report.add_argument('--tracemalloc', action='store_true', help="also report peak traced Python allocations")
+    report.add_argument('--log-level', default='WARNING')
+    report.add_argument('--min-throughput', type=float, help="fail if messages/s is below this")
+    report.add_argument('--max-p99-ms', type=float, help="fail if p99 latency (ms) is above this")
+    report.add_argument('--max-format-us', type=float, help="fail if formatting takes longer (µs per message)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    level = args.log_level.upper()
+    logging.getLogger().setLevel(level)
+
+    if args.format_only:
+        result = run_format(args)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print(f"📝 Formatted {result['messages']} signals with {result['rules']} rules "
+                  f"({result['regex_passes']} regex passes): {result['us_per_message']:.2f} µs per message")
+        if args.max_format_us is not None and result['us_per_message'] > args.max_format_us:
+            print(f"❌ REGRESSION: formatting {result['us_per_message']} µs > {args.max_format_us}", file=sys.stderr)
+            return 1
+        return 0
+
+    # Importing app configures logging, so set the level again afterwards
+    app = load_app()
+    logging.getLogger().setLevel(level)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if app.LOG_LISTENER:
+            app.LOG_LISTENER.stop()
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    failures = []
+    if args.min_throughput is not None and result['messages_per_second'] < args.min_throughput:
+        failures.append(f"throughput {result['messages_per_second']} msg/s < {args.min_throughput}")
+    if args.max_p99_ms is not None and result['latency_ms']['p99'] > args.max_p99_ms:
+        failures.append(f"p99 {result['latency_ms']['p99']} ms > {args.max_p99_ms}")
+    for failure in failures:
+        print(f"❌ REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+ENTITY CACHE
+Small bounded LRU cache with a time-to-live, used to avoid repeated
+get_sender() round trips for the same users.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Bounded LRU mapping whose entries expire after ttl seconds.
+
+    Once maxsize entries are stored, the least recently used one is
+    evicted on every insert, so memory use never grows past maxsize.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        """Return the cached value, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at < self.clock():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry if full."""
+        self._data[key] = (self.clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove a key and return its value (expired or not)."""
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def items(self):
+        """Snapshot of the unexpired (key, value) pairs, least recently used first."""
+        now = self.clock()
+        return [(key, value) for key, (expires_at, value) in self._data.items() if expires_at >= now]
+
+    def clear(self):
+        self._data.clear()
@@ -0,0 +1,243 @@
+"""
+GAP RECOVERY
+Messages posted while the connection was down (or the process was
+restarting) never reach the event handler. The forwarder remembers the
+highest message id it has processed per source chat, and after a
+reconnect or restart walks the history from there with batched
+iter_messages() calls, feeding each message through the normal match
+pipeline in order.
+
+Live messages advance the same checkpoints, so the position to recover
+from is snapshotted before the gap can be skipped over: when the
+forwarder starts (before its handlers are registered) and when the
+connection is seen to drop.
+
+Catch-up is paced by its own token bucket so a long gap cannot crowd
+out live traffic, and messages older than max_age are not forwarded.
+Anything already handled is skipped: live messages are remembered in
+a short-lived set, and the outbox ignores signals it has seen before.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoints:
+    """
+    Highest processed (message id, date) per source chat, in a JSON file.
+
+    advance() only updates memory; the file is rewritten at most every
+    interval seconds by a background task (and on stop), so tracking
+    costs nothing on the message path.
+    """
+
+    def __init__(self, path, interval=5.0):
+        self.path = path
+        self.interval = interval
+        self.chats = {}  # chat_id -> [message_id, unix date]
+        self._dirty = False
+        self._task = None
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as handle:
+                    self.chats = {int(chat): list(value) for chat, value in json.load(handle).items()}
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"⚠️ Could not read checkpoints {path}: {e}")
+
+    def get(self, chat_id):
+        """(message_id, date) of the last processed message, or None."""
+        value = self.chats.get(chat_id)
+        return tuple(value) if value else None
+
+    def advance(self, chat_id, message_id, date=None):
+        """Record a processed message; older ids are ignored."""
+        current = self.chats.get(chat_id)
+        if current is None or message_id > current[0]:
+            self.chats[chat_id] = [message_id, date if date is not None else time.time()]
+            self._dirty = True
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle)
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        """Write the file if anything changed (off the event loop)."""
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        data = {str(chat): value for chat, value in self.chats.items()}
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+        except OSError as e:
+            self._dirty = True
+            logger.warning(f"⚠️ Could not write checkpoints {self.path}: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.save()
+
+
+class GapRecovery:
+    """
+    Replays missed source messages after a restart or reconnect.
+
+    handle(chat_id, message) is awaited for every missed message, oldest
+    first; seen(chat_id, message_id) tells which ones the live handler
+    already processed. start() runs recover() once for the restart and
+    again whenever the client comes back after being disconnected.
+
+    Create it before the live handlers are registered: the checkpoints
+    are snapshotted here (and again by mark() when the connection
+    drops), and recover() starts from the snapshot, not from whatever
+    live messages advanced the checkpoints to in the meantime.
+    """
+
+    def __init__(self, client, chats, checkpoints, handle, seen=None, max_age=600, rate=20.0,
+                 batch_wait=1.0):
+        self.client = client
+        self.chats = chats  # chat_id -> entity / input peer
+        self.checkpoints = checkpoints
+        self.handle = handle
+        self.seen = seen or (lambda chat_id, message_id: False)
+        self.max_age = max_age
+        self.bucket = TokenBucket(rate, max(1, rate))
+        self.batch_wait = batch_wait
+
+        self.runs = 0
+        self.recovered = 0
+        self.too_old = 0
+        self._lock = asyncio.Lock()
+        self._watcher = None
+        self._tasks = set()
+        self._marks = {}  # chat_id -> checkpoint to recover from
+        self.mark()
+
+    def mark(self):
+        """Snapshot every chat's checkpoint as the start of a gap (older marks win)."""
+        for chat_id in self.chats:
+            if chat_id not in self._marks:
+                self._marks[chat_id] = self.checkpoints.get(chat_id)
+
+    async def recover(self, reason="the restart"):
+        """Catch up every source chat; returns the number of messages recovered."""
+        async with self._lock:
+            self.runs += 1
+            chats = dict(self.chats)  # may be replaced by a routes reload meanwhile
+            marks, self._marks = self._marks, {}
+            results = await asyncio.gather(
+                *(
+                    self._recover_chat(chat_id, entity, marks.get(chat_id, self.checkpoints.get(chat_id)))
+                    for chat_id, entity in chats.items()
+                ),
+                return_exceptions=True
+            )
+        total = 0
+        for chat_id, result in zip(chats, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Catch-up of {chat_id} failed: {result}")
+                # Keep the start of the gap for the next run
+                if chat_id in marks:
+                    self._marks.setdefault(chat_id, marks[chat_id])
+            else:
+                total += result
+        if total:
+            logger.info(f"♻️ Caught up {total} message(s) missed during {reason}")
+        return total
+
+    async def _recover_chat(self, chat_id, entity, checkpoint):
+        if checkpoint is None:
+            # First run for this chat: start tracking from the newest message
+            latest = await self.client.get_messages(entity, limit=1)
+            if latest:
+                self.checkpoints.advance(chat_id, latest[0].id, _timestamp(latest[0].date))
+            return 0
+
+        last_id, last_date = checkpoint
+        cutoff = time.time() - self.max_age
+        if last_date < cutoff:
+            # The gap starts before max_age: begin at the cutoff instead (by date)
+            kwargs = {'offset_date': datetime.fromtimestamp(cutoff, tz=timezone.utc)}
+        else:
+            kwargs = {'min_id': last_id}
+
+        loop = asyncio.get_running_loop()
+        count = 0
+        async for message in self.client.iter_messages(entity, reverse=True, wait_time=self.batch_wait, **kwargs):
+            if message.id <= last_id or self.seen(chat_id, message.id):
+                continue
+            date = _timestamp(message.date)
+            if date < cutoff:
+                self.too_old += 1
+                continue
+
+            wait = self.bucket.reserve(loop.time())
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.handle(chat_id, message)
+            self.recovered += 1
+            count += 1
+        return count
+
+    def start(self, interval=1.0):
+        """Catch up in the background now, then after every reconnect."""
+        self._spawn("the restart")
+        self._watcher = asyncio.create_task(self._watch(interval))
+
+    def _spawn(self, reason):
+        task = asyncio.create_task(self._recover_logged(reason))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _watch(self, interval):
+        connected = self.client.is_connected()
+        while True:
+            await asyncio.sleep(interval)
+            now_connected = self.client.is_connected()
+            if connected and not now_connected:
+                # Live messages after the reconnect must not move the start of the gap
+                self.mark()
+            elif now_connected and not connected:
+                logger.info("🔌 Reconnected, catching up on missed messages")
+                self._spawn("the disconnect")
+            connected = now_connected
+
+    async def _recover_logged(self, reason):
+        try:
+            await self.recover(reason)
+        except Exception as e:
+            logger.error(f"❌ Catch-up after {reason} failed: {e}")
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        if self._watcher is not None:
+            tasks.append(self._watcher)
+            self._watcher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _timestamp(date):
+    return date.timestamp() if date else time.time()
@@ -0,0 +1,191 @@
+"""
+DUPLICATE SUPPRESSION
+The same signal is often reposted in one source group or shared across
+several. Each signal is reduced to a fingerprint of its normalized text
+(case, whitespace, emoji, formatting and route headers removed) and
+checked against the fingerprints already sent to the same target within
+a time window.
+
+The index is a ring of generations: new fingerprints go into the
+newest one and the oldest is dropped as time passes (or when the newest
+is full), so memory stays bounded however long the process runs.
+Optionally, near-duplicates are caught with a 64-bit simhash and a
+Hamming-distance threshold.
+"""
+
+import hashlib
+import time
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+# Generations in the ring; entries live between window and window * G / (G - 1)
+GENERATIONS = 4
+
+# Emoji, symbols, format characters (ZWJ, variation selectors...) and markup
+_DROP_CATEGORIES = {'So', 'Sk', 'Cf', 'Cs', 'Co'}
+_DROP_CHARS = set('*_~`|') | {chr(c) for c in range(0xFE00, 0xFE10)}
+
+_SHINGLE = 4
+_BANDS = 8  # simhash split into 8-bit bands; distance < BANDS guarantees a shared band
+
+
+def _strip(text):
+    return "".join(
+        char for char in text.casefold()
+        if not (char.isspace() or char in _DROP_CHARS or unicodedata.category(char) in _DROP_CATEGORIES)
+    )
+
+
+@lru_cache(maxsize=256)
+def _normalized_header(header):
+    return _strip(header)
+
+
+def normalize(text, headers=()):
+    """Lower-cased text without whitespace, emoji, markup or any of the given headers."""
+    normalized = _strip(text)
+    # Longest first, so a header containing another is removed whole
+    for header in sorted({_normalized_header(h) for h in headers if h}, key=len, reverse=True):
+        if header:
+            normalized = normalized.replace(header, "")
+    return normalized
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(normalized):
+    """64-bit simhash over character shingles."""
+    if len(normalized) <= _SHINGLE:
+        return _hash64(normalized)
+    shingles = [
+        format(_hash64(normalized[i:i + _SHINGLE]), '064b')
+        for i in range(len(normalized) - _SHINGLE + 1)
+    ]
+    # Majority vote per bit position (columns of the binary strings)
+    half = len(shingles) / 2
+    bits = "".join('1' if column.count('1') > half else '0' for column in zip(*shingles))
+    return int(bits, 2)
+
+
+def _bands(value):
+    width = 64 // _BANDS
+    mask = (1 << width) - 1
+    return [(band, value >> (band * width) & mask) for band in range(_BANDS)]
+
+
+class Fingerprint:
+    """Exact hash of the normalized text, plus its simhash in near mode."""
+
+    __slots__ = ('exact', 'near')
+
+    def __init__(self, normalized, near=False):
+        self.exact = _hash64(normalized)
+        self.near = simhash(normalized) if near else None
+
+
+class _Generation:
+    __slots__ = ('started', 'updated', 'exact', 'bands', 'size')
+
+    def __init__(self, started):
+        self.started = started
+        self.updated = started  # last insert
+        self.exact = set()  # (scope, exact hash)
+        self.bands = {}     # (scope, band, band value) -> [simhash, ...]
+        self.size = 0
+
+
+class DuplicateIndex:
+    """
+    Time-windowed set of fingerprints per scope (the target chat).
+
+    check(scope, fingerprint) returns True for a duplicate and otherwise
+    records the fingerprint, so the first copy always goes through.
+    forget(scope, fingerprint) takes it back when that copy is never
+    delivered, so a repost can go out instead.
+    """
+
+    def __init__(self, window=900, maxsize=50000, near_distance=0, clock=time.monotonic):
+        if window <= 0:
+            raise ValueError("dedup window must be > 0 seconds")
+        self.window = window
+        self.maxsize = maxsize
+        self.near_distance = min(near_distance, _BANDS - 1)
+        self.clock = clock
+        self.span = window / (GENERATIONS - 1)
+        self.capacity = max(1, maxsize // GENERATIONS)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._generations = deque([_Generation(clock())])
+
+    @property
+    def near(self):
+        return self.near_distance > 0
+
+    def __len__(self):
+        return sum(generation.size for generation in self._generations)
+
+    def _rotate(self, now):
+        current = self._generations[-1]
+        if now - current.started < self.span and current.size < self.capacity:
+            return current
+        current = _Generation(now)
+        generations = self._generations
+        generations.append(current)
+        # Drop the oldest generation once the ring is full or everything in it is out of the
+        # window; the new generation always stays
+        while len(generations) > 1 and (
+            len(generations) > GENERATIONS or generations[0].updated <= now - self.window
+        ):
+            generations.popleft()
+        return current
+
+    def _is_near(self, scope, value):
+        for generation in self._generations:
+            for band, band_value in _bands(value):
+                for other in generation.bands.get((scope, band, band_value), ()):
+                    if bin(value ^ other).count('1') <= self.near_distance:
+                        return True
+        return False
+
+    def check(self, scope, fingerprint):
+        """True if scope saw this (or, in near mode, a similar) fingerprint within the window."""
+        current = self._rotate(self.clock())
+        key = (scope, fingerprint.exact)
+        if any(key in generation.exact for generation in self._generations):
+            self.hits += 1
+            return True
+        if fingerprint.near is not None and self._is_near(scope, fingerprint.near):
+            self.hits += 1
+            self.near_hits += 1
+            return True
+
+        self.misses += 1
+        current.exact.add(key)
+        if fingerprint.near is not None:
+            for band, band_value in _bands(fingerprint.near):
+                current.bands.setdefault((scope, band, band_value), []).append(fingerprint.near)
+        current.size += 1
+        current.updated = self.clock()
+        return False
+
+    def forget(self, scope, fingerprint):
+        """Remove a fingerprint recorded by check(); True if it was there."""
+        key = (scope, fingerprint.exact)
+        for generation in self._generations:
+            if key not in generation.exact:
+                continue
+            generation.exact.discard(key)
+            generation.size -= 1
+            if fingerprint.near is not None:
+                for band, band_value in _bands(fingerprint.near):
+                    values = generation.bands.get((scope, band, band_value))
+                    if values and fingerprint.near in values:
+                        values.remove(fingerprint.near)
+                        if not values:
+                            del generation.bands[(scope, band, band_value)]
+            return True
+        return False
@@ -0,0 +1,145 @@
+"""
+DIGEST MODE
+During bursts, every matched signal costs one send_message call and one
+slot of the target's rate limit. Routes with a digest window instead
+collect their signals for up to digest_window seconds (or digest_max
+signals, whichever comes first) and send them as one combined message,
+split at Telegram's text limit on signal boundaries.
+
+A digest is queued on the forward pipeline like a single job, so the
+extra latency is bounded by the window.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Digest:
+    """Signals of one route sent together as one (or a few) messages."""
+
+    __slots__ = ('route', 'jobs', 'deadline')
+
+    def __init__(self, route, jobs):
+        self.route = route
+        self.jobs = jobs
+        self.deadline = max(job.deadline for job in jobs)
+
+
+class DigestCollector:
+    """
+    Buffers ForwardJobs per digest route.
+
+    on_ready(digest) is awaited once per batch: route.digest_window
+    seconds after its first job arrived, or as soon as it holds
+    route.digest_max jobs.
+    """
+
+    def __init__(self, on_ready):
+        self.on_ready = on_ready
+        self.digests = 0
+        self._pending = {}  # route name -> [job, ...]
+        self._timers = {}   # route name -> task flushing the batch after the window
+        self._tasks = set()
+
+    def add(self, job):
+        """Buffer one job of a digest route."""
+        route = job.route
+        jobs = self._pending.get(route.name)
+        if jobs is None:
+            jobs = self._pending[route.name] = []
+            self._timers[route.name] = self._spawn(self._flush_later(route, jobs))
+        jobs.append(job)
+        if len(jobs) >= route.digest_max:
+            # Detach the full batch now so later jobs start a new one
+            self._detach(route)
+            self._spawn(self._send(route, jobs))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _detach(self, route):
+        del self._pending[route.name]
+        timer = self._timers.pop(route.name)
+        if timer is not asyncio.current_task():
+            timer.cancel()
+
+    async def _flush_later(self, route, jobs):
+        await asyncio.sleep(route.digest_window)
+        await self._flush(route, jobs)
+
+    async def _flush(self, route, jobs):
+        # The batch may already have gone out when it filled up
+        if self._pending.get(route.name) is not jobs:
+            return
+        self._detach(route)
+        await self._send(route, jobs)
+
+    async def _send(self, route, jobs):
+        self.digests += 1
+        try:
+            await self.on_ready(Digest(route, jobs))
+        except Exception as e:
+            logger.error(f"❌ Could not queue digest of {len(jobs)} signal(s) for route {route.name}: {e}")
+
+    async def flush(self):
+        """Hand over every buffered batch now."""
+        for name, jobs in list(self._pending.items()):
+            await self._flush(jobs[0].route, jobs)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+def pack_texts(texts, limit, separator="\n\n"):
+    """
+    Join texts into as few messages of at most limit characters as possible.
+
+    Texts are never split unless one alone is longer than limit, in
+    which case it is cut at line breaks (or hard at limit as a last
+    resort).
+    """
+    return [message for message, _ in pack_parts(texts, limit, separator)]
+
+
+def pack_parts(texts, limit, separator="\n\n"):
+    """
+    pack_texts() that also tells which texts went into which message:
+    [(message, [index of a text in texts, ...]), ...]. A text that had
+    to be split is listed in every message holding a piece of it.
+    """
+    parts = []
+    current = ""
+    indexes = []
+    for index, text in enumerate(texts):
+        for piece in _split_long(text, limit):
+            if current and len(current) + len(separator) + len(piece) <= limit:
+                current += separator + piece
+            else:
+                if current:
+                    parts.append((current, indexes))
+                    indexes = []
+                current = piece
+            if not indexes or indexes[-1] != index:
+                indexes.append(index)
+    if current:
+        parts.append((current, indexes))
+    return parts
+
+
+def _split_long(text, limit):
+    if len(text) <= limit:
+        return [text]
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        pieces.append(text)
+    return pieces
@@ -0,0 +1,118 @@
+"""
+LOGGING SETUP
+Configures the root logger from LOG_LEVEL / LOG_FORMAT / LOG_ASYNC:
+
+- text or JSON (one object per line) output on stdout, which Render captures
+- optional QueueHandler/QueueListener so the event loop only enqueues
+  records and a background thread does the formatting and writing
+- rate limiting for DEBUG records, per message template, so per-message
+  debug output cannot flood the log during bursts
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any extra= fields."""
+
+    def format(self, record):
+        data = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """
+    Token bucket per (logger, message template) for DEBUG records.
+
+    Records above DEBUG always pass. When a template is over its rate,
+    records are dropped and counted; the next one that gets through
+    carries the count as `suppressed`.
+    """
+
+    def __init__(self, rate=5.0, burst=20):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # key -> [tokens, updated, suppressed]
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > 1024:
+                self._buckets.clear()
+            bucket = self._buckets[key] = [self.burst, now, 0]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+
+        bucket[0] -= 1
+        if bucket[2]:
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+def setup_logging(level='INFO', fmt='text', use_queue=True, debug_rate=5.0, debug_burst=20):
+    """
+    Configure the root logger and return the QueueListener (or None).
+
+    Call listener.stop() at shutdown to flush queued records.
+    """
+    numeric_level = logging.getLevelName(str(level).upper())
+    if not isinstance(numeric_level, int):
+        numeric_level = logging.INFO
+
+    stream_handler = logging.StreamHandler(sys.stdout)  # Render captures stdout
+    stream_handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(numeric_level)
+
+    rate_limit = DebugRateLimitFilter(rate=debug_rate, burst=debug_burst)
+    listener = None
+    if use_queue:
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(rate_limit)
+        root.addHandler(queue_handler)
+        listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+        listener.start()
+    else:
+        stream_handler.addFilter(rate_limit)
+        root.addHandler(stream_handler)
+
+    # Telethon is chatty at DEBUG; keep it at INFO unless asked otherwise
+    if numeric_level < logging.INFO:
+        logging.getLogger('telethon').setLevel(logging.INFO)
+
+    return listener
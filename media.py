@@ -0,0 +1,55 @@
+"""
+ALBUM COLLECTOR
+Telegram delivers each photo/video of an album as its own message, all
+sharing one grouped_id. The collector holds the parts for a short,
+fixed window and hands the whole album over at once, so it can be
+matched on its caption and forwarded in one forward_messages call.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AlbumCollector:
+    """
+    Buffers album parts per (chat, grouped_id).
+
+    on_complete(chat_id, messages) is awaited once per album, window
+    seconds after its first part arrived, with parts sorted by id.
+    """
+
+    def __init__(self, on_complete, window=0.6):
+        self.on_complete = on_complete
+        self.window = window
+        self._albums = {}  # (chat_id, grouped_id) -> [message, ...]
+        self._tasks = set()
+
+    def add(self, chat_id, message):
+        """Buffer one album part."""
+        key = (chat_id, message.grouped_id)
+        parts = self._albums.get(key)
+        if parts is None:
+            self._albums[key] = [message]
+            task = asyncio.create_task(self._flush_later(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            parts.append(message)
+
+    async def _flush_later(self, key):
+        await asyncio.sleep(self.window)
+        parts = self._albums.pop(key, [])
+        if not parts:
+            return
+        parts.sort(key=lambda m: m.id)
+        try:
+            await self.on_complete(key[0], parts)
+        except Exception as e:
+            logger.error(f"❌ Could not process album {key[1]}: {e}")
+
+    async def flush(self):
+        """Wait for every buffered album to be handed over."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
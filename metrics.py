@@ -0,0 +1,339 @@
+"""
+METRICS & HEALTH
+Minimal Prometheus-format metrics and an asyncio HTTP server that
+exposes them next to liveness/readiness checks. No extra dependencies.
+
+Endpoints:
+    /metrics  Prometheus text format
+    /healthz  liveness: the event loop is answering
+    /readyz   readiness: connected to Telegram and forwarding
+    /accounts client pool health and load (added by the forwarder with DEBUG_ENDPOINTS)
+    /profile  sampling profile of the next ?seconds= (added by the forwarder with DEBUG_ENDPOINTS)
+    /signals  search of the signal archive, /signals/symbols per symbol (added by the forwarder)
+    /         same as /readyz (Render's healthCheckPath)
+"""
+
+import asyncio
+import json
+import logging
+import math
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a sub-second send up to a multi-minute FloodWait
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+# Seconds; from an in-memory match up to a delayed, rate-limited send
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named family of samples keyed by label values."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=(), fn=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.fn = fn  # optional callback returning a value or {label values: value}
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def samples(self):
+        if self.fn is None:
+            return list(self.values.items())
+        value = self.fn()
+        if isinstance(value, dict):
+            return [(key if isinstance(key, tuple) else (key,), v) for key, v in value.items()]
+        return [((), value)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.samples():
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ('le',)
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning(f"⚠️ Could not collect metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+MESSAGES_SEEN = REGISTRY.register(Counter(
+    'forwarder_messages_seen_total', 'Messages received from source groups'))
+MESSAGES_MATCHED = REGISTRY.register(Counter(
+    'forwarder_messages_matched_total', 'Signals matched, per route', labels=('route',)))
+FORWARDS = REGISTRY.register(Counter(
+    'forwarder_forwards_total', 'Forward attempts, per route and result', labels=('route', 'result')))
+FORWARD_LATENCY = REGISTRY.register(Histogram(
+    'forwarder_forward_latency_seconds',
+    'End-to-end latency from the source message date to the send acknowledgement',
+    labels=('route',)))
+LOOP_LAG = REGISTRY.register(Histogram(
+    'forwarder_event_loop_lag_seconds', 'How late the event loop ran a scheduled wakeup',
+    buckets=LAG_BUCKETS))
+EDITS = REGISTRY.register(Counter(
+    'forwarder_edits_total', 'Source edits applied to forwarded copies, per result', labels=('result',)))
+DELETES = REGISTRY.register(Counter(
+    'forwarder_deleted_copies_total', 'Forwarded messages deleted because the source was deleted'))
+DUPLICATES = REGISTRY.register(Counter(
+    'forwarder_duplicates_suppressed_total', 'Signals not sent because the target got them recently',
+    labels=('route',)))
+DIGEST_SIGNALS = REGISTRY.register(Histogram(
+    'forwarder_digest_signals', 'Signals combined into each digest, per route', labels=('route',),
+    buckets=(1, 2, 5, 10, 20, 50, 100)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'forwarder_stage_seconds', 'Time spent in each stage of handling a signal', labels=('stage',),
+    buckets=STAGE_BUCKETS))
+ROUTE_RELOADS = REGISTRY.register(Counter(
+    'forwarder_route_reloads_total', 'Routing configuration reloads, per result (applied, unchanged, failed)',
+    labels=('result',)))
+
+# Collected from other components at scrape time (their fn is set by the forwarder)
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'forwarder_queue_depth', 'Signals waiting in the pipeline, per target', labels=('target',)))
+QUEUE_DROPPED = REGISTRY.register(Counter(
+    'forwarder_queue_dropped_total', 'Signals dropped because a queue was full'))
+SEND_WAIT = REGISTRY.register(Counter(
+    'forwarder_send_wait_seconds_total', 'Time spent waiting for a send slot, per target', labels=('target',)))
+FLOOD_WAITS = REGISTRY.register(Counter(
+    'forwarder_flood_waits_total', 'FloodWaitErrors received, per target', labels=('target',)))
+FLOOD_WAIT_SECONDS = REGISTRY.register(Counter(
+    'forwarder_flood_wait_seconds_total', 'Seconds of FloodWait imposed, per target', labels=('target',)))
+SENDER_CACHE = REGISTRY.register(Counter(
+    'forwarder_sender_cache_total', 'Sender cache lookups', labels=('result',)))
+CONNECTED = REGISTRY.register(Gauge(
+    'forwarder_connected', '1 while connected to Telegram'))
+TIME_TO_FIRST_LISTEN = REGISTRY.register(Gauge(
+    'forwarder_time_to_first_listen_seconds', 'Seconds from process start to the handler being registered'))
+EDITS_COALESCED = REGISTRY.register(Counter(
+    'forwarder_edits_coalesced_total', 'Source edits folded into a later edit of the same message'))
+DEDUP_LOOKUPS = REGISTRY.register(Counter(
+    'forwarder_dedup_lookups_total', 'Duplicate index lookups, per result', labels=('result',)))
+DEDUP_ENTRIES = REGISTRY.register(Gauge(
+    'forwarder_dedup_entries', 'Fingerprints currently held by the duplicate index'))
+ACCOUNT_CONNECTED = REGISTRY.register(Gauge(
+    'forwarder_account_connected', '1 while the account is connected, per pool account', labels=('account',)))
+ACCOUNT_TARGETS = REGISTRY.register(Gauge(
+    'forwarder_account_targets', 'Target chats assigned to the account by the hash ring', labels=('account',)))
+ACCOUNT_IN_FLIGHT = REGISTRY.register(Gauge(
+    'forwarder_account_in_flight', 'Sends currently waiting or running on the account', labels=('account',)))
+ACCOUNT_SENDS = REGISTRY.register(Counter(
+    'forwarder_account_sends_total', 'Successful sends, per pool account', labels=('account',)))
+ACCOUNT_FAILOVERS = REGISTRY.register(Counter(
+    'forwarder_account_failovers_total', 'Sends taken over from another account', labels=('account',)))
+ACCOUNT_FLOOD_WAITS = REGISTRY.register(Counter(
+    'forwarder_account_flood_waits_total', 'FloodWaits that made the pool fail over, per account',
+    labels=('account',)))
+CATCHUP_RUNS = REGISTRY.register(Counter(
+    'forwarder_catchup_runs_total', 'Gap recoveries run after a restart or reconnect'))
+CATCHUP_MESSAGES = REGISTRY.register(Counter(
+    'forwarder_catchup_messages_total', 'Missed source messages fetched and processed by gap recovery'))
+CATCHUP_TOO_OLD = REGISTRY.register(Counter(
+    'forwarder_catchup_too_old_total', 'Missed source messages skipped for being older than the max age'))
+LOOP_STALLS = REGISTRY.register(Counter(
+    'forwarder_event_loop_stalls_total', 'Event-loop stalls reported by the watchdog'))
+ROUTES = REGISTRY.register(Gauge(
+    'forwarder_routes', 'Routes in the active routing table'))
+ARCHIVED = REGISTRY.register(Counter(
+    'forwarder_archived_signals_total', 'Forwarded signals written to the signal archive'))
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag by timing a periodic sleep."""
+
+    def __init__(self, interval=0.5, histogram=LOOP_LAG):
+        self.interval = interval
+        self.histogram = histogram
+        self.last_lag = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            self.histogram.observe(self.last_lag)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class MetricsServer:
+    """
+    Tiny HTTP/1.0 server for metrics and health checks.
+
+    ready_check() returns True when the service should receive traffic.
+    More GET endpoints can be added with add_route(path, handler), where
+    handler(query) returns (status, content_type, body).
+    """
+
+    def __init__(self, host, port, registry=REGISTRY, ready_check=None):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.ready_check = ready_check or (lambda: True)
+        self.routes = {
+            '/metrics': self._metrics,
+            '/healthz': self._live,
+            '/readyz': self._ready,
+            '/': self._ready,
+        }
+        self._server = None
+
+    def add_route(self, path, handler):
+        self.routes[path] = handler
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"📈 Metrics & health on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _metrics(self, query):
+        return 200, 'text/plain; version=0.0.4; charset=utf-8', self.registry.render()
+
+    async def _live(self, query):
+        return 200, 'text/plain; charset=utf-8', "ok\n"
+
+    async def _ready(self, query):
+        if self.ready_check():
+            return 200, 'text/plain; charset=utf-8', "ready\n"
+        return 503, 'text/plain; charset=utf-8', "not ready\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain headers; bodies are not supported
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] not in ('GET', 'HEAD'):
+                status, content_type, body = 405, 'text/plain; charset=utf-8', "method not allowed\n"
+            else:
+                url = urlsplit(parts[1])
+                handler = self.routes.get(url.path)
+                if handler is None:
+                    status, content_type, body = 404, 'text/plain; charset=utf-8', "not found\n"
+                else:
+                    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                    status, content_type, body = await handler(query)
+
+            if not isinstance(body, (str, bytes)):
+                body = json.dumps(body, ensure_ascii=False, default=str)
+            payload = body.encode('utf-8') if isinstance(body, str) else body
+            reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                      409: 'Conflict', 503: 'Service Unavailable'}.get(status, 'OK')
+            writer.write(
+                f"HTTP/1.0 {status} {reason}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1')
+            )
+            if not (len(parts) >= 1 and parts[0] == 'HEAD'):
+                writer.write(payload)
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
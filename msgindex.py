@@ -0,0 +1,227 @@
+"""
+MESSAGE INDEX
+Remembers where every signal was forwarded to: for each source message
+(chat id, message id) and route, the account that sent the copy, the
+message ids it created in the target group and which of them carries
+the text. Edits and deletions in the source are applied to the copies
+through this index.
+
+Recent entries live in a bounded LRU in memory; everything is also
+written to SQLite (see storage.SQLiteStore) so a restart or an evicted
+entry costs one indexed read instead of losing the mapping.
+"""
+
+import asyncio
+import logging
+import time
+
+from cache import TTLCache
+from storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# What the message carrying the text is, i.e. how to edit it
+TEXT = 'text'          # a message we sent: edit its text
+CAPTION = 'caption'    # media we re-sent: edit its caption
+FORWARD = 'forward'    # a server-side forward: cannot be edited
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forwarded (
+    chat_id     INTEGER NOT NULL,
+    message_id  INTEGER NOT NULL,
+    route       TEXT    NOT NULL,
+    target      TEXT    NOT NULL,
+    account     TEXT    NOT NULL,
+    message_ids TEXT    NOT NULL,
+    edit_id     INTEGER,
+    kind        TEXT    NOT NULL,
+    prefix      TEXT    NOT NULL DEFAULT '',
+    sent_at     REAL    NOT NULL,
+    suffix      TEXT    NOT NULL DEFAULT '',
+    PRIMARY KEY (chat_id, message_id, route)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS forwarded_message ON forwarded (message_id);
+CREATE INDEX IF NOT EXISTS forwarded_sent ON forwarded (sent_at);
+"""
+
+_COLUMNS = "chat_id, message_id, route, target, account, message_ids, edit_id, kind, prefix, sent_at, suffix"
+
+# Marked ids of basic groups and users are above this; channels are below
+_CHANNEL_ID_LIMIT = -1000000000000
+
+
+def sent_message_ids(result):
+    """Message ids from whatever send_message / send_file / forward_messages returned."""
+    if result is None:
+        return []
+    if not isinstance(result, (list, tuple)):
+        result = [result]
+    return [getattr(m, 'id', m) for m in result if m is not None]
+
+
+class ForwardRecord:
+    """The copy of one signal in one target group."""
+
+    __slots__ = ('route', 'target', 'account', 'message_ids', 'edit_id', 'kind', 'prefix', 'sent_at', 'suffix')
+
+    def __init__(self, route, target, account, message_ids, edit_id=None, kind=TEXT, prefix="", sent_at=None,
+                 suffix=""):
+        self.route = route
+        self.target = target
+        self.account = account
+        self.message_ids = list(message_ids)
+        self.edit_id = edit_id
+        self.kind = kind
+        self.prefix = prefix  # header placed above the text, kept for edits
+        self.sent_at = sent_at if sent_at is not None else time.time()
+        self.suffix = suffix  # footer placed below the text
+
+    @classmethod
+    def from_row(cls, row):
+        _, _, route, target, account, message_ids, edit_id, kind, prefix, sent_at, suffix = row
+        ids = [int(i) for i in message_ids.split(',') if i]
+        return cls(route, target, account, ids, edit_id, kind, prefix, sent_at, suffix)
+
+
+class MessageIndex:
+    """
+    (source chat, source message) -> [ForwardRecord, ...]
+
+    Albums are indexed under their first message id. With path empty
+    the index is memory-only and forgets everything on restart.
+    """
+
+    def __init__(self, path, maxsize=10000, retention=2 * 24 * 3600, flush_interval=0.005, prune_interval=3600.0):
+        self.path = path
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.memory = TTLCache(maxsize=maxsize, ttl=retention)
+        self.store = SQLiteStore(path, SCHEMA, flush_interval=flush_interval) if path else None
+        self._pruner = None
+
+    async def open(self):
+        if self.store is None:
+            return
+        await self.store.open()
+        columns = {row[1] for row in await self.store.query("PRAGMA table_info(forwarded)")}
+        if 'suffix' not in columns:
+            # Indexes written before footers existed
+            await self.store.execute("ALTER TABLE forwarded ADD COLUMN suffix TEXT NOT NULL DEFAULT ''")
+        await self.prune()
+        self._pruner = asyncio.create_task(self._prune_loop())
+
+    async def prune(self):
+        """Forget copies sent more than retention seconds ago; they can no longer be edited."""
+        removed = await self.store.execute(
+            "DELETE FROM forwarded WHERE sent_at < ?", (time.time() - self.retention,)
+        )
+        if removed:
+            logger.info(f"🧹 Pruned {removed} old message index entries")
+        return removed
+
+    async def _prune_loop(self):
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not prune message index {self.path}: {e}")
+
+    async def add(self, chat_id, message_id, record):
+        """Remember a delivered copy."""
+        key = (chat_id, message_id)
+        records = self.memory.pop(key)
+        # Without a store the memory is the whole truth; with one, only
+        # extend entries already cached (the store has the rest)
+        if records is not None or self.store is None:
+            records = [r for r in records or () if r.route != record.route] + [record]
+            self.memory.set(key, records)
+
+        if self.store is not None:
+            await self.store.execute(
+                f"INSERT OR REPLACE INTO forwarded ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, message_id, record.route, record.target, record.account,
+                 ",".join(str(i) for i in record.message_ids), record.edit_id, record.kind,
+                 record.prefix, record.sent_at, record.suffix)
+            )
+
+    async def lookup(self, chat_id, message_ids):
+        """
+        Copies of the given source messages: {message_id: [ForwardRecord, ...]}.
+
+        Messages that were never forwarded are left out. Misses are
+        loaded from the store in one query and cached, including
+        negative results, so edits of ordinary messages stay cheap.
+        """
+        found = {}
+        missing = []
+        for message_id in message_ids:
+            records = self.memory.get((chat_id, message_id))
+            if records is None:
+                missing.append(message_id)
+            elif records:
+                found[message_id] = records
+
+        if missing and self.store is not None:
+            loaded = {message_id: [] for message_id in missing}
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = await self.store.query(
+                    f"SELECT {_COLUMNS} FROM forwarded WHERE chat_id = ? AND message_id IN "
+                    f"({','.join('?' * len(chunk))})", (chat_id, *chunk)
+                )
+                for row in rows:
+                    loaded[row[1]].append(ForwardRecord.from_row(row))
+            for message_id, records in loaded.items():
+                self.memory.set((chat_id, message_id), records)
+                if records:
+                    found[message_id] = records
+        return found
+
+    async def lookup_unknown_chat(self, message_ids):
+        """
+        Copies of messages deleted in a basic group or private chat.
+
+        Telegram does not say which chat those deletions belong to, so
+        this matches the ids against every non-channel source instead.
+        Returns {(chat_id, message_id): [ForwardRecord, ...]}.
+        """
+        if self.store is None:
+            wanted = set(message_ids)
+            return {
+                key: records for key, records in self.memory.items()
+                if records and key[1] in wanted and key[0] > _CHANNEL_ID_LIMIT
+            }
+
+        found = {}
+        for start in range(0, len(message_ids), 500):
+            chunk = list(message_ids[start:start + 500])
+            rows = await self.store.query(
+                f"SELECT {_COLUMNS} FROM forwarded WHERE chat_id > ? AND message_id IN "
+                f"({','.join('?' * len(chunk))})", (_CHANNEL_ID_LIMIT, *chunk)
+            )
+            for row in rows:
+                found.setdefault((row[0], row[1]), []).append(ForwardRecord.from_row(row))
+        return found
+
+    async def remove(self, chat_id, message_ids):
+        """Forget source messages whose copies were deleted."""
+        message_ids = list(message_ids)
+        for message_id in message_ids:
+            self.memory.set((chat_id, message_id), [])
+        if self.store is None:
+            return
+        for start in range(0, len(message_ids), 500):
+            chunk = message_ids[start:start + 500]
+            await self.store.execute(
+                f"DELETE FROM forwarded WHERE chat_id = ? AND message_id IN ({','.join('?' * len(chunk))})",
+                (chat_id, *chunk)
+            )
+
+    async def close(self):
+        if self._pruner is not None:
+            self._pruner.cancel()
+            await asyncio.gather(self._pruner, return_exceptions=True)
+            self._pruner = None
+        if self.store is not None:
+            await self.store.close()
@@ -0,0 +1,152 @@
+"""
+DURABLE OUTBOX
+Every signal accepted by the handler is written here before it is
+queued, keyed by (source chat, message id, route). Once sent it is
+marked delivered. On startup, entries that were accepted but never
+delivered are replayed, and anything already accepted or delivered is
+never queued a second time. A send that fails while the process runs
+is retried in-process with exponential backoff (see retry_delay) until
+it succeeds, runs out of attempts or gets too old.
+
+The only window for a duplicate is a crash between Telegram
+acknowledging a send and the delivered mark being committed.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = 'accepted'
+DELIVERED = 'delivered'
+EXPIRED = 'expired'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    chat_id      INTEGER NOT NULL,
+    message_id   INTEGER NOT NULL,
+    route        TEXT    NOT NULL,
+    state        TEXT    NOT NULL,
+    payload      TEXT    NOT NULL,
+    accepted_at  REAL    NOT NULL,
+    delivered_at REAL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, message_id, route)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, accepted_at);
+"""
+
+
+def retry_delay(attempts, base=5.0, cap=300.0):
+    """Seconds to wait after the given number of failed attempts (doubling, capped)."""
+    return min(cap, base * 2 ** max(attempts - 1, 0))
+
+
+class OutboxEntry:
+    """An accepted-but-undelivered signal loaded for replay."""
+
+    __slots__ = ('chat_id', 'message_id', 'route', 'payload', 'accepted_at', 'attempts')
+
+    def __init__(self, chat_id, message_id, route, payload, accepted_at, attempts):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.route = route
+        self.payload = payload
+        self.accepted_at = accepted_at
+        self.attempts = attempts
+
+
+class Outbox:
+    """Accepted/delivered ledger for forwarded signals."""
+
+    def __init__(self, path, flush_interval=0.005, retention=7 * 24 * 3600, prune_interval=3600.0):
+        self.path = path
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.store = SQLiteStore(path, SCHEMA, flush_interval=flush_interval)
+        self.suppressed = 0
+        self._pruner = None
+
+    async def open(self):
+        await self.store.open()
+        await self.prune()
+        self._pruner = asyncio.create_task(self._prune_loop())
+
+    async def prune(self):
+        """Keep the file small: forget delivered/expired entries past retention."""
+        cutoff = time.time() - self.retention
+        removed = await self.store.execute(
+            "DELETE FROM outbox WHERE state != ? AND accepted_at < ?", (ACCEPTED, cutoff)
+        )
+        if removed:
+            logger.info(f"🧹 Pruned {removed} old outbox entries")
+        return removed
+
+    async def _prune_loop(self):
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not prune outbox {self.path}: {e}")
+
+    async def accept(self, chat_id, message_id, route, payload):
+        """
+        Durably record a signal before it is queued.
+
+        Returns False if this (chat, message, route) was seen before, in
+        which case the caller must not queue it again.
+        """
+        inserted = await self.store.execute(
+            "INSERT OR IGNORE INTO outbox (chat_id, message_id, route, state, payload, accepted_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (chat_id, message_id, route, ACCEPTED, json.dumps(payload, ensure_ascii=False), time.time())
+        )
+        if not inserted:
+            self.suppressed += 1
+            return False
+        return True
+
+    async def delivered(self, chat_id, message_id, route):
+        """Mark a signal as sent."""
+        await self.store.execute(
+            "UPDATE outbox SET state = ?, delivered_at = ?, attempts = attempts + 1 "
+            "WHERE chat_id = ? AND message_id = ? AND route = ?",
+            (DELIVERED, time.time(), chat_id, message_id, route)
+        )
+
+    async def failed(self, chat_id, message_id, route):
+        """Count a failed attempt; the entry stays pending for replay."""
+        await self.store.execute(
+            "UPDATE outbox SET attempts = attempts + 1 WHERE chat_id = ? AND message_id = ? AND route = ?",
+            (chat_id, message_id, route)
+        )
+
+    async def expire(self, chat_id, message_id, route):
+        """Give up on a pending signal (too old, or its route is gone)."""
+        await self.store.execute(
+            "UPDATE outbox SET state = ? WHERE chat_id = ? AND message_id = ? AND route = ?",
+            (EXPIRED, chat_id, message_id, route)
+        )
+
+    async def pending(self):
+        """All undelivered entries, oldest first."""
+        rows = await self.store.query(
+            "SELECT chat_id, message_id, route, payload, accepted_at, attempts FROM outbox "
+            "WHERE state = ? ORDER BY accepted_at", (ACCEPTED,)
+        )
+        return [
+            OutboxEntry(chat_id, message_id, route, json.loads(payload), accepted_at, attempts)
+            for chat_id, message_id, route, payload, accepted_at, attempts in rows
+        ]
+
+    async def close(self):
+        if self._pruner is not None:
+            self._pruner.cancel()
+            await asyncio.gather(self._pruner, return_exceptions=True)
+            self._pruner = None
+        await self.store.close()
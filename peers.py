@@ -0,0 +1,94 @@
+"""
+PEER CACHE
+Remembers resolved chats and users (id + access hash + title) so a
+restart can build input peers locally instead of calling get_entity()
+for every source, target and user again.
+
+The cache is a small JSON file (PEER_CACHE_FILE). It can also be seeded
+from the PEER_CACHE environment variable, which is handy on hosts whose
+disk is wiped on every deploy.
+"""
+
+import json
+import logging
+import os
+
+from telethon import utils
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+logger = logging.getLogger(__name__)
+
+
+class PeerCache:
+    """Identifier -> input peer mapping persisted as JSON."""
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.peers = {}  # identifier -> {'type', 'id', 'access_hash', 'title'}
+        self._dirty = False
+
+        if seed:
+            try:
+                self.peers.update(json.loads(seed))
+            except ValueError as e:
+                logger.warning(f"⚠️ Ignoring invalid PEER_CACHE value: {e}")
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as handle:
+                    self.peers.update(json.load(handle))
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Could not read peer cache {path}: {e}")
+
+    def __contains__(self, identifier):
+        return identifier in self.peers
+
+    def get(self, identifier):
+        """Return (input_peer, title) for a cached identifier, or (None, None)."""
+        peer = self.peers.get(identifier)
+        if not peer:
+            return None, None
+
+        kind = peer.get('type')
+        if kind == 'channel':
+            input_peer = InputPeerChannel(peer['id'], peer['access_hash'])
+        elif kind == 'user':
+            input_peer = InputPeerUser(peer['id'], peer['access_hash'])
+        elif kind == 'chat':
+            input_peer = InputPeerChat(peer['id'])
+        else:
+            return None, None
+        return input_peer, peer.get('title')
+
+    def store(self, identifier, entity, title):
+        """Remember a freshly resolved entity."""
+        input_peer = utils.get_input_peer(entity)
+        if isinstance(input_peer, InputPeerChannel):
+            peer = {'type': 'channel', 'id': input_peer.channel_id, 'access_hash': input_peer.access_hash}
+        elif isinstance(input_peer, InputPeerUser):
+            peer = {'type': 'user', 'id': input_peer.user_id, 'access_hash': input_peer.access_hash}
+        elif isinstance(input_peer, InputPeerChat):
+            peer = {'type': 'chat', 'id': input_peer.chat_id, 'access_hash': 0}
+        else:
+            return
+        peer['title'] = title
+        if self.peers.get(identifier) != peer:
+            self.peers[identifier] = peer
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk if anything changed."""
+        if not self.path or not self._dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump(self.peers, handle, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write peer cache {self.path}: {e}")
+
+    def dumps(self):
+        """Compact JSON suitable for the PEER_CACHE environment variable."""
+        return json.dumps(self.peers, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,193 @@
+"""
+FORWARD PIPELINE
+Decouples matching from sending: the message handler only places matched
+signals on a bounded per-target queue, and a pool of workers per target
+drains it. Delays are deadlines carried by each job, and confirmations
+are sent from their own queue so they never hold up a forward.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# What to do when a target queue is full
+OVERFLOW_BLOCK = 'block'              # wait for room (backpressure on the handler)
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # reject the incoming signal
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # evict the oldest queued signal
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST)
+
+
+class ForwardJob:
+    """
+    One matched signal waiting to be sent on one route.
+
+    message_ids lists every message of the signal (several for an album,
+    message_id being the first). messages holds the original Telethon
+    messages, or None when the job was rebuilt from the outbox.
+    """
+
+    __slots__ = ('route', 'chat_id', 'message_id', 'message_ids', 'text', 'sender_name',
+                 'accepted_at', 'deadline', 'messages', 'date', 'sender_id', 'attempts', 'fingerprint')
+
+    def __init__(self, route, chat_id, message_id, text, sender_name, accepted_at, deadline,
+                 messages=None, message_ids=None, date=None, sender_id=None, attempts=0, fingerprint=None):
+        self.route = route
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.message_ids = message_ids or [message_id]
+        self.text = text
+        self.sender_name = sender_name
+        self.accepted_at = accepted_at
+        self.deadline = deadline
+        self.messages = messages
+        self.date = date  # source message date (epoch seconds), for end-to-end latency
+        self.sender_id = sender_id
+        self.attempts = attempts  # failed sends so far
+        self.fingerprint = fingerprint  # dedup.Fingerprint recorded for the target, if any
+
+
+class ForwardPipeline:
+    """
+    Bounded per-target queues drained by per-target workers.
+
+    send(job) is awaited by a worker for every job; confirm(job), if
+    given, is awaited afterwards by a separate confirmation worker.
+    on_drop(job), if given, is awaited for every job the overflow policy
+    rejects or evicts.
+    """
+
+    def __init__(self, send, confirm=None, maxsize=1000, workers_per_target=1,
+                 overflow=OVERFLOW_BLOCK, on_drop=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy '{overflow}', expected one of {', '.join(OVERFLOW_POLICIES)}")
+
+        self.send = send
+        self.confirm = confirm
+        self.on_drop = on_drop
+        self.maxsize = maxsize
+        self.workers_per_target = max(1, workers_per_target)
+        self.overflow = overflow
+
+        self.queues = {}  # target -> asyncio.Queue
+        self.dropped = 0
+        self._workers = []
+        self._confirmations = asyncio.Queue(maxsize=maxsize) if confirm else None
+        self._running = False
+
+    @property
+    def depth(self):
+        """Total number of signals waiting across all targets."""
+        return sum(queue.qsize() for queue in self.queues.values())
+
+    def start(self):
+        """Start the confirmation worker (target workers start on demand)."""
+        self._running = True
+        if self._confirmations is not None:
+            self._workers.append(asyncio.create_task(self._confirmation_worker()))
+
+    def _queue_for(self, target):
+        queue = self.queues.get(target)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.maxsize)
+            self.queues[target] = queue
+            for i in range(self.workers_per_target):
+                self._workers.append(asyncio.create_task(self._target_worker(target, queue, i)))
+        return queue
+
+    async def submit(self, job):
+        """
+        Queue a job for its route's target.
+
+        Returns False if the job was dropped because the queue was full
+        and the overflow policy is drop_newest.
+        """
+        queue = self._queue_for(job.route.target)
+
+        if not queue.full() or self.overflow == OVERFLOW_BLOCK:
+            await queue.put(job)
+            return True
+
+        if self.overflow == OVERFLOW_DROP_NEWEST:
+            self.dropped += 1
+            logger.warning(f"⚠️ Queue for {job.route.target} is full, dropping new signal (route {job.route.name})")
+            await self._dropped(job)
+            return False
+
+        # drop_oldest: make room by discarding the head of the queue
+        try:
+            evicted = queue.get_nowait()
+            queue.task_done()
+            self.dropped += 1
+            logger.warning(f"⚠️ Queue for {job.route.target} is full, dropping oldest signal (route {evicted.route.name})")
+        except asyncio.QueueEmpty:
+            evicted = None
+        queue.put_nowait(job)
+        if evicted is not None:
+            await self._dropped(evicted)
+        return True
+
+    async def _dropped(self, job):
+        if self.on_drop is None:
+            return
+        try:
+            await self.on_drop(job)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not record dropped signal: {e}")
+
+    async def _target_worker(self, target, queue, index):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await queue.get()
+            try:
+                # Honour the job's deadline without blocking anything upstream
+                remaining = job.deadline - loop.time()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+
+                delivered = await self.send(job)
+                if delivered and self._confirmations is not None:
+                    try:
+                        self._confirmations.put_nowait(job)
+                    except asyncio.QueueFull:
+                        logger.warning("⚠️ Confirmation queue is full, skipping confirmation")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Worker {index} for {target} failed: {e}")
+            finally:
+                queue.task_done()
+
+    async def _confirmation_worker(self):
+        while True:
+            job = await self._confirmations.get()
+            try:
+                await self.confirm(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Could not send confirmation: {e}")
+            finally:
+                self._confirmations.task_done()
+
+    async def _drain(self):
+        # Targets first: their workers feed the confirmation queue
+        await asyncio.gather(*(queue.join() for queue in self.queues.values()))
+        if self._confirmations is not None:
+            await self._confirmations.join()
+
+    async def stop(self, drain_timeout=5.0):
+        """Give queued signals a chance to go out, then stop all workers."""
+        if not self._running:
+            return
+        self._running = False
+
+        try:
+            await asyncio.wait_for(self._drain(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {self.depth} signal(s) still queued at shutdown")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -0,0 +1,201 @@
+"""
+PROFILING HOOKS
+Instrumentation that can be switched on while the forwarder runs:
+
+- LoopWatchdog: a thread that notices when the event loop stops
+  turning and logs the stack and task that are holding it.
+- SamplingProfiler: samples the event-loop thread's stack and renders
+  the result as collapsed stacks (one "frame;frame;frame count" line
+  per stack), the input format of flamegraph.pl and speedscope.
+- span(stage): times one stage of a signal into the stage histogram.
+
+Both threads only read sys._current_frames(), so nothing runs on the
+event loop apart from the watchdog's heartbeat callback.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class span:
+    """Context manager observing the elapsed time of a stage (seconds)."""
+
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - self.started, stage=self.stage)
+        return False
+
+
+def _describe_task(loop):
+    try:
+        task = asyncio.current_task(loop)
+    except RuntimeError:
+        return None
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+class LoopWatchdog:
+    """
+    Reports event-loop stalls longer than threshold seconds.
+
+    The loop bumps a heartbeat every interval; a daemon thread checks
+    it and, once per stall, logs the loop thread's current stack and
+    the task that was running, i.e. the coroutine blocking the loop.
+    """
+
+    def __init__(self, threshold=0.5, interval=0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self._beat = 0.0
+        self._loop = None
+        self._loop_thread = None
+        self._handle = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Start watching the running loop (call from the loop thread)."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._handle = self._loop.call_soon(self._tick)
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        logger.info(f"🐕 Event-loop watchdog on (stalls over {self.threshold * 1000:.0f}ms)")
+
+    def _tick(self):
+        self._beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._tick)
+
+    def _watch(self):
+        reported = None  # heartbeat of the stall already reported
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or beat == reported:
+                continue
+            reported = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)\n"
+            logger.warning(
+                f"🐢 Event loop stalled for {stalled:.2f}s+ in task {_describe_task(self._loop) or '(none)'}:\n"
+                f"{stack.rstrip()}"
+            )
+
+    def stop(self):
+        """Stop watching (call from the loop thread)."""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        logger.info("🐕 Event-loop watchdog off")
+
+
+def _frame_label(code, cache):
+    label = cache.get(code)
+    if label is None:
+        filename = os.path.basename(code.co_filename).replace(' ', '_')
+        label = cache[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack every interval seconds.
+
+    stop() returns the profile as collapsed stacks, root frame first,
+    ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self.started = None
+        self._stacks = Counter()
+        self._labels = {}  # code object -> "function (file:line)"
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Start sampling the calling thread (or thread_id)."""
+        if self.running:
+            return
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self.samples = 0
+        self.started = time.monotonic()
+        self._stacks = Counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        labels = self._labels
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code, labels))
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        """Stop sampling and return the collapsed stacks."""
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.collapsed()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def dump(self, directory="."):
+        """Stop sampling and write the profile to a timestamped file; returns its path."""
+        text = self.stop()
+        path = os.path.join(directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+        logger.info(f"🔥 Wrote {self.samples} samples to {path}")
+        return path
@@ -0,0 +1,105 @@
+"""
+EDIT & DELETE PROPAGATION
+Source groups are often edited in bursts (a provider fixing a price
+twice in a few seconds) and cleaned up in bulk. Both are buffered for a
+short, fixed window so each forwarded copy costs at most one
+edit_message call per window and each target one delete_messages call
+per batch.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Telegram deletes at most this many messages per call
+MAX_DELETE_IDS = 100
+
+
+class EditCoalescer:
+    """
+    Keeps only the latest version of a message edited several times.
+
+    on_edit(chat_id, message) is awaited once, window seconds after the
+    first edit of that message arrived, with its newest version.
+    """
+
+    def __init__(self, on_edit, window=2.0):
+        self.on_edit = on_edit
+        self.window = window
+        self.coalesced = 0
+        self._pending = {}  # (chat_id, message_id) -> newest message
+        self._tasks = set()
+
+    def add(self, chat_id, message):
+        """Buffer one edit."""
+        key = (chat_id, message.id)
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = message
+            task = asyncio.create_task(self._apply_later(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return
+
+        self.coalesced += 1
+        # Updates can arrive out of order; keep the newest edit
+        if current.edit_date is None or (message.edit_date and message.edit_date >= current.edit_date):
+            self._pending[key] = message
+
+    async def _apply_later(self, key):
+        await asyncio.sleep(self.window)
+        message = self._pending.pop(key, None)
+        if message is None:
+            return
+        try:
+            await self.on_edit(key[0], message)
+        except Exception as e:
+            logger.error(f"❌ Could not propagate edit of {key[0]}/{key[1]}: {e}")
+
+    async def flush(self):
+        """Wait for every buffered edit to be applied."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+class DeleteBatcher:
+    """
+    Collects message ids to delete per (account, target).
+
+    on_delete(account, target, ids) is awaited window seconds after the
+    first id for that pair arrived, once per chunk of MAX_DELETE_IDS.
+    """
+
+    def __init__(self, on_delete, window=1.0):
+        self.on_delete = on_delete
+        self.window = window
+        self._pending = {}  # (account, target) -> [message id, ...]
+        self._tasks = set()
+
+    def add(self, account, target, message_ids):
+        """Buffer ids to delete in target, as account."""
+        key = (account, target)
+        ids = self._pending.get(key)
+        if ids is None:
+            self._pending[key] = list(message_ids)
+            task = asyncio.create_task(self._delete_later(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            ids.extend(message_ids)
+
+    async def _delete_later(self, key):
+        await asyncio.sleep(self.window)
+        ids = sorted(set(self._pending.pop(key, ())))
+        for start in range(0, len(ids), MAX_DELETE_IDS):
+            try:
+                await self.on_delete(key[0], key[1], ids[start:start + MAX_DELETE_IDS])
+            except Exception as e:
+                logger.error(f"❌ Could not delete {len(ids)} message(s) in {key[1]}: {e}")
+                return
+
+    async def flush(self):
+        """Wait for every buffered deletion to be sent."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
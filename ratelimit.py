@@ -0,0 +1,151 @@
+"""
+SEND SCHEDULER
+Token buckets per target chat and per account, so bursts go out as fast
+as Telegram allows and no faster. A FloodWaitError pauses only the
+target it was raised for, on the account that got it, for exactly as
+long as Telegram asked.
+"""
+
+import asyncio
+import logging
+
+from telethon.errors import FloodWaitError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Classic token bucket with reservations.
+
+    reserve() always takes a token, letting the balance go negative, and
+    returns how long the caller must wait before using it. Concurrent
+    callers are therefore queued fairly without a lock.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate      # tokens per second
+        self.burst = burst    # bucket size
+        self.tokens = burst
+        self.updated = None
+
+    def reserve(self, now):
+        """Take one token and return the seconds to wait before sending."""
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class SendStats:
+    """Per-target send counters."""
+
+    __slots__ = ('sends', 'waited', 'last_wait', 'max_wait', 'flood_waits', 'flood_wait_seconds')
+
+    def __init__(self):
+        self.sends = 0
+        self.waited = 0.0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+
+
+class SendScheduler:
+    """
+    Paces sends with one token bucket per target and one per account.
+
+    Use send(target, call) where call is a zero-argument coroutine
+    function performing the actual request; it is retried after any
+    FloodWaitError up to max_flood_wait seconds long. FloodWait pauses
+    are kept per (account, target), so another account can keep sending
+    to the same target (see accounts.ClientPool).
+    """
+
+    def __init__(self, target_rate=20, target_burst=5, account_rate=1500, account_burst=30,
+                 max_flood_wait=300):
+        # Rates are configured in messages per minute
+        self.target_rate = target_rate / 60.0
+        self.target_burst = target_burst
+        self.account_rate = account_rate / 60.0
+        self.account_burst = account_burst
+        self.max_flood_wait = max_flood_wait
+
+        self.targets = {}   # target -> TokenBucket
+        self.accounts = {}  # account -> TokenBucket
+        self.pauses = {}    # (account, target) -> loop time the FloodWait ends
+        self.stats = {}     # target -> SendStats
+
+    def _bucket(self, buckets, key, rate, burst):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def stats_for(self, target):
+        """Counters for one target (created on first use)."""
+        stats = self.stats.get(target)
+        if stats is None:
+            stats = self.stats[target] = SendStats()
+        return stats
+
+    async def acquire(self, target, account='default'):
+        """Wait for a send slot on target and account; return the seconds waited."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        wait = max(
+            self._bucket(self.targets, target, self.target_rate, self.target_burst).reserve(now),
+            self._bucket(self.accounts, account, self.account_rate, self.account_burst).reserve(now),
+            self.pauses.get((account, target), 0.0) - now
+        )
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return loop.time() - now
+
+    def pause(self, target, seconds, account='default'):
+        """Stop sending to target from account for the given number of seconds."""
+        until = asyncio.get_running_loop().time() + seconds
+        key = (account, target)
+        self.pauses[key] = max(self.pauses.get(key, 0.0), until)
+
+    def paused_for(self, target, account='default'):
+        """Seconds left on a FloodWait pause for target on account (0 if none)."""
+        until = self.pauses.get((account, target))
+        if until is None:
+            return 0.0
+        return max(0.0, until - asyncio.get_running_loop().time())
+
+    async def send(self, target, call, account='default', failover=False):
+        """
+        Run call() once a slot is free, pausing target on FloodWait.
+
+        With failover=True the FloodWaitError is re-raised after pausing
+        instead of waiting it out, so the caller can try another account.
+        """
+        stats = self.stats_for(target)
+        while True:
+            waited = await self.acquire(target, account)
+            stats.waited += waited
+            stats.last_wait = waited
+            stats.max_wait = max(stats.max_wait, waited)
+            if waited >= 0.05:
+                logger.debug("⏱️ Waited %.2fs for a send slot on %s", waited, target)
+
+            try:
+                result = await call()
+            except FloodWaitError as e:
+                stats.flood_waits += 1
+                stats.flood_wait_seconds += e.seconds
+                self.pause(target, e.seconds, account)
+                if failover:
+                    raise
+                if e.seconds > self.max_flood_wait:
+                    logger.error(f"❌ FloodWait of {e.seconds}s on {target} exceeds FLOOD_WAIT_MAX, giving up")
+                    raise
+                logger.warning(f"⚠️ FloodWait: pausing {target} for {e.seconds}s")
+                continue
+
+            stats.sends += 1
+            return result
@@ -0,0 +1,133 @@
+"""
+CONFIG RELOAD
+Routing changes (sources, targets, users, headers, keywords, templates)
+are applied while the forwarder runs, without reconnecting to Telegram.
+The forwarder builds, resolves and compiles the new RouteTable next to
+the one in use and swaps them in one step; this module holds the parts
+that do not touch Telegram:
+
+- ConfigWatcher: polls the routing configuration file and calls back
+  once it has changed and stopped changing.
+- diff_routes(old, new): which routes were added, removed or changed,
+  for the log and the /reload reply.
+- env_file_values(path, names, fixed): settings re-read from .env,
+  leaving alone the ones the process environment set at startup.
+"""
+
+import asyncio
+import logging
+import os
+
+from dotenv import dotenv_values
+
+logger = logging.getLogger(__name__)
+
+# Route attributes that make up its configuration (see routing.Route)
+ROUTE_SETTINGS = (
+    'source', 'target', 'source_users', 'header', 'keywords', 'exclude', 'mode', 'header_mode',
+    'digest_window', 'digest_max', 'header_template', 'footer_template', 'timezone', 'transforms',
+)
+
+
+def _settings(route):
+    return tuple(repr(getattr(route, name)) for name in ROUTE_SETTINGS)
+
+
+def diff_routes(old, new):
+    """
+    Compare two RouteTables by route name.
+
+    Returns {'added': [...], 'removed': [...], 'changed': [...]} (names);
+    all lists are empty if the configuration is the same.
+    """
+    old_routes = {route.name: route for route in old.routes} if old is not None else {}
+    new_routes = {route.name: route for route in new.routes}
+    return {
+        'added': [name for name in new_routes if name not in old_routes],
+        'removed': [name for name in old_routes if name not in new_routes],
+        'changed': [
+            name for name, route in new_routes.items()
+            if name in old_routes and _settings(route) != _settings(old_routes[name])
+        ],
+    }
+
+
+def describe_diff(diff):
+    """One-line summary of diff_routes() output."""
+    parts = [
+        f"{label} {', '.join(diff[key])}"
+        for key, label in (('added', '+'), ('removed', '-'), ('changed', '~'))
+        if diff[key]
+    ]
+    return "; ".join(parts) or "no changes"
+
+
+def env_file_values(path, names, fixed=()):
+    """
+    Values of names in the .env file at path, skipping names in fixed.
+
+    load_dotenv() never overrides a variable that is already set, so
+    fixed should be the names present in os.environ before it ran: a
+    reload then keeps the same precedence as startup.
+    """
+    values = dotenv_values(path)
+    return {name: values[name] for name in names if name not in fixed and values.get(name) is not None}
+
+
+class ConfigWatcher:
+    """
+    Polls a file's modification time and size every interval seconds.
+
+    on_change() is awaited once the file differs from the last version
+    seen and has been left alone for settle seconds, so an editor that
+    writes in several steps triggers one reload, not a reload of a
+    half-written file.
+    """
+
+    def __init__(self, path, on_change, interval=5.0, settle=0.5):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.settle = settle
+        self.changes = 0
+        self._stamp = self._stat()
+        self._task = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            stamp = self._stat()
+            if stamp == self._stamp:
+                continue
+            # Wait until the writer is done
+            while True:
+                await asyncio.sleep(self.settle)
+                settled = self._stat()
+                if settled == stamp:
+                    break
+                stamp = settled
+            self._stamp = stamp
+            if stamp is None:
+                logger.warning(f"⚠️ {self.path} is gone, keeping the current routes")
+                continue
+            self.changes += 1
+            try:
+                await self.on_change()
+            except Exception as e:
+                logger.error(f"❌ Reload of {self.path} failed: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
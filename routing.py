@@ -0,0 +1,340 @@
+"""
+ROUTING TABLE
+Loads many source -> target routes and matches incoming text against
+every route's rules in a single pass with an Aho-Corasick automaton.
+
+Routes file format (JSON, path given by ROUTES_FILE):
+
+    {
+      "routes": [
+        {
+          "name": "forex",
+          "source": "https://t.me/iosassembly",
+          "target": "https://t.me/acctdeveloperselling",
+          "source_users": ["@Systembadgetickverify02"],
+          "header": "🔔 NEW SIGNAL!",
+          "keywords": ["EUR/", "GBP/"],
+          "exclude": ["TEST"],
+          "mode": "forward",
+          "header_mode": "message",
+          "digest_window": 0,
+          "digest_max": 20,
+          "header_template": "📡 {source}\\n🕒 {timestamp}\\n\\n",
+          "footer_template": "\\n\\n— via {route}",
+          "timezone": "Europe/London",
+          "transforms": [{"strip": "links"}, {"pattern": "(?i)vip", "replace": ""}]
+        }
+      ]
+    }
+
+A route matches when the message comes from its source (and from one of
+its source_users, if any are listed), contains its header (if set), at
+least one of its keywords (if any are listed) and none of its exclude
+patterns.
+
+mode is "copy" (send the text as a new message) or "forward" (forward
+the original message, media and albums included, server-side).
+header_mode decides where the timestamp header goes in forward mode:
+"message" (a separate message first) or "caption" (media re-sent by
+reference with the header as its caption).
+
+digest_window > 0 turns on digest mode for a copy route: its signals are
+collected for up to that many seconds, or until digest_max of them are
+waiting, and sent as one combined message (see digest.py).
+
+header_template, footer_template, timezone and transforms shape the
+copied text; they are compiled once per route (see templates.py).
+"""
+
+import json
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+MODES = ('copy', 'forward')
+HEADER_MODES = ('message', 'caption')
+
+
+class AhoCorasickMatcher:
+    """
+    Multi-pattern substring matcher.
+
+    All patterns are compiled once into a single automaton, so a search
+    walks the text exactly once no matter how many patterns there are.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = []
+        self._ids = {}
+        for pattern in patterns:
+            if pattern and pattern not in self._ids:
+                self._ids[pattern] = len(self.patterns)
+                self.patterns.append(pattern)
+
+        # Node 0 is the root. Each node has its own transition dict, a
+        # failure link and the set of pattern ids that end at it.
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] = self._out[node] + (pattern_id,)
+
+        # Breadth-first pass to build failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def id_of(self, pattern):
+        """Return the id assigned to a pattern, or None if it was empty."""
+        return self._ids.get(pattern)
+
+    def search(self, text):
+        """Return the set of pattern ids found anywhere in text."""
+        found = set()
+        if not text or not self.patterns:
+            return found
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class Route:
+    """One source -> target forwarding rule."""
+
+    def __init__(self, name, source, target, source_users=None, header=None,
+                 keywords=None, exclude=None, mode='copy', header_mode='message',
+                 digest_window=0, digest_max=20, header_template=None, footer_template="",
+                 timezone=None, transforms=None):
+        if mode not in MODES:
+            raise ValueError(f"route {name}: unknown mode '{mode}', expected one of {', '.join(MODES)}")
+        if header_mode not in HEADER_MODES:
+            raise ValueError(f"route {name}: unknown header_mode '{header_mode}', "
+                             f"expected one of {', '.join(HEADER_MODES)}")
+        if digest_window < 0 or digest_max < 1:
+            raise ValueError(f"route {name}: digest_window must be >= 0 and digest_max >= 1")
+
+        self.name = name
+        self.source = source
+        self.target = target
+        self.source_users = list(source_users or [])
+        self.header = header or None
+        self.keywords = list(keywords or [])
+        self.exclude = list(exclude or [])
+        self.mode = mode
+        self.header_mode = header_mode
+        self.digest_window = float(digest_window)
+        self.digest_max = int(digest_max)
+        self.header_template = header_template  # None: the default header
+        self.footer_template = footer_template or ""
+        self.timezone = timezone
+        self.transforms = list(transforms or [])
+
+        # Filled in by RouteTable / the forwarder once entities are known
+        self.user_ids = set()
+        self.template = None  # templates.MessageTemplate
+        self._header_id = None
+        self._keyword_ids = frozenset()
+        self._exclude_ids = frozenset()
+
+    @property
+    def needs_text(self):
+        """True if this route can only be decided by looking at the text."""
+        return bool(self.header or self.keywords or self.exclude)
+
+    def compile(self, matcher):
+        """Translate this route's patterns into matcher pattern ids."""
+        self._header_id = matcher.id_of(self.header) if self.header else None
+        self._keyword_ids = frozenset(matcher.id_of(k) for k in self.keywords if k)
+        self._exclude_ids = frozenset(matcher.id_of(x) for x in self.exclude if x)
+
+    def accepts(self, hits):
+        """Decide whether this route matches, given the matcher's hits."""
+        if self._header_id is not None and self._header_id not in hits:
+            return False
+        if self._keyword_ids and self._keyword_ids.isdisjoint(hits):
+            return False
+        if self._exclude_ids and not self._exclude_ids.isdisjoint(hits):
+            return False
+        return True
+
+    @property
+    def forwards_media(self):
+        """True if this route forwards original messages (media included)."""
+        return self.mode == 'forward'
+
+    @property
+    def digests(self):
+        """True if signals on this route are batched into digests (copy mode only)."""
+        return self.digest_window > 0 and not self.forwards_media
+
+    @classmethod
+    def from_dict(cls, data, index=0, defaults=None):
+        """Build a route from one entry of the routes file."""
+        defaults = defaults or {}
+        if not data.get('source') or not data.get('target'):
+            raise ValueError(f"route #{index + 1} needs both 'source' and 'target'")
+        return cls(
+            name=data.get('name') or f"route-{index + 1}",
+            source=data['source'],
+            target=data['target'],
+            source_users=data.get('source_users') or [],
+            header=data.get('header'),
+            keywords=data.get('keywords') or [],
+            exclude=data.get('exclude') or [],
+            mode=data.get('mode') or defaults.get('mode', 'copy'),
+            header_mode=data.get('header_mode') or defaults.get('header_mode', 'message'),
+            digest_window=data.get('digest_window', defaults.get('digest_window', 0)),
+            digest_max=data.get('digest_max', defaults.get('digest_max', 20)),
+            header_template=data.get('header_template', defaults.get('header_template')),
+            footer_template=data.get('footer_template', defaults.get('footer_template', "")),
+            timezone=data.get('timezone') or defaults.get('timezone'),
+            transforms=data.get('transforms', defaults.get('transforms')),
+        )
+
+
+class RouteTable:
+    """
+    All configured routes plus one shared matcher.
+
+    Call bind() once source chats and users are resolved; after that,
+    match() maps (chat id, sender id, text) to the routes it should go to.
+    """
+
+    def __init__(self, routes):
+        self.routes = list(routes)
+        patterns = []
+        for route in self.routes:
+            if route.header:
+                patterns.append(route.header)
+            patterns.extend(route.keywords)
+            patterns.extend(route.exclude)
+        self.matcher = AhoCorasickMatcher(patterns)
+        for route in self.routes:
+            route.compile(self.matcher)
+        self._by_source = {}
+
+    @property
+    def sources(self):
+        """Unique source identifiers, in configuration order."""
+        return list(dict.fromkeys(route.source for route in self.routes))
+
+    @property
+    def targets(self):
+        """Unique target identifiers, in configuration order."""
+        return list(dict.fromkeys(route.target for route in self.routes))
+
+    @property
+    def source_users(self):
+        """Unique source user identifiers across all routes."""
+        return list(dict.fromkeys(u for route in self.routes for u in route.source_users))
+
+    def route_named(self, name):
+        """Look up a route by name (None if there is no such route)."""
+        for route in self.routes:
+            if route.name == name:
+                return route
+        return None
+
+    def bind(self, source_ids, user_ids):
+        """
+        Attach resolved ids to the routes.
+
+        source_ids maps a source identifier to its chat id, user_ids maps
+        a user identifier to its user id. Users that could not be resolved
+        are simply left out.
+        """
+        self._by_source = {}
+        for route in self.routes:
+            route.user_ids = {user_ids[u] for u in route.source_users if u in user_ids}
+            chat_id = source_ids.get(route.source)
+            if chat_id is not None:
+                self._by_source.setdefault(chat_id, []).append(route)
+
+    def sender_filter(self):
+        """
+        Union of allowed sender ids, or None if any route accepts anyone.
+
+        Suitable for the from_users argument of events.NewMessage.
+        """
+        user_ids = set()
+        for route in self.routes:
+            if not route.user_ids:
+                return None
+            user_ids |= route.user_ids
+        return sorted(user_ids) or None
+
+    @property
+    def source_chat_ids(self):
+        """Resolved chat ids of every source (after bind())."""
+        return list(self._by_source)
+
+    def routes_for(self, chat_id):
+        """Routes whose source is the given chat."""
+        return self._by_source.get(chat_id, ())
+
+    def forwards_media(self, chat_id):
+        """True if any route from this chat forwards original messages."""
+        return any(route.forwards_media for route in self.routes_for(chat_id))
+
+    def match(self, chat_id, text, sender_id=None):
+        """Return the routes a message should be forwarded on."""
+        candidates = [
+            route for route in self.routes_for(chat_id)
+            if not route.user_ids or sender_id in route.user_ids
+        ]
+        if not candidates:
+            return []
+
+        # Scan the text once for every pattern of every route
+        hits = self.matcher.search(text) if any(r.needs_text for r in candidates) else set()
+        return [
+            route for route in candidates
+            if route.accepts(hits) and (text or route.forwards_media)
+        ]
+
+
+def load_routes(path, defaults=None):
+    """
+    Load a RouteTable from a JSON routes file.
+
+    defaults supplies mode, header_mode, digest and template settings for
+    routes that do not set them.
+    """
+    with open(path, 'r', encoding='utf-8') as handle:
+        data = json.load(handle)
+
+    entries = data.get('routes', []) if isinstance(data, dict) else data
+    if not entries:
+        raise ValueError(f"no routes defined in {path}")
+
+    routes = [Route.from_dict(entry, i, defaults) for i, entry in enumerate(entries)]
+    logger.info(f"📋 Loaded {len(routes)} route(s) from {path}")
+    return RouteTable(routes)
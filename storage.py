@@ -0,0 +1,131 @@
+"""
+EMBEDDED STORAGE
+A SQLite database in WAL mode, owned by one background thread. Writes
+from many coroutines are collected for a few milliseconds and committed
+(and fsynced) together, so durability costs one fsync per batch instead
+of one per message, and the event loop never blocks on disk I/O.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStore:
+    """
+    Group-committing wrapper around a single SQLite connection.
+
+    execute() queues a write and returns a future that resolves to the
+    statement's rowcount once the batch containing it is committed.
+    query() runs a read on the same thread and returns all rows.
+    """
+
+    def __init__(self, path, schema, flush_interval=0.005, max_batch=512, synchronous='FULL'):
+        self.path = path
+        self.schema = schema
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+
+        self.batches = 0
+        self.writes = 0
+
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-{path}")
+        self._pending = []
+        self._wakeup = None
+        self._flusher = None
+        self._closing = False
+
+    async def open(self):
+        """Open the database, apply the schema and start the flusher."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._open)
+        self._wakeup = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        self._conn.executescript(self.schema)
+
+    def execute(self, sql, params=()):
+        """Queue a write; the returned future resolves after it is committed."""
+        if self._wakeup is None or self._closing:
+            raise RuntimeError(f"{self.path} is not open")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((sql, params, future))
+        self._wakeup.set()
+        return future
+
+    async def query(self, sql, params=()):
+        """Run a read query and return all rows."""
+        if self._conn is None:
+            raise RuntimeError(f"{self.path} is not open")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._query, sql, params)
+
+    def _query(self, sql, params):
+        return self._conn.execute(sql, params).fetchall()
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            # Let concurrent writers join this batch
+            if self.flush_interval:
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                try:
+                    results = await loop.run_in_executor(self._executor, self._commit, batch)
+                except Exception as e:
+                    logger.error(f"❌ Write to {self.path} failed: {e}")
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                self.batches += 1
+                self.writes += len(batch)
+                for (_, _, future), rowcount in zip(batch, results):
+                    if not future.done():
+                        future.set_result(rowcount)
+
+            if self._closing:
+                return
+
+    def _commit(self, batch):
+        cursor = self._conn.cursor()
+        cursor.execute('BEGIN')
+        try:
+            results = []
+            for sql, params, _ in batch:
+                cursor.execute(sql, params)
+                results.append(cursor.rowcount)
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        return results
+
+    async def close(self):
+        """Commit pending writes and close the database."""
+        if self._flusher is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._flusher
+            self._flusher = None
+
+        loop = asyncio.get_running_loop()
+        if self._conn is not None:
+            await loop.run_in_executor(self._executor, self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
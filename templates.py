@@ -0,0 +1,242 @@
+"""
+MESSAGE TEMPLATES
+Per-route header/footer templates and body transforms, compiled once at
+startup so formatting a signal is a few string joins and regex passes.
+
+Templates are str.format-style strings. {source}, {target} and {route}
+are filled in at compile time; only {timestamp} and {sender} are
+rendered per message, and the timestamp text is reused within the same
+second.
+
+Transforms rewrite the signal text in order. Each is either a preset
+removal ({"strip": "links"}) or a regex rewrite ({"pattern": "...",
+"replace": "..."}; replace defaults to "", i.e. removal). At compile
+time each rule gets the literal text it cannot match without, so most
+rules are skipped with a plain substring test; rules without one are
+merged into a single alternation where possible.
+"""
+
+import re
+import string
+import time
+try:
+    from re import _parser
+except ImportError:  # Python < 3.11
+    import sre_parse as _parser
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_HEADER = (
+    "📡 **SIGNAL FORWARDED**\n"
+    "🕒 {timestamp}\n"
+    "👤 Source: {sender}\n"
+    "📊 From: {source}\n"
+    "━━━━━━━━━━━━━━━━━━\n\n"
+)
+DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
+
+# Presets for {"strip": name}: (pattern, replacement) steps
+PRESETS = {
+    # Markdown links keep their label, bare URLs go
+    'links': [(r'\[([^\]]*)\]\((?:https?|tg)://[^)]*\)', r'\1'),
+              (r'(?:https?://|www\.|t\.me/)\S+', "")],
+    # Starting with the literal lets the regex engine jump between candidates
+    'mentions': [(r'@(?<![\w@]@)[A-Za-z]\w{3,31}\b', "")],
+    'hashtags': [(r'#(?<![\w#]#)\w+', "")],
+    'referrals': [(r'(?i:\b(?:ref|referral|invite|promo)(?:\s*code)?\s*[:=]\s*[\w-]+)', "")],
+}
+
+STATIC_FIELDS = ('source', 'target', 'route')
+DYNAMIC_FIELDS = ('timestamp', 'sender')
+
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+# Left behind by removals: runs of spaces and spaces before a line break
+_SPACE_RUNS = re.compile(r'[ \t]{2,}')
+_TRAILING_SPACE = re.compile(r'[ \t]+\n')
+
+
+class Clock:
+    """Formats the current time in one timezone, once per second."""
+
+    def __init__(self, tz='UTC', fmt=DEFAULT_TIMESTAMP_FORMAT):
+        if tz.upper() == 'UTC':
+            self.tz = timezone.utc
+        else:
+            try:
+                self.tz = ZoneInfo(tz)
+            except (ZoneInfoNotFoundError, ValueError) as e:
+                raise ValueError(f"unknown timezone '{tz}'") from e
+        self.fmt = fmt
+        self._second = None
+        self._text = ""
+
+    def now(self, now=None):
+        second = int(now if now is not None else time.time())
+        if second != self._second:
+            self._text = datetime.fromtimestamp(second, self.tz).strftime(self.fmt)
+            self._second = second
+        return self._text
+
+
+def _compile_template(template, static):
+    """Split a template into literal strings and dynamic field names."""
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if field in static:
+            value = static[field]
+            if conversion == 'r':
+                value = repr(value)
+            parts.append(format(value, spec or ''))
+        elif field in DYNAMIC_FIELDS and not spec and not conversion:
+            parts.append((field,))
+        else:
+            raise ValueError(f"unknown template field {{{field}}}, expected one of "
+                             f"{', '.join(STATIC_FIELDS + DYNAMIC_FIELDS)}")
+
+    # Merge adjacent literals; a template without dynamic fields is one constant
+    merged = []
+    for part in parts:
+        if isinstance(part, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += part
+        else:
+            merged.append(part)
+    return tuple(merged)
+
+
+def _sequence_literals(items):
+    """Best set of literals (one of which must occur) for a parsed sequence."""
+    candidates = []
+    run = []
+    for op, av in list(items) + [(None, None)]:
+        if op is _parser.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            candidates.append(("".join(run),))
+            run = []
+        if op is _parser.BRANCH:
+            options = [_sequence_literals(branch) for branch in av[1]]
+            if all(options):
+                candidates.append(tuple(literal for option in options for literal in option))
+        elif op is _parser.SUBPATTERN and not av[1] and not av[2]:
+            inner = _sequence_literals(av[3])
+            if inner:
+                candidates.append(inner)
+    if not candidates:
+        return None
+    # The rarest filter: the one whose shortest literal is longest
+    return max(candidates, key=lambda literals: min(len(literal) for literal in literals))
+
+
+def required_literals(regex):
+    """
+    Literals of which at least one occurs in every match of regex, or
+    None if that cannot be told (case-insensitive or no literal part).
+    """
+    if regex.flags & re.IGNORECASE:
+        return None
+    try:
+        return _sequence_literals(_parser.parse(regex.pattern, regex.flags))
+    except Exception:
+        return None
+
+
+def _compile_transforms(transforms):
+    """[(compiled regex, replacement, literals), ...] in rule order."""
+    steps = []
+    removals = []
+
+    def flush_removals():
+        if removals:
+            steps.append((re.compile("|".join(f"(?:{p})" for p in removals)), "", None))
+            removals.clear()
+
+    for index, rule in enumerate(transforms):
+        if 'strip' in rule:
+            rewrites = PRESETS.get(rule['strip'])
+            if rewrites is None:
+                raise ValueError(f"transform #{index + 1}: unknown strip preset '{rule['strip']}', "
+                                 f"expected one of {', '.join(PRESETS)}")
+        elif 'pattern' in rule:
+            rewrites = [(rule['pattern'], rule.get('replace', ""))]
+        else:
+            raise ValueError(f"transform #{index + 1} needs 'strip' or 'pattern'")
+
+        for pattern, replace in rewrites:
+            try:
+                regex = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"transform #{index + 1}: invalid pattern {pattern!r}: {e}") from e
+            literals = required_literals(regex)
+            if literals or replace or regex.flags & ~re.UNICODE or _BACKREFERENCE.search(pattern):
+                # Global flags and group numbers do not survive an alternation
+                flush_removals()
+                steps.append((regex, replace, literals))
+            else:
+                removals.append(pattern)
+    flush_removals()
+    return steps
+
+
+class MessageTemplate:
+    """A route's compiled header, footer and body transforms."""
+
+    def __init__(self, header="", footer="", transforms=(), static=None, clock=None):
+        static = static or {}
+        self.clock = clock or Clock()
+        self._header = _compile_template(header, static)
+        self._footer = _compile_template(footer, static)
+        self._steps = _compile_transforms(transforms)
+
+    @property
+    def rules(self):
+        """Number of compiled regex passes."""
+        return len(self._steps)
+
+    def _render(self, parts, sender):
+        if not parts:
+            return ""
+        if len(parts) == 1 and isinstance(parts[0], str):
+            return parts[0]
+        out = []
+        for part in parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif part[0] == 'timestamp':
+                out.append(self.clock.now())
+            else:
+                out.append(sender or "")
+        return "".join(out)
+
+    def header(self, sender=None):
+        return self._render(self._header, sender)
+
+    def footer(self, sender=None):
+        return self._render(self._footer, sender)
+
+    def body(self, text):
+        """The signal text with every transform applied."""
+        if not self._steps or not text:
+            return text
+        removed = False
+        for regex, replace, literals in self._steps:
+            if literals is not None:
+                for literal in literals:
+                    if literal in text:
+                        break
+                else:
+                    continue
+            text, count = regex.subn(replace, text)
+            removed = removed or (count > 0 and not replace)
+        if removed:
+            text = _TRAILING_SPACE.sub("\n", _SPACE_RUNS.sub(" ", text)).strip()
+        return text
+
+    def render(self, text, sender=None):
+        """Header, transformed text and footer in one string."""
+        return self.header(sender) + self.body(text) + self.footer(sender)
@@ -0,0 +1,128 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from telethon.errors import FloodWaitError
+
+from accounts import Account, ClientPool, HashRing
+from ratelimit import SendScheduler
+
+
+def test_preference_lists_every_node_once_owner_first():
+    ring = HashRing(replicas=50)
+    for node in ("a", "b", "c"):
+        ring.add(node)
+    order = ring.preference("target-1")
+    assert sorted(order) == ["a", "b", "c"]
+    assert ring.preference("target-1") == order
+
+
+def test_empty_ring_and_repeated_add():
+    ring = HashRing()
+    assert ring.preference("x") == []
+    ring.add("a")
+    ring.add("a")
+    assert ring.nodes == ["a"]
+    assert ring.preference("x") == ["a"]
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(replicas=100)
+    for node in ("a", "b", "c", "d"):
+        ring.add(node)
+    keys = [f"chat-{i}" for i in range(500)]
+    before = {key: ring.preference(key)[0] for key in keys}
+    ring.remove("b")
+    after = {key: ring.preference(key)[0] for key in keys}
+    for key in keys:
+        if before[key] != "b":
+            assert after[key] == before[key]
+        else:
+            assert after[key] != "b"
+    ring.remove("b")
+    assert ring.nodes == ["a", "c", "d"]
+
+
+def test_keys_spread_over_nodes():
+    ring = HashRing(replicas=100)
+    for node in ("a", "b", "c"):
+        ring.add(node)
+    owners = Counter(ring.preference(f"chat-{i}")[0] for i in range(3000))
+    assert set(owners) == {"a", "b", "c"}
+    assert min(owners.values()) > 500
+
+
+class FakeClient:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = 0
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+
+def _pool(*clients, max_flood_wait=300):
+    pool = ClientPool(SendScheduler(max_flood_wait=max_flood_wait))
+    for i, client in enumerate(clients):
+        pool.add(Account(f"account{i}", client, {'target': object()}, primary=i == 0))
+    return pool
+
+
+async def _call(account):
+    client = account.client
+    if client.errors:
+        raise client.errors.pop(0)
+    client.sent += 1
+    return account.name
+
+
+def test_flood_wait_fails_over_to_a_healthy_account():
+    async def scenario():
+        pool = _pool(FakeClient(), FakeClient())
+        owner = pool.owner('target')
+        owner.client.errors.append(FloodWaitError(request=None, capture=30))
+        name = await pool.send('target', _call)
+        return owner, name, pool.scheduler.paused_for('target', owner.name)
+
+    owner, name, paused = asyncio.run(scenario())
+    assert name != owner.name
+    assert owner.flood_waits == 1
+    assert paused > 29
+
+
+@pytest.mark.parametrize("clients", [1, 2])
+def test_flood_wait_over_the_limit_is_not_waited_out(clients):
+    async def scenario():
+        pool = _pool(*(FakeClient() for _ in range(clients)), max_flood_wait=1)
+        pool.owner('target').client.errors.append(FloodWaitError(request=None, capture=5))
+        await asyncio.wait_for(pool.send('target', _call), timeout=1)
+
+    with pytest.raises(FloodWaitError):
+        asyncio.run(scenario())
+
+
+def test_pinned_send_does_not_fail_over():
+    async def scenario():
+        pool = _pool(FakeClient(), FakeClient(), max_flood_wait=1)
+        pinned = pool.accounts['account1']
+        pinned.client.errors.append(FloodWaitError(request=None, capture=5))
+        try:
+            await asyncio.wait_for(pool.send('target', _call, account='account1'), timeout=1)
+        except FloodWaitError:
+            pass
+        return [account.client.sent for account in pool.accounts.values()]
+
+    assert asyncio.run(scenario()) == [0, 0]
+
+
+def test_connection_error_fails_over_once_per_account():
+    async def scenario():
+        pool = _pool(FakeClient(), FakeClient())
+        for account in pool.accounts.values():
+            account.client.errors.append(ConnectionError("gone"))
+        with pytest.raises(ConnectionError):
+            await pool.send('target', _call)
+        return sum(account.failures for account in pool.accounts.values())
+
+    assert asyncio.run(scenario()) == 2
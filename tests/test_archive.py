@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from archive import SignalArchive, _number, compile_extractors, extract_fields, parse_time
+
+SIGNAL = "🔔 NEW SIGNAL!\nBUY EUR/USD\nEntry: 1.0850\nSL 1.0800\nTP1: 1.0900\nTP2: 1.0950"
+
+
+@pytest.mark.parametrize("text, value", [
+    ("1.0850", 1.085), ("1,0850", 1.085), ("62,500", 62500.0), ("1,085.50", 1085.5), ("7", 7.0), ("1.2.3", None),
+])
+def test_number(text, value):
+    assert _number(text) == value
+
+
+def test_default_extractors():
+    fields = extract_fields(compile_extractors(), SIGNAL)
+    assert fields == {'symbol': 'EUR/USD', 'side': 'buy', 'entry': 1.085, 'stop': 1.08, 'targets': [1.09, 1.095]}
+
+
+def test_hashtag_symbol_and_missing_fields():
+    assert extract_fields(compile_extractors(), "#BTCUSDT short now") == {'symbol': 'BTCUSDT', 'side': 'short'}
+
+
+def test_overrides_replace_and_drop_fields():
+    extractors = compile_extractors({'side': None, 'timer': r"Timer: (\d+) minutes"})
+    fields = extract_fields(extractors, "SELL EUR/CAD\nTimer: 5 minutes")
+    assert fields == {'symbol': 'EUR/CAD', 'timer': '5'}
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({'x': r"\d+"}, "capture group"),
+    ({'x': "("}, "invalid pattern"),
+    ({'x': {'pattern': "(a)", 'type': 'date'}}, "unknown type"),
+    ({'x': {}}, "needs a 'pattern'"),
+])
+def test_invalid_extractors(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        compile_extractors(overrides)
+
+
+def test_parse_time():
+    assert parse_time(None) is None
+    assert parse_time("") is None
+    assert parse_time("1760000000") == 1760000000.0
+    assert parse_time("24h", now=100000.0) == 100000.0 - 86400
+    assert parse_time("1970-01-02") == 86400.0
+    assert parse_time("1970-01-01T01:00+01:00") == 0.0
+    with pytest.raises(ValueError):
+        parse_time("yesterday")
+
+
+def test_prune_runs_periodically(tmp_path):
+    async def scenario():
+        archive = SignalArchive(str(tmp_path / "a.db"), flush_interval=0, retention=60, prune_interval=0.02)
+        await archive.open()
+        # Both arrive after the startup prune; only the periodic one can drop the old signal
+        archive.add(-100, 1, 'r', 'src', 'dst', SIGNAL, posted_at=time.time() - 120)
+        archive.add(-100, 2, 'r', 'src', 'dst', SIGNAL, posted_at=time.time())
+        await asyncio.sleep(0.1)
+        found = await archive.search(symbol='EUR/USD')
+        await archive.close()
+        return [record['message_id'] for record in found]
+
+    assert asyncio.run(scenario()) == [2]
+
+
+def test_no_pruning_without_retention(tmp_path):
+    async def scenario():
+        archive = SignalArchive(str(tmp_path / "a.db"), flush_interval=0, prune_interval=0.02)
+        await archive.open()
+        archive.add(-100, 1, 'r', 'src', 'dst', SIGNAL, posted_at=0)
+        await asyncio.sleep(0.1)
+        found = await archive.search()
+        await archive.close()
+        return archive._pruner, len(found)
+
+    assert asyncio.run(scenario()) == (None, 1)
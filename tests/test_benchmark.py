@@ -0,0 +1,14 @@
+import sys
+
+import benchmark
+
+
+def test_format_gate_runs_without_the_forwarder(capsys):
+    assert benchmark.main(['--format-only', '--messages', '200', '--rules', '10', '--max-format-us', '100000']) == 0
+    assert "µs per message" in capsys.readouterr().out
+    assert 'app' not in sys.modules
+
+
+def test_format_gate_fails_over_budget(capsys):
+    assert benchmark.main(['--format-only', '--messages', '50', '--max-format-us', '0']) == 1
+    assert "REGRESSION" in capsys.readouterr().err
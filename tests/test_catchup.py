@@ -0,0 +1,137 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from catchup import Checkpoints, GapRecovery
+
+CHAT = -100
+
+
+class Message:
+    def __init__(self, id, date=None):
+        self.id = id
+        self.date = datetime.fromtimestamp(date if date is not None else time.time(), timezone.utc)
+
+
+class FakeClient:
+    """Source history of one chat; iter_messages honours min_id like Telethon."""
+
+    def __init__(self, ids):
+        self.history = [Message(i) for i in ids]
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def get_messages(self, entity, limit=1):
+        return self.history[-limit:][::-1]
+
+    async def iter_messages(self, entity, reverse=True, wait_time=None, min_id=0, offset_date=None):
+        for message in self.history:
+            if message.id > min_id and (offset_date is None or message.date >= offset_date):
+                yield message
+
+
+class Forwarder:
+    """The live handler and recovery callback, as the app wires them."""
+
+    def __init__(self, checkpoints):
+        self.checkpoints = checkpoints
+        self.live = set()
+        self.handled = []
+
+    async def handle(self, chat_id, message, recovered=False):
+        if not recovered:
+            self.live.add(message.id)
+        self.handled.append(message.id)
+        self.checkpoints.advance(chat_id, message.id, message.date.timestamp())
+
+    async def recover(self, chat_id, message):
+        await self.handle(chat_id, message, recovered=True)
+
+    def seen(self, chat_id, message_id):
+        return message_id in self.live
+
+
+def _setup(tmp_path, ids, checkpoint):
+    checkpoints = Checkpoints(str(tmp_path / "checkpoints.json"))
+    checkpoints.advance(CHAT, checkpoint, time.time())
+    client = FakeClient(ids)
+    forwarder = Forwarder(checkpoints)
+    recovery = GapRecovery(client, {CHAT: object()}, checkpoints, forwarder.recover, seen=forwarder.seen,
+                           rate=1000, batch_wait=0)
+    return client, forwarder, recovery
+
+
+def test_recovers_the_gap_after_the_checkpoint(tmp_path):
+    async def scenario():
+        _, forwarder, recovery = _setup(tmp_path, range(1, 16), 10)
+        count = await recovery.recover()
+        return count, forwarder.handled
+
+    assert asyncio.run(scenario()) == (5, [11, 12, 13, 14, 15])
+
+
+def test_live_message_before_recovery_does_not_skip_the_gap(tmp_path):
+    async def scenario():
+        client, forwarder, recovery = _setup(tmp_path, range(1, 21), 10)
+        # Boot: handlers are live before recovery runs, and message 20 arrives first
+        await forwarder.handle(CHAT, client.history[19])
+        await recovery.recover()
+        return forwarder.handled
+
+    assert asyncio.run(scenario()) == [20] + list(range(11, 20))
+
+
+def test_live_message_after_a_reconnect_does_not_skip_the_gap(tmp_path):
+    async def scenario():
+        client, forwarder, recovery = _setup(tmp_path, range(1, 11), 10)
+        recovery.start(interval=0.01)
+        await asyncio.sleep(0.03)  # the restart catch-up finds nothing
+        client.connected = False
+        await asyncio.sleep(0.03)
+        client.history += [Message(i) for i in range(11, 16)]  # posted during the outage
+        client.connected = True
+        await forwarder.handle(CHAT, client.history[-1])  # live, before the watcher notices
+        await asyncio.sleep(0.05)
+        await recovery.stop()
+        return forwarder.handled, recovery.runs
+
+    handled, runs = asyncio.run(scenario())
+    assert handled == [15, 11, 12, 13, 14]
+    assert runs == 2
+
+
+def test_first_run_starts_tracking_at_the_newest_message(tmp_path):
+    async def scenario():
+        checkpoints = Checkpoints(str(tmp_path / "checkpoints.json"))
+        forwarder = Forwarder(checkpoints)
+        recovery = GapRecovery(FakeClient(range(1, 6)), {CHAT: object()}, checkpoints, forwarder.recover)
+        count = await recovery.recover()
+        return count, checkpoints.get(CHAT)[0]
+
+    assert asyncio.run(scenario()) == (0, 5)
+
+
+def test_messages_older_than_max_age_are_skipped(tmp_path):
+    async def scenario():
+        client, forwarder, recovery = _setup(tmp_path, [], 10)
+        client.history = [Message(11, time.time() - 3600), Message(12)]
+        recovery.max_age = 600
+        await recovery.recover()
+        return forwarder.handled, recovery.too_old
+
+    assert asyncio.run(scenario()) == ([12], 1)
+
+
+def test_checkpoints_persist_only_forward_progress(tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+
+    async def scenario():
+        checkpoints = Checkpoints(path)
+        checkpoints.advance(CHAT, 10, 1.0)
+        checkpoints.advance(CHAT, 7, 2.0)
+        await checkpoints.stop()
+
+    asyncio.run(scenario())
+    assert Checkpoints(path).get(CHAT) == (10, 1.0)
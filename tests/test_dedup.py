@@ -0,0 +1,89 @@
+import pytest
+
+from dedup import GENERATIONS, DuplicateIndex, Fingerprint, normalize, simhash
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_drops_case_space_emoji_markup_and_headers():
+    text = "🔔 NEW SIGNAL!\n\n**EUR/CAD**  SELL 🟥"
+    assert normalize(text, headers=["🔔 NEW SIGNAL!"]) == "eur/cadsell"
+    assert normalize("A  b\tC") == "abc"
+
+
+def test_simhash_is_close_for_small_edits():
+    base = normalize("EUR/CAD SELL entry 7:12 PM timer 5 minutes martingale levels 7:17 7:22")
+    edited = normalize("EUR/CAD SELL entry 7:12 PM timer 5 minutes martingale levels 7:17 7:23")
+    other = normalize("gm everyone, what do you think about the market today?")
+    assert bin(simhash(base) ^ simhash(edited)).count('1') < bin(simhash(base) ^ simhash(other)).count('1')
+    assert simhash("abc") == simhash("abc")
+
+
+def test_first_copy_passes_repeat_is_caught_per_scope():
+    index = DuplicateIndex(window=60, clock=FakeClock())
+    fingerprint = Fingerprint(normalize("BUY GOLD"))
+    assert index.check("t1", fingerprint) is False
+    assert index.check("t1", fingerprint) is True
+    assert index.check("t2", fingerprint) is False
+    assert (index.hits, index.misses) == (1, 2)
+
+
+def test_entries_expire_after_the_window():
+    clock = FakeClock()
+    index = DuplicateIndex(window=60, clock=clock)
+    fingerprint = Fingerprint("buygold")
+    index.check("t", fingerprint)
+    clock.now += 30
+    assert index.check("t", fingerprint) is True
+    clock.now += 200
+    assert index.check("t", fingerprint) is False
+
+
+def test_ring_stays_bounded_by_size():
+    index = DuplicateIndex(window=3600, maxsize=40, clock=FakeClock())
+    for i in range(1000):
+        index.check("t", Fingerprint(f"signal{i}"))
+    assert len(index) <= 40
+    assert len(index._generations) <= GENERATIONS
+
+
+def test_newest_generation_survives_long_idle_gaps():
+    clock = FakeClock()
+    index = DuplicateIndex(window=1, clock=clock)
+    for i in range(5):
+        clock.now += 1000
+        assert index.check("t", Fingerprint(f"s{i}")) is False
+        assert len(index._generations) >= 1
+
+
+def test_window_must_be_positive():
+    with pytest.raises(ValueError):
+        DuplicateIndex(window=0)
+
+
+def test_near_duplicates():
+    index = DuplicateIndex(window=60, near_distance=6, clock=FakeClock())
+    text = "eur/cadselltimer5minutesentry7:12pmmartingalelevel17:17pmlevel27:22pm"
+    assert index.check("t", Fingerprint(text, near=True)) is False
+    assert index.check("t", Fingerprint(text.replace("7:22", "7:23"), near=True)) is True
+    assert index.near_hits == 1
+
+
+@pytest.mark.parametrize("near", [False, True])
+def test_forget_lets_the_signal_through_again(near):
+    index = DuplicateIndex(window=60, near_distance=6 if near else 0, clock=FakeClock())
+    text = "eur/cadselltimer5minutesentry7:12pmmartingalelevel17:17pmlevel27:22pm"
+    fingerprint = Fingerprint(text, near=near)
+    index.check("t1", fingerprint)
+    index.check("t2", fingerprint)
+    assert index.forget("t1", fingerprint) is True
+    assert index.forget("t1", fingerprint) is False
+    assert len(index) == 1
+    assert index.check("t1", Fingerprint(text, near=near)) is False
+    assert index.check("t2", fingerprint) is True
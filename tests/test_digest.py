@@ -0,0 +1,61 @@
+import asyncio
+
+from digest import DigestCollector, pack_parts, pack_texts
+
+
+def test_pack_texts_joins_up_to_limit():
+    assert pack_texts(["aaa", "bbb", "ccc"], limit=8, separator="|") == ["aaa|bbb", "ccc"]
+    assert pack_texts([], limit=10) == []
+
+
+def test_pack_texts_splits_long_text_at_line_breaks():
+    text = "line one\nline two\nline three"
+    messages = pack_texts([text], limit=18)
+    assert messages == ["line one\nline two", "line three"]
+    assert all(len(message) <= 18 for message in messages)
+
+
+def test_pack_texts_hard_cut_without_line_breaks():
+    messages = pack_texts(["x" * 25], limit=10)
+    assert messages == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_pack_parts_tells_which_texts_each_message_holds():
+    parts = pack_parts(["aaa", "bbb", "x" * 12, "ccc"], limit=8, separator="|")
+    assert parts == [("aaa|bbb", [0, 1]), ("x" * 8, [2]), ("xxxx|ccc", [2, 3])]
+    assert [message for message, _ in parts] == pack_texts(["aaa", "bbb", "x" * 12, "ccc"], 8, "|")
+
+
+class Route:
+    name = 'r'
+    digest_max = 3
+    digest_window = 60
+
+
+class Job:
+    route = Route()
+    deadline = 0
+
+    def __init__(self, i):
+        self.i = i
+
+
+def test_full_batch_is_sent_at_digest_max():
+    async def scenario():
+        sent = []
+
+        async def on_ready(digest):
+            await asyncio.sleep(0)
+            sent.append([job.i for job in digest.jobs])
+
+        collector = DigestCollector(on_ready)
+        for i in range(7):
+            collector.add(Job(i))
+        await asyncio.sleep(0.01)
+        before_flush = list(sent)
+        await collector.flush()
+        return before_flush, sent
+
+    before_flush, sent = asyncio.run(scenario())
+    assert before_flush == [[0, 1, 2], [3, 4, 5]]
+    assert sent == [[0, 1, 2], [3, 4, 5], [6]]
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from msgindex import CAPTION, ForwardRecord, MessageIndex, sent_message_ids
+
+
+CHANNEL = -1001234567890
+GROUP = -4567
+
+
+class Sent:
+    def __init__(self, id):
+        self.id = id
+
+
+def test_sent_message_ids():
+    assert sent_message_ids(None) == []
+    assert sent_message_ids(Sent(5)) == [5]
+    assert sent_message_ids([Sent(1), None, Sent(2)]) == [1, 2]
+
+
+@pytest.mark.parametrize("persistent", [True, False])
+def test_add_lookup_and_remove(tmp_path, persistent):
+    async def scenario():
+        index = MessageIndex(str(tmp_path / "index.db") if persistent else "", flush_interval=0)
+        await index.open()
+        await index.add(-100, 7, ForwardRecord('r1', 'a', 'primary', [70], edit_id=70, prefix="H\n"))
+        await index.add(-100, 7, ForwardRecord('r2', 'b', 'account2', [71, 72], edit_id=71, kind=CAPTION))
+        found = await index.lookup(-100, [7, 8])
+        await index.remove(-100, [7])
+        after = await index.lookup(-100, [7])
+        await index.close()
+        return found, after
+
+    found, after = asyncio.run(scenario())
+    assert list(found) == [7]
+    assert [(r.route, r.account, r.message_ids, r.edit_id, r.kind) for r in found[7]] == [
+        ('r1', 'primary', [70], 70, 'text'), ('r2', 'account2', [71, 72], 71, 'caption'),
+    ]
+    assert found[7][0].prefix == "H\n"
+    assert after == {}
+
+
+def test_records_survive_a_restart(tmp_path):
+    path = str(tmp_path / "index.db")
+
+    async def scenario():
+        index = MessageIndex(path, flush_interval=0)
+        await index.open()
+        await index.add(CHANNEL, 7, ForwardRecord('r1', 'a', 'primary', [70], suffix="\nF"))
+        await index.add(GROUP, 9, ForwardRecord('r1', 'a', 'primary', [90]))
+        await index.close()
+
+        reopened = MessageIndex(path, flush_interval=0)
+        await reopened.open()
+        found = await reopened.lookup(CHANNEL, [7])
+        unknown = await reopened.lookup_unknown_chat([7, 9])
+        await reopened.close()
+        return found, unknown
+
+    found, unknown = asyncio.run(scenario())
+    assert found[7][0].message_ids == [70]
+    assert found[7][0].suffix == "\nF"
+    # Deletions without a chat id never come from channels
+    assert list(unknown) == [(GROUP, 9)]
+
+
+def test_adding_a_route_keeps_the_others_cached(tmp_path):
+    async def scenario():
+        index = MessageIndex(str(tmp_path / "index.db"), flush_interval=0)
+        await index.open()
+        await index.add(-100, 7, ForwardRecord('r1', 'a', 'primary', [70]))
+        await index.lookup(-100, [7])
+        await index.add(-100, 7, ForwardRecord('r1', 'a', 'primary', [75]))
+        await index.add(-100, 7, ForwardRecord('r2', 'b', 'primary', [80]))
+        found = await index.lookup(-100, [7])
+        await index.close()
+        return found
+
+    assert [(r.route, r.message_ids) for r in asyncio.run(scenario())[7]] == [('r1', [75]), ('r2', [80])]
+
+
+def test_prune_runs_periodically(tmp_path):
+    async def scenario():
+        index = MessageIndex(str(tmp_path / "index.db"), flush_interval=0, retention=0.05, prune_interval=0.02)
+        await index.open()
+        await index.add(CHANNEL, 7, ForwardRecord('r1', 'a', 'primary', [70]))
+        await asyncio.sleep(0.15)
+        rows = await index.store.query("SELECT count(*) FROM forwarded")
+        await index.close()
+        return rows
+
+    assert asyncio.run(scenario()) == [(0,)]
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from outbox import Outbox, retry_delay
+
+
+def _run(path, steps):
+    async def scenario():
+        outbox = Outbox(str(path), flush_interval=0)
+        await outbox.open()
+        try:
+            return await steps(outbox)
+        finally:
+            await outbox.close()
+
+    return asyncio.run(scenario())
+
+
+def test_accept_is_exactly_once_per_route(tmp_path):
+    async def steps(outbox):
+        return [
+            await outbox.accept(1, 10, 'r1', {'text': "a"}),
+            await outbox.accept(1, 10, 'r1', {'text': "a"}),
+            await outbox.accept(1, 10, 'r2', {'text': "a"}),
+        ], outbox.suppressed
+
+    assert _run(tmp_path / "o.db", steps) == ([True, False, True], 1)
+
+
+def test_only_undelivered_entries_are_pending_across_restarts(tmp_path):
+    path = tmp_path / "o.db"
+
+    async def first_run(outbox):
+        for message_id in (1, 2, 3):
+            await outbox.accept(-100, message_id, 'r', {'text': f"signal {message_id}"})
+        await outbox.delivered(-100, 1, 'r')
+        await outbox.failed(-100, 2, 'r')
+        await outbox.failed(-100, 2, 'r')
+        await outbox.expire(-100, 3, 'r')
+
+    async def second_run(outbox):
+        entries = await outbox.pending()
+        again = await outbox.accept(-100, 1, 'r', {'text': "signal 1"})
+        return [(e.message_id, e.payload, e.attempts) for e in entries], again
+
+    _run(path, first_run)
+    assert _run(path, second_run) == ([(2, {'text': "signal 2"}, 2)], False)
+
+
+def test_prune_forgets_finished_entries_past_retention(tmp_path):
+    async def steps(outbox):
+        await outbox.accept(1, 1, 'r', {})
+        await outbox.accept(1, 2, 'r', {})
+        await outbox.delivered(1, 1, 'r')
+        await outbox.store.execute("UPDATE outbox SET accepted_at = ?", (time.time() - outbox.retention - 1,))
+        removed = await outbox.prune()
+        return removed, [e.message_id for e in await outbox.pending()]
+
+    assert _run(tmp_path / "o.db", steps) == (1, [2])
+
+
+def test_prune_runs_periodically(tmp_path):
+    async def scenario():
+        outbox = Outbox(str(tmp_path / "o.db"), flush_interval=0, retention=0, prune_interval=0.02)
+        await outbox.open()
+        await outbox.accept(1, 1, 'r', {})
+        await outbox.delivered(1, 1, 'r')
+        await asyncio.sleep(0.1)
+        rows = await outbox.store.query("SELECT count(*) FROM outbox")
+        await outbox.close()
+        return rows
+
+    assert asyncio.run(scenario()) == [(0,)]
+
+
+@pytest.mark.parametrize("attempts, delay", [(0, 5), (1, 5), (2, 10), (3, 20), (10, 300)])
+def test_retry_delay(attempts, delay):
+    assert retry_delay(attempts) == delay
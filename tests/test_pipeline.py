@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from pipeline import ForwardJob, ForwardPipeline
+
+
+class Route:
+    def __init__(self, name='r', target='t'):
+        self.name = name
+        self.target = target
+
+
+def _job(i, route=None, deadline=0.0):
+    return ForwardJob(route or Route(), chat_id=1, message_id=i, text=f"signal {i}", sender_name="s",
+                      accepted_at=0.0, deadline=deadline)
+
+
+def test_jobs_go_out_in_order_per_target_and_are_confirmed():
+    async def scenario():
+        sent, confirmed = [], []
+
+        async def send(job):
+            await asyncio.sleep(0)
+            sent.append((job.route.target, job.message_id))
+            return job.message_id != 2
+
+        async def confirm(job):
+            confirmed.append(job.message_id)
+
+        pipeline = ForwardPipeline(send, confirm)
+        pipeline.start()
+        for i in range(4):
+            await pipeline.submit(_job(i, Route(target='a' if i % 2 else 'b')))
+        await pipeline.stop()
+        return sent, confirmed
+
+    sent, confirmed = asyncio.run(scenario())
+    assert [i for target, i in sent if target == 'a'] == [1, 3]
+    assert [i for target, i in sent if target == 'b'] == [0, 2]
+    assert sorted(confirmed) == [0, 1, 3]
+
+
+def test_deadline_delays_the_send_not_the_submit():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        sent_at = []
+
+        async def send(job):
+            sent_at.append(loop.time())
+            return True
+
+        pipeline = ForwardPipeline(send)
+        pipeline.start()
+        started = loop.time()
+        await pipeline.submit(_job(1, deadline=started + 0.05))
+        submitted = loop.time() - started
+        await pipeline.stop()
+        return submitted, sent_at[0] - started
+
+    submitted, waited = asyncio.run(scenario())
+    assert submitted < 0.02
+    assert waited >= 0.045
+
+
+def test_a_failing_send_does_not_stop_the_worker():
+    async def scenario():
+        sent = []
+
+        async def send(job):
+            if job.message_id == 0:
+                raise RuntimeError("boom")
+            sent.append(job.message_id)
+            return True
+
+        pipeline = ForwardPipeline(send)
+        pipeline.start()
+        for i in range(3):
+            await pipeline.submit(_job(i))
+        await pipeline.stop()
+        return sent
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+@pytest.mark.parametrize("overflow, expected_sent, expected_accepted, expected_dropped", [
+    ('drop_newest', [0, 1], [True, True, False], [2]),
+    ('drop_oldest', [0, 2], [True, True, True], [1]),
+])
+def test_overflow_policies(overflow, expected_sent, expected_accepted, expected_dropped):
+    async def scenario():
+        gate = asyncio.Event()
+        sent = []
+
+        async def send(job):
+            await gate.wait()
+            sent.append(job.message_id)
+            return True
+
+        dropped = []
+
+        async def on_drop(job):
+            dropped.append(job.message_id)
+
+        pipeline = ForwardPipeline(send, maxsize=1, overflow=overflow, on_drop=on_drop)
+        pipeline.start()
+        accepted = [await pipeline.submit(_job(0))]
+        await asyncio.sleep(0)  # the worker takes job 0 and blocks on the gate
+        accepted.append(await pipeline.submit(_job(1)))
+        accepted.append(await pipeline.submit(_job(2)))
+        gate.set()
+        await pipeline.stop()
+        return accepted, sent, pipeline.dropped, dropped
+
+    accepted, sent, count, dropped = asyncio.run(scenario())
+    assert accepted == expected_accepted
+    assert sent == expected_sent
+    assert count == 1
+    assert dropped == expected_dropped
+
+
+def test_stop_gives_up_after_the_drain_timeout():
+    async def scenario():
+        async def send(job):
+            await asyncio.sleep(10)
+            return True
+
+        pipeline = ForwardPipeline(send)
+        pipeline.start()
+        await pipeline.submit(_job(1))
+        await pipeline.submit(_job(2))
+        await asyncio.sleep(0)
+        await pipeline.stop(drain_timeout=0.05)
+        return pipeline.depth
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError, match="unknown overflow policy"):
+        ForwardPipeline(lambda job: None, overflow='spill')
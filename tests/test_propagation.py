@@ -0,0 +1,68 @@
+import asyncio
+
+from propagation import MAX_DELETE_IDS, DeleteBatcher, EditCoalescer
+
+
+class Message:
+    def __init__(self, id, text, edit_date):
+        self.id = id
+        self.text = text
+        self.edit_date = edit_date
+
+
+def test_edits_within_the_window_apply_once_with_the_newest_version():
+    async def scenario():
+        applied = []
+
+        async def on_edit(chat_id, message):
+            applied.append((chat_id, message.id, message.text))
+
+        coalescer = EditCoalescer(on_edit, window=0.02)
+        coalescer.add(-100, Message(1, "v1", 1))
+        coalescer.add(-100, Message(1, "v3", 3))
+        coalescer.add(-100, Message(1, "v2", 2))  # arrived late
+        coalescer.add(-100, Message(2, "other", 1))
+        await coalescer.flush()
+        return applied, coalescer.coalesced
+
+    applied, coalesced = asyncio.run(scenario())
+    assert sorted(applied) == [(-100, 1, "v3"), (-100, 2, "other")]
+    assert coalesced == 2
+
+
+def test_a_failing_edit_does_not_break_the_others():
+    async def scenario():
+        applied = []
+
+        async def on_edit(chat_id, message):
+            if message.id == 1:
+                raise RuntimeError("message not modified")
+            applied.append(message.id)
+
+        coalescer = EditCoalescer(on_edit, window=0)
+        coalescer.add(-100, Message(1, "a", 1))
+        coalescer.add(-100, Message(2, "b", 1))
+        await coalescer.flush()
+        return applied
+
+    assert asyncio.run(scenario()) == [2]
+
+
+def test_deletes_are_batched_per_account_and_target_in_chunks():
+    async def scenario():
+        calls = []
+
+        async def on_delete(account, target, ids):
+            calls.append((account, target, ids))
+
+        batcher = DeleteBatcher(on_delete, window=0.02)
+        batcher.add('primary', 'a', range(150, 0, -1))
+        batcher.add('primary', 'a', [5, 200])
+        batcher.add('account2', 'a', [1])
+        await batcher.flush()
+        return calls
+
+    calls = asyncio.run(scenario())
+    primary = [ids for account, _, ids in calls if account == 'primary']
+    assert primary == [list(range(1, MAX_DELETE_IDS + 1)), list(range(MAX_DELETE_IDS + 1, 151)) + [200]]
+    assert ('account2', 'a', [1]) in calls
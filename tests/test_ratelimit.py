@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from telethon.errors import FloodWaitError
+
+from ratelimit import SendScheduler, TokenBucket
+
+
+def test_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(0.0) == pytest.approx(0.5)
+    assert bucket.reserve(0.0) == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.reserve(0.0)
+    bucket.reserve(0.0)
+    assert bucket.reserve(100.0) == 0.0
+    assert bucket.tokens == pytest.approx(1.0)
+
+
+def _flood(seconds):
+    error = FloodWaitError(request=None, capture=seconds)
+    assert error.seconds == seconds
+    return error
+
+
+def test_flood_wait_pauses_only_that_account_and_target():
+    async def scenario():
+        scheduler = SendScheduler()
+
+        async def call():
+            raise _flood(30)
+
+        with pytest.raises(FloodWaitError):
+            await scheduler.send('target', call, account='a', failover=True)
+        return (
+            scheduler.paused_for('target', 'a'),
+            scheduler.paused_for('target', 'b'),
+            scheduler.paused_for('other', 'a'),
+            scheduler.stats_for('target').flood_waits,
+        )
+
+    paused, other_account, other_target, flood_waits = asyncio.run(scenario())
+    assert 29 < paused <= 30
+    assert other_account == 0.0
+    assert other_target == 0.0
+    assert flood_waits == 1
+
+
+def test_pause_keeps_the_longest_wait():
+    async def scenario():
+        scheduler = SendScheduler()
+        scheduler.pause('t', 60)
+        scheduler.pause('t', 5)
+        return scheduler.paused_for('t')
+
+    assert 59 < asyncio.run(scenario()) <= 60
+
+
+def test_flood_wait_longer_than_max_gives_up():
+    async def scenario():
+        scheduler = SendScheduler(max_flood_wait=10)
+        calls = []
+
+        async def call():
+            calls.append(1)
+            raise _flood(3600)
+
+        with pytest.raises(FloodWaitError):
+            await scheduler.send('t', call)
+        return len(calls)
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_send_returns_result_and_counts():
+    async def scenario():
+        scheduler = SendScheduler()
+
+        async def call():
+            return "ok"
+
+        result = await scheduler.send('t', call)
+        return result, scheduler.stats_for('t').sends
+
+    assert asyncio.run(scenario()) == ("ok", 1)
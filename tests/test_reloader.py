@@ -0,0 +1,78 @@
+import asyncio
+
+from reloader import ConfigWatcher, describe_diff, diff_routes, env_file_values
+from routing import Route, RouteTable
+
+NAMES = ('SOURCE_GROUP_URL', 'TARGET_GROUP_URL', 'SIGNAL_HEADER')
+
+
+def test_env_file_values_keep_process_environment(tmp_path):
+    path = tmp_path / ".env"
+    path.write_text("SOURCE_GROUP_URL=https://t.me/new\nTARGET_GROUP_URL=https://t.me/out\n")
+    # SOURCE_GROUP_URL came from the dashboard, not .env, when the app started
+    values = env_file_values(str(path), NAMES, fixed=frozenset({'SOURCE_GROUP_URL'}))
+    assert values == {'TARGET_GROUP_URL': 'https://t.me/out'}
+
+
+def test_env_file_values_without_fixed_names(tmp_path):
+    path = tmp_path / ".env"
+    path.write_text("SOURCE_GROUP_URL=https://t.me/new\nOTHER=1\n")
+    assert env_file_values(str(path), NAMES) == {'SOURCE_GROUP_URL': 'https://t.me/new'}
+
+
+def _table(**headers):
+    return RouteTable([Route(name, f"https://t.me/{name}", "https://t.me/out", header=header)
+                       for name, header in headers.items()])
+
+
+def test_diff_routes():
+    old = _table(a="BUY", b="SELL", c="HOLD")
+    new = _table(a="BUY", b="SHORT", d="LONG")
+    diff = diff_routes(old, new)
+    assert diff == {'added': ['d'], 'removed': ['c'], 'changed': ['b']}
+    assert describe_diff(diff) == "+ d; - c; ~ b"
+    assert describe_diff(diff_routes(old, _table(a="BUY", b="SELL", c="HOLD"))) == "no changes"
+    assert diff_routes(None, new)['added'] == ['a', 'b', 'd']
+
+
+def test_watcher_reloads_once_per_settled_change(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text("[]")
+
+    async def scenario():
+        calls = []
+
+        async def on_change():
+            calls.append(path.read_text())
+
+        watcher = ConfigWatcher(str(path), on_change, interval=0.01, settle=0.03)
+        watcher.start()
+        await asyncio.sleep(0.05)
+        path.write_text("[1")
+        await asyncio.sleep(0.01)
+        path.write_text("[1, 2]")
+        await asyncio.sleep(0.2)
+        await watcher.stop()
+        return calls, watcher.changes
+
+    assert asyncio.run(scenario()) == (["[1, 2]"], 1)
+
+
+def test_watcher_keeps_routes_when_file_is_gone(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text("[]")
+
+    async def scenario():
+        calls = []
+
+        async def on_change():
+            calls.append(True)
+
+        watcher = ConfigWatcher(str(path), on_change, interval=0.01, settle=0.01)
+        watcher.start()
+        path.unlink()
+        await asyncio.sleep(0.1)
+        await watcher.stop()
+        return calls
+
+    assert asyncio.run(scenario()) == []
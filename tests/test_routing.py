@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from routing import AhoCorasickMatcher, Route, RouteTable, load_routes
+
+
+def test_finds_every_pattern_in_one_pass():
+    matcher = AhoCorasickMatcher(["he", "she", "his", "hers"])
+    found = matcher.search("ushers")
+    assert found == {matcher.id_of("he"), matcher.id_of("she"), matcher.id_of("hers")}
+
+
+def test_overlapping_and_nested_patterns():
+    matcher = AhoCorasickMatcher(["EUR/", "EUR/USD", "USD", "SD"])
+    assert matcher.search("EUR/USD") == {0, 1, 2, 3}
+    assert matcher.search("EUR/CAD") == {matcher.id_of("EUR/")}
+
+
+def test_failure_links_recover_after_partial_match():
+    matcher = AhoCorasickMatcher(["abcd", "bce"])
+    assert matcher.search("abce") == {matcher.id_of("bce")}
+
+
+def test_no_match_and_empty_inputs():
+    matcher = AhoCorasickMatcher(["signal"])
+    assert matcher.search("nothing here") == set()
+    assert matcher.search("") == set()
+    assert matcher.search(None) == set()
+    assert AhoCorasickMatcher([]).search("signal") == set()
+
+
+def test_duplicate_and_empty_patterns_share_or_skip_ids():
+    matcher = AhoCorasickMatcher(["a", "", "b", "a"])
+    assert matcher.patterns == ["a", "b"]
+    assert matcher.id_of("a") == 0
+    assert matcher.id_of("b") == 1
+    assert matcher.id_of("") is None
+
+
+def _table():
+    table = RouteTable([
+        Route('signals', 'src', 'a', header="🔔 NEW SIGNAL!"),
+        Route('eur', 'src', 'b', keywords=["EUR/", "GBP/"], exclude=["(OTC)"]),
+        Route('vip', 'src', 'c', source_users=["@vip"]),
+        Route('media', 'other', 'd', mode='forward'),
+    ])
+    table.bind({'src': -100, 'other': -200}, {'@vip': 7})
+    return table
+
+
+def test_route_table_matches_header_keywords_and_excludes():
+    table = _table()
+    names = lambda routes: [route.name for route in routes]  # noqa: E731
+    assert names(table.match(-100, "🔔 NEW SIGNAL!\nEUR/CAD", sender_id=1)) == ['signals', 'eur']
+    assert names(table.match(-100, "🔔 NEW SIGNAL!\nEUR/CAD (OTC)", sender_id=1)) == ['signals']
+    assert names(table.match(-100, "GBP/USD", sender_id=7)) == ['eur', 'vip']
+    assert table.match(-999, "🔔 NEW SIGNAL!") == []
+
+
+def test_forward_routes_accept_media_without_text():
+    table = _table()
+    assert [route.name for route in table.match(-200, "")] == ['media']
+    assert table.match(-100, "", sender_id=7) == []
+
+
+def test_sender_filter_needs_every_route_restricted():
+    assert _table().sender_filter() is None
+    table = RouteTable([Route('vip', 'src', 'c', source_users=["@vip", "@gone"])])
+    table.bind({'src': -100}, {'@vip': 7})
+    assert table.sender_filter() == [7]
+
+
+def test_load_routes_applies_defaults(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({'routes': [
+        {'source': 's', 'target': 't'},
+        {'name': 'x', 'source': 's', 'target': 'u', 'mode': 'copy'},
+    ]}))
+    table = load_routes(str(path), defaults={'mode': 'forward'})
+    assert [(route.name, route.mode) for route in table.routes] == [('route-1', 'forward'), ('x', 'copy')]
+    assert table.targets == ['t', 'u']
+
+
+@pytest.mark.parametrize("data, message", [
+    ({'source': 's'}, "needs both"),
+    ({'source': 's', 'target': 't', 'mode': 'bogus'}, "unknown mode"),
+    ({'source': 's', 'target': 't', 'digest_max': 0}, "digest_max"),
+])
+def test_invalid_routes(data, message):
+    with pytest.raises(ValueError, match=message):
+        Route.from_dict(data)
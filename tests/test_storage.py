@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from storage import SQLiteStore
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v INTEGER);"
+
+
+def test_concurrent_writes_share_one_commit(tmp_path):
+    async def scenario():
+        store = SQLiteStore(str(tmp_path / "kv.db"), SCHEMA, flush_interval=0.01)
+        await store.open()
+        results = await asyncio.gather(*(
+            store.execute("INSERT OR IGNORE INTO kv VALUES (?, ?)", (f"k{i % 10}", i)) for i in range(20)
+        ))
+        rows = await store.query("SELECT count(*) FROM kv")
+        batches = store.batches
+        await store.close()
+        return results, rows, batches
+
+    results, rows, batches = asyncio.run(scenario())
+    assert results == [1] * 10 + [0] * 10
+    assert rows == [(10,)]
+    assert batches == 1
+
+
+def test_failed_batch_fails_its_futures_and_keeps_going(tmp_path):
+    async def scenario():
+        store = SQLiteStore(str(tmp_path / "kv.db"), SCHEMA, flush_interval=0)
+        await store.open()
+        with pytest.raises(Exception):
+            await store.execute("INSERT INTO nope VALUES (1)")
+        assert await store.execute("INSERT INTO kv VALUES ('a', 1)") == 1
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_commits_pending_writes(tmp_path):
+    path = str(tmp_path / "kv.db")
+
+    async def scenario():
+        store = SQLiteStore(path, SCHEMA, flush_interval=1.0)
+        await store.open()
+        write = store.execute("INSERT INTO kv VALUES ('a', 1)")
+        await store.close()
+        assert write.result() == 1
+
+        reopened = SQLiteStore(path, SCHEMA)
+        await reopened.open()
+        rows = await reopened.query("SELECT k, v FROM kv")
+        await reopened.close()
+        return rows
+
+    assert asyncio.run(scenario()) == [('a', 1)]
+
+
+def test_use_before_open_or_after_close_raises(tmp_path):
+    async def scenario():
+        store = SQLiteStore(str(tmp_path / "kv.db"), SCHEMA)
+        with pytest.raises(RuntimeError, match="not open"):
+            store.execute("INSERT INTO kv VALUES ('a', 1)")
+        with pytest.raises(RuntimeError, match="not open"):
+            await store.query("SELECT * FROM kv")
+        await store.open()
+        await store.close()
+        with pytest.raises(RuntimeError, match="not open"):
+            store.execute("INSERT INTO kv VALUES ('a', 1)")
+
+    asyncio.run(scenario())
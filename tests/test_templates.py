@@ -0,0 +1,88 @@
+import re
+
+import pytest
+
+from templates import Clock, MessageTemplate, _compile_transforms, required_literals
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r"hello", ("hello",)),
+    (r"\bspam12\b|ref12=\w+", ("spam12", "ref12=")),
+    (r"(?:https?://|www\.|t\.me/)\S+", ("http", "www.", "t.me/")),
+    (r"@\w+", ("@",)),
+    (r"a+b", ("b",)),
+])
+def test_required_literals(pattern, expected):
+    assert required_literals(re.compile(pattern)) == expected
+
+
+@pytest.mark.parametrize("pattern", [r"(?i)hello", r"\d+", r"[abc]x?"])
+def test_required_literals_unknown(pattern):
+    assert required_literals(re.compile(pattern)) is None
+
+
+def test_literals_found_in_every_match():
+    regex = re.compile(r"\b(?:entry|enter)\s*:\s*\d+")
+    literals = required_literals(regex)
+    for text in ("entry: 12", "enter : 7"):
+        assert regex.search(text)
+        assert any(literal in text for literal in literals)
+
+
+def test_removals_without_literals_are_merged():
+    steps = _compile_transforms([{'pattern': r"\d{4,}"}, {'pattern': r"[!?]{2,}"}])
+    assert len(steps) == 1
+    regex, replace, literals = steps[0]
+    assert replace == "" and literals is None
+    assert regex.sub("", "code 12345 now!!") == "code  now"
+
+
+def test_rewrites_and_flagged_patterns_stay_separate():
+    steps = _compile_transforms([
+        {'pattern': r"\d{4,}"},
+        {'pattern': r"(?i)promo"},
+        {'pattern': r"LEVEL(\d)", 'replace': r"L\1"},
+    ])
+    assert [replace for _, replace, _ in steps] == ["", "", r"L\1"]
+
+
+@pytest.mark.parametrize("rule, message", [
+    ({'strip': 'nope'}, "unknown strip preset"),
+    ({'pattern': "("}, "invalid pattern"),
+    ({}, "needs 'strip' or 'pattern'"),
+])
+def test_invalid_transforms(rule, message):
+    with pytest.raises(ValueError, match=message):
+        _compile_transforms([rule])
+
+
+def test_presets_strip_links_and_mentions():
+    template = MessageTemplate(transforms=[{'strip': 'links'}, {'strip': 'mentions'}])
+    text = "BUY EUR/USD [chart](https://example.com/x) via @signals_bot https://t.me/x\nok"
+    assert template.body(text) == "BUY EUR/USD chart via\nok"
+
+
+def test_render_fills_static_and_dynamic_fields():
+    clock = Clock()
+    clock.now(0)
+    template = MessageTemplate(
+        header="{route} {sender} {timestamp}\n",
+        footer="\n-- {target}",
+        static={'route': 'r1', 'target': 'T', 'source': 'S'},
+        clock=clock,
+    )
+    clock.now = lambda now=None: "NOW"
+    assert template.render("text", "alice") == "r1 alice NOW\ntext\n-- T"
+
+
+def test_unknown_template_field():
+    with pytest.raises(ValueError, match="unknown template field"):
+        MessageTemplate(header="{nope}")
+
+
+def test_clock_reuses_text_within_a_second():
+    clock = Clock(fmt="%H:%M:%S")
+    assert clock.now(3600.2) == "01:00:00"
+    assert clock.now(3600.9) is clock.now(3600.1)
+    with pytest.raises(ValueError):
+        Clock("Nowhere/Nope")